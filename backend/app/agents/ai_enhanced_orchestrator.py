@@ -9,12 +9,14 @@ Integrates Gemini AI strategically for Indian film production analysis
 import logging
 from typing import Dict, Any, List
 from datetime import datetime
-import json
 import pandas as pd
 from pathlib import Path
 import uuid
 import time
 
+from app.utils.llm_telemetry import agent_scope
+from app.utils.prompt_format import compact_json
+
 logger = logging.getLogger(__name__)
 
 
@@ -80,7 +82,7 @@ class AIEnhancedOrchestratorEngine:
             }
         }
     
-    def run_pipeline_with_ai(self, project_id: str, script_text: str) -> Dict[str, Any]:
+    async def run_pipeline_with_ai(self, project_id: str, script_text: str) -> Dict[str, Any]:
         """
         Run pipeline with strategic AI integration
         - Phase 1: Fast extraction (deterministic)
@@ -102,13 +104,13 @@ class AIEnhancedOrchestratorEngine:
             logger.info(f"🔴 HIGH-RISK scenes identified: {len(high_risk_scenes)}")
             
             if self.ai_available and high_risk_scenes:
-                scenes = self._enhance_high_risk_scenes_with_ai(high_risk_scenes, scenes)
+                scenes = await self._enhance_high_risk_scenes_with_ai(high_risk_scenes, scenes)
                 logger.info(f"✅ HIGH-RISK scenes enhanced with AI analysis")
             
             # PHASE 3: Generate cross-scene insights with AI
             insights = base_result.get("insights", [])
             if self.ai_available and high_risk_scenes:
-                insights = self._generate_cross_scene_insights_with_ai(high_risk_scenes, scenes)
+                insights = await self._generate_cross_scene_insights_with_ai(high_risk_scenes, scenes)
                 logger.info(f"✅ Cross-scene insights generated with AI")
             
             # PHASE 4: Apply Indian context and knowledge grounding
@@ -124,7 +126,7 @@ class AIEnhancedOrchestratorEngine:
             # Fallback to standard enhanced output without AI
             return self.enhanced_orchestrator.run_pipeline_with_grounding(project_id, script_text)
     
-    def _enhance_high_risk_scenes_with_ai(self, high_risk_scenes: List[Dict], all_scenes: List[Dict]) -> List[Dict]:
+    async def _enhance_high_risk_scenes_with_ai(self, high_risk_scenes: List[Dict], all_scenes: List[Dict]) -> List[Dict]:
         """
         Call Gemini ONLY for high-risk scenes (batch processing)
         Returns: Updated scenes list with AI-enhanced risk/budget analysis
@@ -155,7 +157,7 @@ class AIEnhancedOrchestratorEngine:
             - Crowd management in India has unique challenges
             
             ANALYZE these {len(scenes_summary)} HIGH-RISK scenes:
-            {json.dumps(scenes_summary, indent=2)}
+            {compact_json(scenes_summary)}
             
             For EACH scene, provide:
             1. Top 3 production risks specific to Indian context
@@ -179,7 +181,8 @@ class AIEnhancedOrchestratorEngine:
             
             # Call Gemini with timeout
             logger.info("📞 Calling Gemini for HIGH-RISK scene analysis...")
-            response_text = self.gemini_client.call_model(prompt, temperature=0.4)
+            with agent_scope("AIEnhancedRiskAnalysis"):
+                response_text = await self.gemini_client.call_model(prompt, temperature=0.4)
             ai_results = self.gemini_client.extract_json_from_response(response_text)
             
             if not isinstance(ai_results, list):
@@ -217,7 +220,7 @@ class AIEnhancedOrchestratorEngine:
             logger.warning(f"⚠️ AI enhancement failed: {e}, using standard analysis")
             return all_scenes
     
-    def _generate_cross_scene_insights_with_ai(self, high_risk_scenes: List[Dict], all_scenes: List[Dict]) -> List[Dict]:
+    async def _generate_cross_scene_insights_with_ai(self, high_risk_scenes: List[Dict], all_scenes: List[Dict]) -> List[Dict]:
         """
         Single Gemini call to identify cross-scene patterns and strategies
         Returns: Enhanced insights list with agentic reasoning
@@ -239,7 +242,7 @@ class AIEnhancedOrchestratorEngine:
             
             HIGH-RISK SCENE ANALYSIS:
             - Total high-risk scenes: {len(high_risk_scenes)}
-            - Location clustering: {json.dumps(locations_by_risk, indent=2)}
+            - Location clustering: {compact_json(locations_by_risk)}
             - Average risk score: {sum([s['risk']['total_risk_score'] for s in high_risk_scenes]) / len(high_risk_scenes):.1f}
             
             IDENTIFY and RECOMMEND:
@@ -273,7 +276,8 @@ class AIEnhancedOrchestratorEngine:
             """
             
             logger.info("📞 Calling Gemini for cross-scene pattern analysis...")
-            response_text = self.gemini_client.call_model(prompt, temperature=0.5)
+            with agent_scope("AIEnhancedCrossScene"):
+                response_text = await self.gemini_client.call_model(prompt, temperature=0.5)
             ai_insights = self.gemini_client.extract_json_from_response(response_text)
             
             logger.info("✅ Gemini generated cross-scene insights")
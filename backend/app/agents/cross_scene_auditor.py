@@ -4,7 +4,8 @@ ENHANCEMENT #1: Cross-Scene Intelligence for inefficiencies, fatigue, logistics
 """
 from typing import Dict, List, Any
 from app.utils.llm_client import gemini_client
-import json
+from app.utils.llm_telemetry import agent_scope
+from app.utils.prompt_format import compact_json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,7 +18,7 @@ class CrossSceneAuditorAgent:
     Uses LLM to think like an experienced line producer
     """
     
-    def audit_project(self, scenes_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def audit_project(self, scenes_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Audit entire project for inefficiencies
         
@@ -34,7 +35,7 @@ class CrossSceneAuditorAgent:
         scene_summaries = self._build_scene_summaries(scenes_data)
         
         # Call LLM to analyze
-        insights = self._call_auditor_llm(scene_summaries)
+        insights = await self._call_auditor_llm(scene_summaries)
         
         logger.info(f"✅ Found {len(insights)} cross-scene insights")
         
@@ -78,7 +79,7 @@ class CrossSceneAuditorAgent:
             return field_data
         return "UNKNOWN"
     
-    def _call_auditor_llm(self, scene_summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def _call_auditor_llm(self, scene_summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Call Gemini to analyze cross-scene patterns
         ENHANCEMENT #1: This is where human-like producer thinking happens
@@ -88,7 +89,7 @@ class CrossSceneAuditorAgent:
         prompt = f"""You are a 25-year veteran line producer. Analyze the shooting schedule below and identify CROSS-SCENE inefficiencies.
 
 SCENES:
-{json.dumps(scene_summaries, indent=2)}
+{compact_json(scene_summaries)}
 
 Find inefficiencies like:
 1. LOCATION CHAIN BREAKS: Same location used on different non-consecutive days (consolidate to same day block)
@@ -113,7 +114,8 @@ Output ONLY valid JSON (no markdown, no explanation):
 Be concise. Only include high-confidence inefficiencies."""
 
         try:
-            response = gemini_client.call_model(prompt, temperature=0.2)
+            with agent_scope("CrossSceneAuditor"):
+                response = await gemini_client.call_model(prompt, temperature=0.2)
             insights = gemini_client.extract_json_from_response(response)
             
             if isinstance(insights, list):
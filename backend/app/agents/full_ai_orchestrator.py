@@ -3,12 +3,14 @@ Full AI-Enhanced Orchestrator Engine
 5 Agents with AI-first strategy + Safe Fallbacks
 Maximum Jury Impact + Minimum Risk
 """
+import asyncio
 import logging
 import json
-import uuid
 import re
+import uuid
 import pandas as pd
-from typing import Dict, Any, List
+from contextlib import aclosing
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
@@ -73,6 +75,30 @@ class AIAgentSafetyLayer:
         return fallbacks.get(method_name, {})
 
 
+def llm_available(llm_client) -> bool:
+    """A client is configured, its endpoint's circuit breaker is not open and the tier has time left"""
+    if llm_client is None:
+        return False
+    if getattr(llm_client, 'circuit_open', False):
+        logger.info("⚡ LLM circuit open, using deterministic fallback")
+        return False
+    from app.utils.deadline import deadline_expired
+    
+    if deadline_expired():
+        logger.info("⏱️ Tier deadline spent, using deterministic fallback")
+        return False
+    return True
+
+
+# Share of the run deadline each LLM tier group gets, of the time left when it
+# starts (tier 4 is rule-based and runs after the deadline regardless)
+TIER_DEADLINE_SHARES = {
+    "extraction": 0.45,     # Tiers 1 + 1B
+    "scoring": 0.30,        # Tiers 2 + 2B
+    "cross_scene": 0.25,    # Tiers 3 + 3B
+}
+
+
 # ════════════════════════════════════════════════════════════════
 # AGENT 1: SCENE EXTRACTOR
 # ════════════════════════════════════════════════════════════════
@@ -83,65 +109,43 @@ class SceneExtractorAgent:
     def __init__(self, llm_client):
         self.llm_client = llm_client
     
-    async def extract_scenes(self, script_text: str) -> Dict[str, Any]:
-        """TRY: LLM AI on FULL SCRIPT → FALLBACK: Multi-pattern regex"""
+    async def extract_scenes(self, script_text: str, scene_index=None, on_scene: Callable[[Dict], None] = None) -> Dict[str, Any]:
+        """
+        TRY: Regex-first hybrid (or LLM on scene-aligned windows) → FALLBACK: Multi-pattern regex
+        
+        settings.scene_extraction_mode picks the strategy: "hybrid" parses every
+        well-formed heading deterministically and only sends ambiguous regions to
+        the LLM, "llm" sends the whole script in windows, "regex" never calls it.
+        
+        on_scene: Called with each scene as soon as it is known (hybrid: regex
+        scenes up front; llm: as each streamed object closes), before the
+        final merge. May repeat scene numbers; the returned list is canonical.
+        """
+        from app.config import settings
+        from app.services.scene_index import scan_scene_headings
         
         extracted_scenes = []
         ai_success = False
+        mode = settings.scene_extraction_mode
         
         # Log input size for debugging
         logger.info(f"📄 SceneExtractor: Processing {len(script_text):,} characters")
-        logger.info(f"📄 SceneExtractor: {len(script_text.split(chr(10)))} lines in script")
-        
-        # ═══ PHASE 1: TRY AI WITH FULL SCRIPT ═══
-        if self.llm_client and len(script_text) > 100:
-            try:
-                logger.info("📞 SceneExtractor: Calling LLM AI...")
-                
-                prompt = f"""Extract ALL scenes from this complete film script. Return ONLY a JSON array with NO explanation.
-
-For EVERY scene in the script, include:
-- scene_number: Keep EXACTLY as in script (e.g., "1", "4", "4.1", "4.5", "29", "29.3")
-- location: The exact location name
-- time_of_day: DAY, NIGHT, DUSK, DAWN, AFTERNOON, etc.
-- description: One line summary of what happens
-
-CRITICAL RULES:
-1. Extract EVERY scene from the script
-2. Do NOT skip any scenes
-3. Do NOT rename or renumber scenes
-4. Keep original scene numbers exactly as they appear
-5. Scene continuations (4.1, 4.2, etc.) are separate scenes
-6. Return ONLY valid JSON array, nothing else
-
-COMPLETE SCRIPT:
-{script_text}
-
-Return ONLY JSON array starting with [ and ending with ]"""
-                
-                response_text = await self.llm_client.call_model(prompt, temperature=0.2, max_tokens=16000)
-                
-                if not response_text or len(response_text) < 10:
-                    logger.warning(f"⚠️ AI returned empty response: '{response_text[:100]}'")
-                else:
-                    extracted_scenes = self._parse_json_safely(response_text)
-                    logger.info(f"📊 AI extracted: {len(extracted_scenes)} scenes")
-                    
-                    if extracted_scenes and len(extracted_scenes) > 0:
-                        logger.info(f"✅ AI extraction success: {len(extracted_scenes)} scenes")
-                        ai_success = True
-                        sample = [str(s.get('scene_number', '?')) for s in extracted_scenes[:10]]
-                        logger.info(f"   Sample: {sample}")
-                    else:
-                        logger.warning(f"⚠️ AI returned empty list or invalid format")
-            
-            except Exception as e:
-                logger.error(f"❌ AI call failed: {type(e).__name__}: {str(e)[:100]}")
+        logger.info(f"📄 SceneExtractor: {script_text.count(chr(10)) + 1} lines in script")
+        
+        # ═══ PHASE 1: TRY AI (HYBRID SEGMENTS OR TOKEN-BOUNDED WINDOWS) ═══
+        use_llm = llm_available(self.llm_client)
+        if use_llm and len(script_text) > 100 and mode != "regex":
+            if scene_index is None:
+                scene_index = scan_scene_headings(script_text)
+            if mode == "hybrid":
+                extracted_scenes, ai_success = await self._extract_hybrid(script_text, scene_index, on_scene)
+            else:
+                extracted_scenes, ai_success = await self._extract_windowed(script_text, scene_index, on_scene)
         
         # ═══ PHASE 2: FALLBACK TO REGEX ═══
-        if not ai_success or len(extracted_scenes) == 0:
+        if len(extracted_scenes) == 0:
             logger.info("📊 Using regex fallback extraction...")
-            regex_scenes = self._extract_scenes_regex(script_text)
+            regex_scenes = self._extract_scenes_regex(script_text, scene_index)
             extracted_scenes = regex_scenes
             logger.info(f"📊 Regex extracted: {len(regex_scenes)} scenes")
         
@@ -158,9 +162,307 @@ Return ONLY JSON array starting with [ and ending with ]"""
             "ai_used": ai_success,
             "confidence": 0.95 if ai_success else 0.85,
             "agent_name": "SceneExtractorAgent",
-            "count": len(validated_scenes)
+            "count": len(validated_scenes),
+            "mode": mode if use_llm else "regex"
         }
     
+    async def _extract_windowed(self, script_text: str, scene_index, on_scene=None) -> tuple:
+        """Whole script through the LLM in token-bounded windows; returns (scenes, ai_success)"""
+        from app.config import settings
+        from app.services.scene_index import plan_windows
+        
+        extracted_scenes = []
+        ai_success = False
+        windows = plan_windows(
+            script_text, scene_index,
+            max_tokens=settings.scene_window_tokens,
+            overlap_lines=settings.scene_window_overlap_lines,
+        )
+        logger.info(f"📞 SceneExtractor: Calling LLM AI on {len(windows)} window(s)...")
+        
+        semaphore = asyncio.Semaphore(max(1, settings.scene_extraction_max_concurrent))
+        window_results = await asyncio.gather(*[
+            self._extract_window(window, len(windows), semaphore, on_scene) for window in windows
+        ])
+        
+        for window, window_scenes in zip(windows, window_results):
+            if window_scenes:
+                ai_success = True
+            else:
+                # Keep recall for a failed window: use its indexed headings
+                window_scenes = self._extract_scenes_regex(script_text, window.headings) if window.headings else []
+                for scene in window_scenes if on_scene else []:
+                    on_scene(scene)
+            extracted_scenes.extend(window_scenes)
+        
+        extracted_scenes = self._merge_scenes(extracted_scenes)
+        if ai_success:
+            logger.info(f"✅ AI extraction success: {len(extracted_scenes)} scenes")
+            sample = [str(s.get('scene_number', '?')) for s in extracted_scenes[:10]]
+            logger.info(f"   Sample: {sample}")
+        else:
+            logger.warning("⚠️ AI returned no scenes for any window")
+        return extracted_scenes, ai_success
+    
+    async def _extract_hybrid(self, script_text: str, scene_index, on_scene=None) -> tuple:
+        """
+        Regex-first extraction; only ambiguous segments go to the LLM
+        
+        Returns:
+            (scenes in script order, whether the LLM resolved every segment it was sent)
+        """
+        from app.config import settings
+        from app.services.scene_index import CHARS_PER_TOKEN, batch_segments, find_ambiguous_segments
+        
+        placed = [
+            (heading.char_offset, scene)
+            for heading, scene in zip(scene_index, self._extract_scenes_regex(script_text, scene_index))
+        ]
+        for _, scene in placed if on_scene else []:
+            on_scene(scene)
+        segments = find_ambiguous_segments(
+            script_text, scene_index,
+            gap_tokens=settings.scene_gap_tokens,
+            context_lines=settings.scene_suspect_context_lines,
+        )
+        if not segments:
+            logger.info(f"✅ Hybrid: all {len(placed)} headings parsed deterministically, no LLM call needed")
+            return [scene for _, scene in placed], False
+        
+        batches = batch_segments(script_text, segments, settings.scene_window_tokens)
+        sent_chars = sum(segment.end - segment.start for segment in segments)
+        logger.info(
+            f"📞 Hybrid: {len(segments)} ambiguous segment(s) in {len(batches)} prompt(s), "
+            f"~{sent_chars // CHARS_PER_TOKEN:,} of ~{len(script_text) // CHARS_PER_TOKEN:,} script tokens"
+        )
+        
+        semaphore = asyncio.Semaphore(max(1, settings.scene_extraction_max_concurrent))
+        batch_results = await asyncio.gather(*[
+            self._extract_segments(script_text, batch, semaphore) for batch in batches
+        ])
+        
+        # Regex headings win; script numbers (not the sequential ones given to
+        # unnumbered headings) dedupe what the LLM found
+        known_offsets = {offset for offset, _ in placed}
+        known_numbers = {scene['scene_number'] for _, scene in placed if isinstance(scene['scene_number'], str)}
+        added = 0
+        for batch_scenes in batch_results:
+            for offset, scene in batch_scenes or []:
+                number = scene.get('scene_number')
+                number = None if number in (None, '') else str(number).strip()
+                if offset in known_offsets or number in known_numbers:
+                    continue
+                scene['scene_number'] = number
+                known_offsets.add(offset)
+                if number:
+                    known_numbers.add(number)
+                placed.append((offset, scene))
+                added += 1
+        placed.sort(key=lambda item: item[0])
+        
+        scenes = self._number_inserted_scenes([scene for _, scene in placed])
+        ai_success = all(result is not None for result in batch_results)
+        logger.info(f"✅ Hybrid: {len(scenes)} scenes ({added} found by the LLM in ambiguous segments)")
+        return scenes, ai_success
+    
+    async def _extract_segments(self, script_text: str, batch, semaphore: asyncio.Semaphore):
+        """
+        Ask the LLM for headings inside a batch of ambiguous segments
+        
+        Returns:
+            [(char_offset, scene)] for the headings found, or None if the call failed
+        """
+        from app.config import settings
+        
+        excerpts = [script_text[segment.start:segment.end] for segment in batch]
+        prompt = self._build_segment_prompt(excerpts)
+        try:
+            async with semaphore:
+                response_text = await self._call_llm(prompt, settings.scene_window_output_tokens)
+        except Exception as e:
+            logger.error(f"❌ AI call failed (hybrid segments): {type(e).__name__}: {str(e)[:100]}")
+            return None
+        if not response_text or '[' not in response_text:
+            logger.warning(f"⚠️ AI returned empty response for hybrid segments: '{(response_text or '')[:100]}'")
+            return None
+        
+        found = []
+        for scene in self._parse_json_safely(response_text):
+            if not isinstance(scene, dict):
+                continue
+            heading = str(scene.pop('heading', '') or '').strip()
+            try:
+                candidates = [int(scene.pop('excerpt')) - 1]
+            except (KeyError, TypeError, ValueError):
+                candidates = []
+            candidates += [i for i in range(len(batch)) if i not in candidates]
+            
+            # Place the scene where its heading line appears in the excerpt
+            offset = None
+            for i in candidates:
+                if 0 <= i < len(batch):
+                    position = excerpts[i].find(heading) if heading else -1
+                    if position >= 0:
+                        offset = batch[i].start + position
+                        break
+            if offset is None:
+                continue
+            
+            scene.setdefault('description', heading)
+            scene['confidence'] = 0.8
+            scene['is_continuation'] = False
+            found.append((offset, scene))
+        return found
+    
+    def _build_segment_prompt(self, excerpts: List[str]) -> str:
+        """Small prompt for hybrid mode: find headings inside ambiguous excerpts"""
+        body = "\n\n".join(f"EXCERPT {i}:\n{text}" for i, text in enumerate(excerpts, 1))
+        return f"""These excerpts come from a film script. Automatic parsing found no scene heading in them, or found lines that look like malformed or non-English scene headings. Return ONLY a JSON array with NO explanation.
+
+For EVERY scene heading (slug line) that starts a new scene inside the excerpts, include:
+- excerpt: The EXCERPT number it appears in
+- heading: The heading line copied EXACTLY as it appears
+- scene_number: Keep EXACTLY as in script (e.g., "7", "12A", "29.3"), or null if unnumbered
+- location: The exact location name
+- time_of_day: DAY, NIGHT, DUSK, DAWN, AFTERNOON, etc.
+- description: One line summary of what happens
+
+CRITICAL RULES:
+1. Only report real scene headings, not dialogue or action lines
+2. Do NOT rename or renumber scenes
+3. Return [] if no excerpt contains a scene heading
+4. Return ONLY valid JSON array, nothing else
+
+{body}
+
+Return ONLY JSON array starting with [ and ending with ]"""
+    
+    def _number_inserted_scenes(self, scenes: List[Dict]) -> List[Dict]:
+        """Give unnumbered LLM scenes an inserted-scene number after their predecessor (12 → 12A)"""
+        previous = "0"
+        suffixes = {}
+        for scene in scenes:
+            if scene.get('scene_number') is None:
+                suffix = suffixes.get(previous, 0)
+                suffixes[previous] = suffix + 1
+                scene['scene_number'] = f"{previous}{chr(ord('A') + suffix % 26)}"
+            else:
+                previous = str(scene['scene_number'])
+        return scenes
+    
+    async def _extract_window(self, window, total: int, semaphore: asyncio.Semaphore, on_scene=None) -> List[Dict]:
+        """Run one window through the LLM; returns [] on any failure"""
+        from app.config import settings
+        
+        prompt = self._build_prompt(window.text, window.index + 1, total)
+        if on_scene and settings.llm_stream_responses and hasattr(self.llm_client, 'call_model_stream'):
+            return await self._stream_window(prompt, window.index + 1, total, semaphore, on_scene)
+        try:
+            async with semaphore:
+                response_text = await self._call_llm(prompt, settings.scene_window_output_tokens)
+        except Exception as e:
+            logger.error(f"❌ AI call failed (window {window.index + 1}/{total}): {type(e).__name__}: {str(e)[:100]}")
+            return []
+        
+        if not response_text or len(response_text) < 10:
+            logger.warning(f"⚠️ AI returned empty response for window {window.index + 1}/{total}: '{(response_text or '')[:100]}'")
+            return []
+        
+        scenes = [s for s in self._parse_json_safely(response_text) if isinstance(s, dict)]
+        logger.info(f"📊 AI extracted: {len(scenes)} scenes (window {window.index + 1}/{total})")
+        return scenes
+    
+    async def _stream_window(self, prompt: str, part: int, total: int, semaphore: asyncio.Semaphore, on_scene) -> List[Dict]:
+        """
+        Streamed variant of _extract_window: each scene object is handed to
+        on_scene as soon as it closes
+        
+        A response cut off mid-array (max_tokens, dropped connection) keeps the
+        scenes that did complete instead of failing the whole window; like a
+        rejected element, it is reported as a parse failure.
+        """
+        from app.config import settings
+        from app.utils.json_stream import IncrementalJSONArrayParser
+        from app.utils.llm_telemetry import agent_scope, mark_parse_failure
+        
+        parser = IncrementalJSONArrayParser()
+        scenes = []
+        rejected = 0
+        try:
+            stream = self.llm_client.call_model_stream(
+                prompt, temperature=0.2, max_tokens=settings.scene_window_output_tokens
+            )
+            # Read to [DONE] (the tail after ']' is a few tokens) so the
+            # response is cached; aclosing releases the connection on errors
+            with agent_scope("SceneExtractor"):
+                async with semaphore, aclosing(stream):
+                    async for chunk in stream:
+                        for scene in parser.feed(chunk):
+                            if isinstance(scene, dict):
+                                scenes.append(scene)
+                                on_scene(scene)
+                            else:
+                                rejected += 1
+        except Exception as e:
+            logger.error(f"❌ AI stream failed (window {part}/{total}): {type(e).__name__}: {str(e)[:100]}")
+        
+        if not parser.done:
+            logger.warning(f"⚠️ AI stream for window {part}/{total} ended before the JSON array closed")
+        if parser.skipped or rejected or not parser.done:
+            mark_parse_failure()
+        logger.info(f"📊 AI extracted: {len(scenes)} scenes (window {part}/{total}, streamed)")
+        return scenes
+    
+    async def _call_llm(self, prompt: str, max_tokens: int) -> str:
+        """Both clients (GeminiClient, Qwen3Client) share the async call_model interface"""
+        from app.utils.llm_telemetry import agent_scope
+        with agent_scope("SceneExtractor"):
+            return await self.llm_client.call_model(prompt, temperature=0.2, max_tokens=max_tokens)
+    
+    def _build_prompt(self, text: str, part: int, total: int) -> str:
+        """Extraction prompt for the whole script or one window of it"""
+        if total == 1:
+            scope, label = "this complete film script", "COMPLETE SCRIPT"
+            first_rule = "1. Extract EVERY scene from the script"
+        else:
+            scope, label = f"this excerpt (part {part} of {total}) of a film script", f"SCRIPT EXCERPT {part}/{total}"
+            first_rule = ("1. Extract EVERY scene whose heading appears in this excerpt "
+                          "(the first lines may repeat the end of the previous part)")
+        
+        return f"""Extract ALL scenes from {scope}. Return ONLY a JSON array with NO explanation.
+
+For EVERY scene in the script, include:
+- scene_number: Keep EXACTLY as in script (e.g., "1", "4", "4.1", "4.5", "29", "29.3")
+- location: The exact location name
+- time_of_day: DAY, NIGHT, DUSK, DAWN, AFTERNOON, etc.
+- description: One line summary of what happens
+
+CRITICAL RULES:
+{first_rule}
+2. Do NOT skip any scenes
+3. Do NOT rename or renumber scenes
+4. Keep original scene numbers exactly as they appear
+5. Scene continuations (4.1, 4.2, etc.) are separate scenes
+6. Return ONLY valid JSON array, nothing else
+
+{label}:
+{text}
+
+Return ONLY JSON array starting with [ and ending with ]"""
+    
+    def _merge_scenes(self, scenes: List[Dict]) -> List[Dict]:
+        """Dedupe per-window results by scene_number, keeping the first (script order)"""
+        merged = []
+        seen = set()
+        for scene in scenes:
+            key = str(scene.get('scene_number', '')).strip()
+            if key and key in seen:
+                continue
+            if key:
+                seen.add(key)
+            merged.append(scene)
+        return merged
+    
     def _parse_json_safely(self, response_text):
         """Safely extract JSON from Gemini response"""
         try:
@@ -171,113 +473,25 @@ Return ONLY JSON array starting with [ and ending with ]"""
                 return json.loads(json_str)
         except:
             pass
+        if response_text:
+            from app.utils.llm_telemetry import mark_parse_failure
+            mark_parse_failure()
         return []
     
-    def _extract_scenes_regex(self, script_text: str) -> List[Dict]:
+    def _extract_scenes_regex(self, script_text: str, scene_index=None) -> List[Dict]:
         """Multi-pattern regex for screenplay formats - PRESERVE ORIGINAL SCENE NUMBERS"""
-        scenes = []
-        sequential_number = 0
-        seen_scene_numbers = set()  # ← DEDUPLICATION!
-        
-        # Pattern 1: PRIMARY - Numbered scenes "29.5 INT. LOCATION - TIME"
-        # MUST have INT/EXT and location, optionally preceded by number
-        pattern_numbered = r"^(\d+(?:\.\d+)*)\s*\.?\s+(INT|EXT|INT/EXT)\s*\.?\s+([A-Z][^-\n]+?)(?:\s*[-–]\s*([^\n]+))?$"
+        from app.services.scene_index import scan_scene_headings, scenes_from_index
         
-        # Pattern 2: Standard "INT. LOCATION - TIME" (NO number prefix)
-        # Ensure it starts with INT/EXT and has proper structure
-        pattern_standard = r"^(INT|EXT|INT/EXT)\s*\.?\s+([A-Z][^-\n]+?)\s*[-–]\s*([^\n]+)$"
-        
-        # Pattern 3: Minimal "INT. LOCATION" (short, NO time, NO number)
-        # Only match if line is actually short
-        pattern_minimal = r"^(INT|EXT|INT/EXT)\s*\.?\s+([A-Z][^\n]+?)$"
+        # Headings are normally scanned once at ingestion; only rescan legacy documents
+        if scene_index is None:
+            logger.info(f"🔍 Regex: Scanning {script_text.count(chr(10)) + 1} lines for scene headings")
+            scene_index = scan_scene_headings(script_text)
+        else:
+            logger.info(f"🔍 Regex: Using stored scene index ({len(scene_index)} headings)")
         
-        lines = script_text.split('\n')
-        logger.info(f"🔍 Regex: Processing {len(lines)} lines for scene extraction")
-        
-        for idx, line in enumerate(lines):
-            line = line.strip()
-            if not line or len(line) < 5:  # Increased minimum length
-                continue
-            
-            # ═══ PATTERN 1: Numbered scenes (HIGHEST PRIORITY) ═══
-            match = re.match(pattern_numbered, line, re.IGNORECASE)
-            if match:
-                scene_num = match.group(1)
-                
-                # DEDUPLICATION CHECK
-                if scene_num in seen_scene_numbers:
-                    logger.debug(f"⚠️ Skipping duplicate scene number: {scene_num}")
-                    continue
-                
-                seen_scene_numbers.add(scene_num)
-                location = match.group(3).strip()
-                time_of_day = match.group(4).strip() if match.group(4) else "DAY"
-                
-                scenes.append({
-                    "scene_number": scene_num,
-                    "location": location,
-                    "time_of_day": time_of_day,
-                    "description": line,
-                    "confidence": 0.98,
-                    "is_continuation": "." in scene_num
-                })
-                logger.debug(f"✅ [P1] Scene {scene_num}: {location}")
-                continue
-            
-            # ═══ PATTERN 2: Standard scenes with time (MIDDLE PRIORITY) ═══
-            match = re.match(pattern_standard, line, re.IGNORECASE)
-            if match:
-                # Only create sequential number for non-numbered scenes
-                sequential_number += 1
-                scene_num = sequential_number
-                
-                if scene_num in seen_scene_numbers:
-                    logger.debug(f"⚠️ Skipping duplicate sequential number: {scene_num}")
-                    sequential_number -= 1  # Don't consume the number
-                    continue
-                
-                seen_scene_numbers.add(scene_num)
-                location = match.group(2).strip()
-                time_of_day = match.group(3).strip()
-                
-                scenes.append({
-                    "scene_number": scene_num,
-                    "location": location,
-                    "time_of_day": time_of_day,
-                    "description": line,
-                    "confidence": 0.90,
-                    "is_continuation": False
-                })
-                logger.debug(f"✅ [P2] Scene {scene_num}: {location}")
-                continue
-            
-            # ═══ PATTERN 3: Minimal format (LOW PRIORITY - only short lines) ═══
-            if len(line) < 100:  # Be more conservative
-                match = re.match(pattern_minimal, line, re.IGNORECASE)
-                if match:
-                    sequential_number += 1
-                    scene_num = sequential_number
-                    
-                    if scene_num in seen_scene_numbers:
-                        sequential_number -= 1
-                        continue
-                    
-                    seen_scene_numbers.add(scene_num)
-                    location = match.group(2).strip()
-                    
-                    scenes.append({
-                        "scene_number": scene_num,
-                        "location": location,
-                        "time_of_day": "DAY",
-                        "description": line,
-                        "confidence": 0.70,
-                        "is_continuation": False
-                    })
-                    logger.debug(f"✅ [P3] Scene {scene_num}: {location}")
+        scenes = scenes_from_index(script_text, scene_index)
         
         logger.info(f"📊 Regex extraction complete: {len(scenes)} unique scenes")
-        logger.info(f"   Total lines processed: {len(lines)}")
-        logger.info(f"   Seen scene numbers: {len(seen_scene_numbers)}")
         
         if scenes:
             sample_numbers = [str(s.get('scene_number')) for s in scenes[:15]]
@@ -312,6 +526,347 @@ Return ONLY JSON array starting with [ and ending with ]"""
         return validated
 
 
+# ════════════════════════════════════════════════════════════════
+# AGENT 1B: SCENE FEATURE EXTRACTOR
+# ════════════════════════════════════════════════════════════════
+
+# Allowed values for enumerated SceneExtractionData fields (the vocabulary the
+# deterministic risk_scorer / budget_estimator field mappings understand)
+FEATURE_CHOICES = {
+    "time_of_day": ["day", "night"],
+    "stunt_level": ["none", "light", "medium", "heavy"],
+    "water_complexity": ["none", "simple", "medium", "complex"],
+    "crowd_size": ["none", "small", "medium", "large"],
+    "vehicle_types": ["none", "simple", "medium", "heavy"],
+    "animals": ["none", "small", "large"],
+    "weather_dependent": ["yes", "no"],
+    "permit_tier": ["1", "2", "3", "4"],
+}
+
+# Feature values that make a scene high-risk / complex for triage
+HEAVY_FEATURES = {
+    "stunt_level": {"medium", "heavy"},
+    "water_complexity": {"medium", "complex"},
+    "crowd_size": {"large"},
+    "vehicle_types": {"medium", "heavy"},
+    "animals": {"large"},
+}
+
+KEYWORD_FEATURES = {
+    "stunt_level": [("heavy", ["explosion", "explodes", "crash", "falls from", "jumps from"]),
+                    ("medium", ["fight", "stunt", "chase", "punch", "leaps"])],
+    "water_complexity": [("complex", ["underwater", "drown", "flood"]),
+                         ("medium", ["river", "sea", "lake", "swim", "boat", "waves"]),
+                         ("simple", ["rain", "pool"])],
+    "crowd_size": [("large", ["crowd", "stadium", "festival", "rally", "procession"]),
+                   ("medium", ["market", "wedding", "party", "classroom"])],
+    "vehicle_types": [("heavy", ["car chase", "truck", "bus", "helicopter", "train"]),
+                      ("simple", ["car", "jeep", "bike", "auto", "taxi"])],
+    "animals": [("large", ["horse", "elephant", "cattle", "cow", "bull"]),
+                ("small", ["dog", "cat", "bird", "snake"])],
+}
+HAZARD_KEYWORDS = ["fire", "explosion", "gun", "knife", "rooftop", "cliff", "smoke", "blood", "electric"]
+
+
+def scene_feature_value(scene: Dict, field: str) -> str:
+    """Lowercased value of an extracted feature ("" when the scene has none)"""
+    data = (scene.get('features') or {}).get(field)
+    value = data.get('value') if isinstance(data, dict) else data
+    return str(value).lower() if value is not None else ""
+
+
+def heavy_features(scene: Dict) -> List[str]:
+    """Features marking a scene as risky/complex, e.g. ["stunt_level=heavy", "hazards=fire"]"""
+    heavy = [
+        f"{field}={scene_feature_value(scene, field)}"
+        for field, values in HEAVY_FEATURES.items()
+        if scene_feature_value(scene, field) in values
+    ]
+    hazards = ((scene.get('features') or {}).get('hazards') or {}).get('value') or []
+    return heavy + [f"hazards={hazard}" for hazard in hazards]
+
+
+def scene_text_for_keywords(scene: Dict) -> str:
+    """Scene fields for keyword triage, without the feature names (which contain "stunt", "water"...)"""
+    return str({key: value for key, value in scene.items() if key != 'features'}).lower()
+
+
+_deterministic_agents = None
+
+
+def deterministic_scorers() -> tuple:
+    """
+    The dataset-backed (risk_scorer, budget_estimator) singletons, or
+    (None, None) when their CSV datasets are not installed
+    """
+    global _deterministic_agents
+    if _deterministic_agents is None:
+        try:
+            from app.agents.risk_scorer import risk_scorer
+            from app.agents.budget_estimator import budget_estimator
+            _deterministic_agents = (risk_scorer, budget_estimator)
+        except (ImportError, OSError) as e:
+            logger.warning(f"⚠️ Deterministic scorers unavailable ({e}), triaging on features only")
+            _deterministic_agents = (None, None)
+    return _deterministic_agents
+
+
+def score_scene_features(scene: Dict) -> Optional[Dict]:
+    """Risk entry from the deterministic risk_scorer (None without features or datasets)"""
+    from app.utils.constants import RISK_SCALE_MAX
+    
+    risk_model, _ = deterministic_scorers()
+    if risk_model is None or not scene.get('features'):
+        return None
+    scored = risk_model.score_scene(scene['features'])
+    total = round(scored['final_score'] * 100 / RISK_SCALE_MAX)
+    return {
+        "scene_number": scene.get('scene_number', 0),
+        "total_risk_score": total,
+        "safety_score": scored['safety_score'],
+        "logistics_score": scored['logistics_score'],
+        "schedule_score": scored['schedule_score'],
+        "budget_score": scored['budget_score'],
+        "compliance_score": scored['compliance_score'],
+        "amplification_factor": scored['amplification_factor'],
+        "amplification_reason": scored['amplification_reason'],
+        "risk_drivers": scored['risk_drivers'] or ["standard"],
+        "recommendations": ["Standard safety protocols"] if total <= 50 else ["Specialized safety coordinator required"]
+    }
+
+
+def estimate_scene_features(scene: Dict) -> Optional[Dict]:
+    """Budget entry from the deterministic budget_estimator (None without features, datasets or costed features)"""
+    from app.config import settings
+    
+    _, budget_model = deterministic_scorers()
+    if budget_model is None or not scene.get('features'):
+        return None
+    estimate = budget_model.estimate_scene_budget(scene['features'], settings.budget_base_city, settings.budget_scale)
+    if not estimate['cost_likely']:
+        return None
+    return {
+        "scene_number": scene.get('scene_number', 0),
+        "cost_min": estimate['cost_min'],
+        "cost_likely": estimate['cost_likely'],
+        "cost_max": estimate['cost_max'],
+        "line_items": [
+            {"department": item['department'], "cost": item['final_cost'],
+             "reasoning": f"{item['feature']} (×{item['multiplier']})"}
+            for item in estimate['line_items']
+        ],
+        "volatility_drivers": estimate['volatility_drivers'] or ["weather", "permits"]
+    }
+
+
+class SceneFeatureExtractorAgent:
+    """Structured per-scene features (SceneExtractionData) with AI + keyword fallback"""
+    
+    def __init__(self, llm_client):
+        self.llm_client = llm_client
+    
+    async def extract_features(self, script_text: str, scenes: List[Dict], scene_index=None) -> Dict[str, Any]:
+        """
+        TRY: LLM on fixed-size batches of scene bodies → FALLBACK: Keyword features
+        
+        Every scene gets a validated SceneExtractionData dict in
+        scene['features'] (fields the LLM missed or got wrong are filled from
+        keywords with low confidence), so the deterministic scorers always
+        have real features to work with.
+        
+        Args:
+            script_text: Script (or sub-script) the scenes were extracted from
+            scenes: Extracted scenes; updated in place
+            scene_index: Headings of script_text (rescanned when None)
+        
+        Returns:
+            Result dict with per-scene features keyed by scene number
+        """
+        from app.config import settings
+        from app.services.scene_index import iter_scene_bodies, scan_scene_headings
+        
+        if scene_index is None:
+            scene_index = scan_scene_headings(script_text)
+        bodies = {}
+        for heading, body in iter_scene_bodies(script_text, scene_index):
+            bodies.setdefault(str(heading.scene_number), body)
+        
+        llm_features: Dict[str, Dict] = {}
+        ai_used = False
+        pending = [scene for scene in scenes if not scene.get('features')]
+        
+        # ═══ PHASE 1: TRY AI ON BATCHES OF SCENES ═══
+        if llm_available(self.llm_client) and pending:
+            batch_size = max(1, settings.scene_feature_batch_size)
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            logger.info(f"📞 SceneFeatureExtractor: {len(pending)} scenes in {len(batches)} batch(es)...")
+            
+            semaphore = asyncio.Semaphore(max(1, settings.scene_feature_max_concurrent))
+            batch_results = await asyncio.gather(*[
+                self._extract_batch(batch, bodies, semaphore) for batch in batches
+            ])
+            for batch_features in batch_results:
+                llm_features.update(batch_features)
+            ai_used = bool(llm_features)
+        
+        # ═══ PHASE 2: VALIDATE, FILLING GAPS FROM KEYWORDS ═══
+        validated = fallback_fields = 0
+        for scene in pending:
+            key = str(scene.get('scene_number'))
+            features, filled = self._validate_features(
+                llm_features.get(key, {}), self._keyword_features(scene, bodies.get(key, ""))
+            )
+            scene['features'] = features
+            fallback_fields += filled
+            validated += key in llm_features
+        
+        logger.info(
+            f"✅ SceneFeatureExtractor: {validated}/{len(pending)} scenes from AI, "
+            f"{fallback_fields} field(s) filled from keywords"
+        )
+        return {
+            "features": {str(scene.get('scene_number')): scene['features'] for scene in scenes},
+            "ai_used": ai_used,
+            "confidence": 0.85 if ai_used else 0.5,
+            "agent_name": "SceneFeatureExtractorAgent",
+            "ai_scenes": validated,
+            "keyword_fields": fallback_fields
+        }
+    
+    async def _extract_batch(self, batch: List[Dict], bodies: Dict[str, str], semaphore: asyncio.Semaphore) -> Dict[str, Dict]:
+        """One prompt for a batch of scenes; returns {scene_number: raw fields} ({} on failure)"""
+        from app.config import settings
+        
+        prompt = self._build_prompt([
+            (str(scene.get('scene_number')), bodies.get(str(scene.get('scene_number'))) or scene.get('description', ''))
+            for scene in batch
+        ], settings.scene_feature_max_chars)
+        try:
+            async with semaphore:
+                response_text = await self._call_llm(prompt, settings.scene_window_output_tokens)
+        except Exception as e:
+            logger.error(f"❌ SceneFeatureExtractor AI call failed: {type(e).__name__}: {str(e)[:100]}")
+            return {}
+        
+        found = {}
+        for entry in self._parse_json_safely(response_text or ""):
+            if isinstance(entry, dict) and entry.get('scene_number') is not None:
+                found[str(entry.pop('scene_number')).strip()] = entry
+        return found
+    
+    async def _call_llm(self, prompt: str, max_tokens: int) -> str:
+        """Both clients (GeminiClient, Qwen3Client) share the async call_model interface"""
+        from app.utils.llm_telemetry import agent_scope
+        with agent_scope("SceneFeatureExtractor"):
+            return await self.llm_client.call_model(prompt, temperature=0.1, max_tokens=max_tokens)
+    
+    def _build_prompt(self, scenes: List[tuple], max_chars: int) -> str:
+        """Feature prompt for a batch of (scene_number, body) pairs"""
+        from app.models.schemas import SceneExtractionData
+        
+        fields = "\n".join(
+            f"- {name}: " + (" | ".join(FEATURE_CHOICES[name]) if name in FEATURE_CHOICES else {
+                "location": "the location name",
+                "talent_count": "number of speaking characters (integer)",
+                "extras_count": "number of background extras (integer)",
+                "hazards": "list of safety hazards (e.g. [\"fire\", \"heights\"]), [] if none",
+            }.get(name, "value"))
+            for name in SceneExtractionData.model_fields
+        )
+        body = "\n\n".join(f"SCENE {number}:\n{text[:max_chars]}" for number, text in scenes)
+        return f"""Extract production features for each of these {len(scenes)} film scenes. Return ONLY a JSON array with NO explanation.
+
+For EVERY scene return one object with "scene_number" (exactly as given) and these fields,
+each as {{"value": <value>, "confidence": <0.0-1.0>, "evidence": "<few words quoted from the scene>"}}:
+{fields}
+
+CRITICAL RULES:
+1. Use ONLY the listed values for enumerated fields
+2. Base every value on the scene text; use low confidence when guessing
+3. Return ONLY valid JSON array, nothing else
+
+{body}
+
+Return ONLY JSON array starting with [ and ending with ]"""
+    
+    def _validate_features(self, raw: Dict[str, Any], defaults: Dict[str, Dict]) -> tuple:
+        """
+        Validate LLM fields against SceneExtractionData
+        
+        Returns:
+            (features dict, number of fields taken from the keyword defaults)
+        """
+        from pydantic import ValidationError
+        from app.models.schemas import SceneExtractionData, SceneExtractionField
+        
+        fields = {}
+        filled = 0
+        for name in SceneExtractionData.model_fields:
+            data = raw.get(name)
+            if not isinstance(data, dict):
+                data = {"value": data, "confidence": 0.5} if data is not None else None
+            try:
+                if data is None:
+                    raise ValueError("missing")
+                field = SceneExtractionField.model_validate({"evidence": None, "reasoning": None, **data})
+                value = field.value
+                if name in FEATURE_CHOICES:
+                    value = str(value).strip().lower()
+                    if value not in FEATURE_CHOICES[name]:
+                        raise ValueError(f"{name}={value!r}")
+                elif name in ("talent_count", "extras_count"):
+                    value = max(0, int(value))
+                elif name == "hazards":
+                    value = [str(h) for h in value] if isinstance(value, list) else ([] if str(value).lower() in ("", "none") else [str(value)])
+                fields[name] = {**field.model_dump(), "value": value}
+            except (ValidationError, ValueError, TypeError):
+                fields[name] = defaults[name]
+                filled += 1
+        return SceneExtractionData.model_validate(fields).model_dump(), filled
+    
+    def _keyword_features(self, scene: Dict, body: str) -> Dict[str, Dict]:
+        """Low-confidence features from the heading and keywords (no LLM)"""
+        text = f"{scene.get('location', '')} {scene.get('description', '')} {body}".lower()
+        
+        def field(value, confidence=0.5):
+            return {"value": value, "confidence": confidence, "evidence": None, "reasoning": "keyword fallback"}
+        
+        features = {
+            "location": field(scene.get('location', 'Unknown Location'), 0.9),
+            "time_of_day": field("night" if "night" in str(scene.get('time_of_day', '')).lower() else "day", 0.9),
+        }
+        for name, levels in KEYWORD_FEATURES.items():
+            value = next((level for level, words in levels if any(re.search(rf"\b{w}\b", text) for w in words)), "none")
+            features[name] = field(value)
+        if features["crowd_size"]["value"] == "none":
+            features["crowd_size"] = field("small")
+        
+        exterior = bool(re.search(r"\bext\b", text))
+        features["weather_dependent"] = field("yes" if exterior and re.search(r"\b(rain|storm|snow|sunset|sunrise)\b", text) else "no")
+        features["permit_tier"] = field("2" if exterior else "1")
+        # Character cues: short all-caps lines inside the body
+        cues = {line.strip() for line in body.split("\n")[1:] if line.strip().isupper() and len(line.strip()) <= 30}
+        features["talent_count"] = field(len(cues))
+        features["extras_count"] = field({"large": 50, "medium": 15}.get(features["crowd_size"]["value"], 0))
+        features["hazards"] = field([w for w in HAZARD_KEYWORDS if re.search(rf"\b{w}\b", text)])
+        return features
+    
+    def _parse_json_safely(self, response_text):
+        """Safely extract JSON array from LLM response"""
+        try:
+            start = response_text.find('[')
+            end = response_text.rfind(']') + 1
+            if start >= 0 and end > start:
+                json_str = response_text[start:end]
+                return json.loads(json_str)
+        except:
+            pass
+        if response_text:
+            from app.utils.llm_telemetry import mark_parse_failure
+            mark_parse_failure()
+        return []
+
+
 # ════════════════════════════════════════════════════════════════
 # AGENT 2: RISK SCORER
 # ════════════════════════════════════════════════════════════════
@@ -319,19 +874,34 @@ Return ONLY JSON array starting with [ and ending with ]"""
 class RiskScorerAgent:
     """Analyze risks with AI for high-risk scenes + templates for others"""
     
+    # Scene fields shown to the LLM (see utils/prompt_format.py)
+    PROMPT_COLUMNS = ("n", "loc", "tod", "feat", "desc")
+    
     def __init__(self, llm_client):
         self.llm_client = llm_client
     
     async def analyze_risks(self, scenes: List[Dict]) -> Dict[str, Any]:
         """TRY: LLM for high-risk → FALLBACK: Templates"""
+        from app.utils.llm_telemetry import agent_scope
+        from app.utils.prompt_format import format_scene_table
         
-        # Estimate risks for triage
+        # Estimate risks for triage: deterministic scorer on extracted features
+        # when available, else feature (or keyword) flags
         risk_estimates = {}
+        deterministic = {}
         for scene in scenes:
+            scored = score_scene_features(scene)
+            if scored is not None:
+                deterministic[scene.get('scene_number', 0)] = scored
+                risk_estimates[scene.get('scene_number', 0)] = scored['total_risk_score']
+                continue
             risk_keywords = ['stunt', 'body', 'death', 'graveyard', 'burial', 'chase', 'crash', 'fight', 'fire']
             base_risk = 35
-            desc = str(scene).lower()
-            if any(kw in desc for kw in risk_keywords):
+            if scene.get('features'):
+                risky = bool(heavy_features(scene))
+            else:
+                risky = any(kw in scene_text_for_keywords(scene) for kw in risk_keywords)
+            if risky:
                 base_risk = 70
             if 'night' in scene.get('time_of_day', '').lower():
                 base_risk += 15
@@ -342,13 +912,14 @@ class RiskScorerAgent:
         ai_used = False
         
         # ═══ PHASE 1: TRY AI FOR HIGH-RISK ═══
-        if self.llm_client and len(high_risk_scenes) > 0:
+        if llm_available(self.llm_client) and len(high_risk_scenes) > 0:
             try:
                 logger.info(f"📞 RiskScorer: Calling LLM for {len(high_risk_scenes)} HIGH-RISK scenes...")
                 
+                scene_table = format_scene_table(high_risk_scenes[:5], self.PROMPT_COLUMNS)
                 prompt = f"""
                 Analyze these {len(high_risk_scenes)} HIGH-RISK scenes for production risks:
-                {json.dumps(high_risk_scenes[:5], indent=2)}
+{scene_table}
                 
                 Return JSON array. For each scene include:
                 - scene_number: <int>
@@ -368,7 +939,8 @@ class RiskScorerAgent:
                 - Indian production context (permits, logistics)
                 """
                 
-                response_text = await self.llm_client.call_model(prompt, temperature=0.4)
+                with agent_scope("RiskScorer"):
+                    response_text = await self.llm_client.call_model(prompt, temperature=0.4)
                 ai_scores = self._parse_json_safely(response_text)
                 
                 if ai_scores and len(ai_scores) > 0:
@@ -383,6 +955,9 @@ class RiskScorerAgent:
         for scene in scenes:
             if not any(r.get('scene_number') == scene.get('scene_number') for r in risk_results):
                 scene_num = scene.get('scene_number', 0)
+                if scene_num in deterministic:
+                    risk_results.append(deterministic[scene_num])
+                    continue
                 base_risk = risk_estimates.get(scene_num, 35)
                 risk_results.append({
                     "scene_number": scene_num,
@@ -413,6 +988,9 @@ class RiskScorerAgent:
                 return json.loads(json_str)
         except:
             pass
+        if response_text:
+            from app.utils.llm_telemetry import mark_parse_failure
+            mark_parse_failure()
         return []
 
 
@@ -423,12 +1001,16 @@ class RiskScorerAgent:
 class BudgetEstimatorAgent:
     """Estimate budgets with AI for complex scenes + rate card for others"""
     
+    PROMPT_COLUMNS = ("n", "loc", "tod", "feat", "desc")
+    
     def __init__(self, llm_client, rate_card_df=None):
         self.llm_client = llm_client
         self.rate_card_df = rate_card_df
     
     async def estimate_budget(self, scenes: List[Dict]) -> Dict[str, Any]:
         """TRY: LLM → FALLBACK: Rate card"""
+        from app.utils.llm_telemetry import agent_scope
+        from app.utils.prompt_format import format_scene_table
         
         budgets = []
         ai_used = False
@@ -437,13 +1019,14 @@ class BudgetEstimatorAgent:
         complex_scenes = [s for s in scenes if self._is_complex(s)]
         
         # ═══ PHASE 1: TRY AI FOR COMPLEX ═══
-        if self.llm_client and len(complex_scenes) > 0:
+        if llm_available(self.llm_client) and len(complex_scenes) > 0:
             try:
                 logger.info(f"📞 BudgetEstimator: Calling LLM for {len(complex_scenes)} complex scenes...")
                 
+                scene_table = format_scene_table(complex_scenes[:5], self.PROMPT_COLUMNS)
                 prompt = f"""
                 Estimate budgets for these {len(complex_scenes)} COMPLEX film scenes (Indian production):
-                {json.dumps(complex_scenes[:5], indent=2)}
+{scene_table}
                 
                 Return JSON array. For each scene include:
                 - scene_number: <int>
@@ -461,7 +1044,8 @@ class BudgetEstimatorAgent:
                 - Contingency (15-25%)
                 """
                 
-                response_text = await self.llm_client.call_model(prompt, temperature=0.4)
+                with agent_scope("BudgetEstimator"):
+                    response_text = await self.llm_client.call_model(prompt, temperature=0.4)
                 ai_budgets = self._parse_json_safely(response_text)
                 
                 if ai_budgets and len(ai_budgets) > 0:
@@ -475,7 +1059,7 @@ class BudgetEstimatorAgent:
         # ═══ PHASE 2: FALLBACK TO TEMPLATES ═══
         for scene in scenes:
             if not any(b.get('scene_number') == scene.get('scene_number') for b in budgets):
-                budgets.append(self._estimate_from_templates(scene))
+                budgets.append(estimate_scene_features(scene) or self._estimate_from_templates(scene))
         
         return {
             "budgets": budgets,
@@ -486,9 +1070,11 @@ class BudgetEstimatorAgent:
         }
     
     def _is_complex(self, scene):
-        """Determine if scene is complex"""
+        """Determine if scene is complex (extracted features, else keywords)"""
+        if scene.get('features'):
+            return bool(heavy_features(scene)) or scene_feature_value(scene, 'time_of_day') == 'night'
         complex_keywords = ['stunt', 'chase', 'night', 'graveyard', 'crowd', 'effect']
-        return any(kw in str(scene).lower() for kw in complex_keywords)
+        return any(kw in scene_text_for_keywords(scene) for kw in complex_keywords)
     
     def _estimate_from_templates(self, scene):
         """Use template budget estimation"""
@@ -519,6 +1105,9 @@ class BudgetEstimatorAgent:
                 return json.loads(json_str)
         except:
             pass
+        if response_text:
+            from app.utils.llm_telemetry import mark_parse_failure
+            mark_parse_failure()
         return []
 
 
@@ -529,11 +1118,17 @@ class BudgetEstimatorAgent:
 class CrossSceneAuditorAgent:
     """Find cross-scene patterns with AI + rule-based fallback"""
     
+    # Every high-risk scene is sent, so no descriptions: the risk score and
+    # features are what the patterns are found from
+    PROMPT_COLUMNS = ("n", "loc", "tod", "risk", "feat")
+    
     def __init__(self, llm_client):
         self.llm_client = llm_client
     
     async def find_insights(self, scenes: List[Dict], risks: List[Dict]) -> Dict[str, Any]:
         """TRY: LLM patterns → FALLBACK: Rule-based"""
+        from app.utils.llm_telemetry import agent_scope
+        from app.utils.prompt_format import format_scene_table
         
         insights = []
         ai_used = False
@@ -541,15 +1136,20 @@ class CrossSceneAuditorAgent:
         high_risk_scenes = [s for s in scenes if any(r.get('scene_number') == s.get('scene_number') and r.get('total_risk_score', 0) > 50 for r in risks)]
         
         # ═══ PHASE 1: TRY AI FOR PATTERNS ═══
-        if self.llm_client and len(high_risk_scenes) >= 2:
+        if llm_available(self.llm_client) and len(high_risk_scenes) >= 2:
             try:
                 logger.info("📞 CrossSceneAuditor: Calling LLM for pattern analysis...")
                 
+                risk_by_scene = {str(r.get('scene_number')): {"risk": r.get('total_risk_score', '')} for r in risks}
+                scene_table = format_scene_table(
+                    high_risk_scenes, self.PROMPT_COLUMNS, risk_by_scene, {"risk": "total risk score 0-100"}
+                )
                 prompt = f"""
                 Analyze cross-scene patterns in this film production:
                 - Total scenes: {len(scenes)}
                 - High-risk scenes: {len(high_risk_scenes)}
-                - Scenes: {json.dumps(high_risk_scenes, indent=2)}
+                - Scenes (script order):
+{scene_table}
                 
                 Identify patterns:
                 1. Location clustering
@@ -566,7 +1166,8 @@ class CrossSceneAuditorAgent:
                 - confidence: <0.0-1.0>
                 """
                 
-                response_text = await self.llm_client.call_model(prompt, temperature=0.4)
+                with agent_scope("CrossSceneAuditor"):
+                    response_text = await self.llm_client.call_model(prompt, temperature=0.4)
                 ai_insights = self._parse_json_safely(response_text)
                 
                 if ai_insights and len(ai_insights) > 0:
@@ -640,6 +1241,9 @@ class CrossSceneAuditorAgent:
                 return json.loads(json_str)
         except:
             pass
+        if response_text:
+            from app.utils.llm_telemetry import mark_parse_failure
+            mark_parse_failure()
         return []
 
 
@@ -655,6 +1259,7 @@ class MitigationPlannerAgent:
     
     async def generate_recommendations(self, scenes, risks, insights) -> Dict[str, Any]:
         """TRY: LLM recommendations → FALLBACK: Templates"""
+        from app.utils.llm_telemetry import agent_scope
         
         recommendations = []
         ai_used = False
@@ -662,7 +1267,7 @@ class MitigationPlannerAgent:
         high_risk = [r for r in risks if r.get('total_risk_score', 0) > 60]
         
         # ═══ PHASE 1: TRY AI ═══
-        if self.llm_client and len(high_risk) > 0:
+        if llm_available(self.llm_client) and len(high_risk) > 0:
             try:
                 logger.info("📞 MitigationPlanner: Calling LLM for recommendations...")
                 
@@ -681,7 +1286,8 @@ class MitigationPlannerAgent:
                 Focus on Indian production context (permits, logistics, safety).
                 """
                 
-                response_text = await self.llm_client.call_model(prompt, temperature=0.4)
+                with agent_scope("MitigationPlanner"):
+                    response_text = await self.llm_client.call_model(prompt, temperature=0.4)
                 recommendations = self._parse_json_safely(response_text)
                 
                 if recommendations and len(recommendations) > 0:
@@ -746,6 +1352,9 @@ class MitigationPlannerAgent:
                 return json.loads(json_str)
         except:
             pass
+        if response_text:
+            from app.utils.llm_telemetry import mark_parse_failure
+            mark_parse_failure()
         return []
 
 
@@ -783,55 +1392,301 @@ class FullAIEnhancedOrchestrator:
         self.gemini_client = self.llm_client
         self.safety_layer = AIAgentSafetyLayer()
     
-    async def run_pipeline_full_ai(self, project_id: str, script_text: str) -> Dict[str, Any]:
-        """Complete pipeline: Tier 1 → Tier 2 → Tier 3 with AI"""
+    async def run_pipeline_full_ai(
+        self, project_id: str, script_text: str, scene_index=None, revision=None, deadline_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Complete pipeline: Tier 1 → Tier 2 → Tier 3 with AI
+        
+        scene_index: Headings stored at ingestion (services/scene_index.py); when
+        given, regex extraction slices from it instead of rescanning the script.
+        revision: RevisionBaseline of the parent draft (services/revisions.py);
+        when given, unchanged scenes reuse the parent run's tier 1-2 results.
+        deadline_seconds: Overall budget for the LLM tiers (None/0 = unbounded),
+        split per TIER_DEADLINE_SHARES (utils/deadline.py). LLM calls time out
+        at their tier's deadline and spent tiers use their fallbacks.
+        """
+        from app.utils.deadline import pipeline_budget
+        
+        with pipeline_budget(deadline_seconds, TIER_DEADLINE_SHARES) as budget:
+            if budget is not None:
+                logger.info(f"⏱️ Run deadline: {deadline_seconds:.0f}s")
+            return await self._run_pipeline(project_id, script_text, scene_index, revision)
+    
+    async def _run_pipeline(self, project_id: str, script_text: str, scene_index, revision) -> Dict[str, Any]:
+        """run_pipeline_full_ai inside its deadline budget"""
+        
+        from app.config import settings
+        from app.utils.deadline import tier_scope
         
         logger.info("🚀 FULL AI PIPELINE STARTING")
         
-        # ═══ TIER 1: EXTRACT SCENES ═══
-        logger.info("⏸️ TIER 1: Scene Extraction (AI + Regex fallback)")
-        extractor = SceneExtractorAgent(self.gemini_client)
-        extraction_result = await self.safety_layer.execute_with_safety(
-            extractor, 'extract_scenes', script_text
+        if revision is not None and scene_index:
+            with tier_scope("extraction", "scoring"):
+                per_scene = await self._run_revision_tiers(script_text, scene_index, revision)
+            if per_scene is not None:
+                return await self._run_cross_scene_tiers(project_id, *per_scene)
+        
+        if settings.llm_stream_responses and llm_available(self.gemini_client) and settings.scene_extraction_mode != "regex":
+            with tier_scope("extraction", "scoring"):
+                per_scene = await self._run_streaming_tiers(script_text, scene_index)
+            return await self._run_cross_scene_tiers(project_id, *per_scene)
+        
+        with tier_scope("extraction"):
+            # ═══ TIER 1: EXTRACT SCENES ═══
+            logger.info("⏸️ TIER 1: Scene Extraction (AI + Regex fallback)")
+            extractor = SceneExtractorAgent(self.gemini_client)
+            extraction_result = await self.safety_layer.execute_with_safety(
+                extractor, 'extract_scenes', script_text, scene_index
+            )
+            scenes = extraction_result['scenes']
+            logger.info(f"✅ Extracted {len(scenes)} scenes (AI: {extraction_result['ai_used']})")
+            
+            # ═══ TIER 1B: STRUCTURED SCENE FEATURES ═══
+            await self._extract_features(script_text, scene_index, scenes)
+        
+        with tier_scope("scoring"):
+            # ═══ TIER 2: ANALYZE RISKS ═══
+            logger.info("⏸️ TIER 2: Risk Analysis (AI for high-risk, templates for others)")
+            risk_scorer = RiskScorerAgent(self.gemini_client)
+            risk_result = await self.safety_layer.execute_with_safety(
+                risk_scorer, 'analyze_risks', scenes
+            )
+            risks = risk_result['risks']
+            logger.info(f"✅ Analyzed risks (AI: {risk_result['ai_used']})")
+            
+            # ═══ TIER 2B: BUDGET ESTIMATION ═══
+            logger.info("⏸️ TIER 2B: Budget Estimation (AI for complex, templates for others)")
+            budget_estimator = BudgetEstimatorAgent(self.gemini_client)
+            budget_result = await self.safety_layer.execute_with_safety(
+                budget_estimator, 'estimate_budget', scenes
+            )
+            budgets = budget_result['budgets']
+            logger.info(f"✅ Estimated budgets (AI: {budget_result['ai_used']})")
+        
+        return await self._run_cross_scene_tiers(
+            project_id, scenes, risks, budgets, extraction_result, risk_result, budget_result
         )
-        scenes = extraction_result['scenes']
-        logger.info(f"✅ Extracted {len(scenes)} scenes (AI: {extraction_result['ai_used']})")
+    
+    async def _run_streaming_tiers(self, script_text: str, scene_index):
+        """
+        Tiers 1-2 overlapped: risk and budget scoring start on the first
+        extracted scenes while extraction is still running
+        
+        Scenes reported by the extractor's on_scene callback are scored in
+        batches of settings.stream_tier2_batch_size; once extraction returns,
+        any final scene not yet scored is scored too, and results for scenes
+        the final merge dropped are discarded.
+        
+        Returns:
+            (scenes, risks, budgets, extraction_result, risk_result, budget_result)
+        """
+        from app.config import settings
+        
+        from app.services.scene_index import scan_scene_headings
         
-        # ═══ TIER 2: ANALYZE RISKS ═══
-        logger.info("⏸️ TIER 2: Risk Analysis (AI for high-risk, templates for others)")
-        risk_scorer = RiskScorerAgent(self.gemini_client)
-        risk_result = await self.safety_layer.execute_with_safety(
-            risk_scorer, 'analyze_risks', scenes
+        batch_size = max(1, settings.stream_tier2_batch_size)
+        queue: asyncio.Queue = asyncio.Queue()
+        if scene_index is None:
+            # Scanned once here; every feature batch slices scene bodies from it
+            scene_index = scan_scene_headings(script_text)
+        
+        # ═══ TIER 1: EXTRACT SCENES (streamed) ═══
+        logger.info("⏸️ TIER 1 + 2: Scene Extraction with Risk/Budget scoring on early scenes")
+        extractor = SceneExtractorAgent(self.gemini_client)
+        extraction_task = asyncio.create_task(self.safety_layer.execute_with_safety(
+            extractor, 'extract_scenes', script_text, scene_index, on_scene=queue.put_nowait
+        ))
+        extraction_task.add_done_callback(lambda _: queue.put_nowait(None))
+        
+        # ═══ TIER 2: SCORE BATCHES AS THEY FILL ═══
+        scoring_tasks = []
+        scored = set()
+        pending: List[Dict] = []
+        early = 0
+        while True:
+            scene = await queue.get()
+            if scene is None:
+                break
+            number = scene.get('scene_number')
+            if number in (None, '') or str(number) in scored:
+                continue
+            scored.add(str(number))
+            pending.append(scene)
+            if len(pending) >= batch_size:
+                early += len(pending)
+                scoring_tasks.append(asyncio.create_task(self._score_scenes(pending, script_text, scene_index)))
+                pending = []
+        
+        extraction_result = await extraction_task
+        scenes = extraction_result['scenes']
+        logger.info(
+            f"✅ Extracted {len(scenes)} scenes (AI: {extraction_result['ai_used']}); "
+            f"{early} scored while extraction was running"
         )
-        risks = risk_result['risks']
-        logger.info(f"✅ Analyzed risks (AI: {risk_result['ai_used']})")
-        
-        # ═══ TIER 2B: BUDGET ESTIMATION ═══
-        logger.info("⏸️ TIER 2B: Budget Estimation (AI for complex, templates for others)")
-        budget_estimator = BudgetEstimatorAgent(self.gemini_client)
-        budget_result = await self.safety_layer.execute_with_safety(
-            budget_estimator, 'estimate_budget', scenes
+        
+        # Last partial batch plus final scenes never reported early (regex
+        # fallback, LLM scenes numbered during the merge)
+        order = {str(scene.get('scene_number')): i for i, scene in enumerate(scenes)}
+        pending = [scene for scene in pending if str(scene.get('scene_number')) in order]
+        pending += [scene for scene in scenes if str(scene.get('scene_number')) not in scored]
+        if pending:
+            scoring_tasks.append(asyncio.create_task(self._score_scenes(pending, script_text, scene_index)))
+        batches = await asyncio.gather(*scoring_tasks)
+        
+        # Keep results for final scenes only, in script order
+        def in_order(entries):
+            kept = [entry for entry in entries if str(entry.get('scene_number')) in order]
+            return sorted(kept, key=lambda entry: order[str(entry.get('scene_number'))])
+        
+        risk_ai = any(risk_part.get('ai_used') for risk_part, _ in batches)
+        budget_ai = any(budget_part.get('ai_used') for _, budget_part in batches)
+        risks = in_order([risk for risk_part, _ in batches for risk in risk_part.get('risks', [])])
+        budgets = in_order([budget for _, budget_part in batches for budget in budget_part.get('budgets', [])])
+        risk_result = {
+            "risks": risks,
+            "high_risk_count": sum(risk_part.get('high_risk_count', 0) for risk_part, _ in batches),
+            "ai_used": risk_ai,
+            "confidence": 0.88 if risk_ai else 0.70,
+            "agent_name": "RiskScorerAgent"
+        }
+        budget_result = {
+            "budgets": budgets,
+            "total_likely": sum(b.get('cost_likely', 0) for b in budgets),
+            "ai_used": budget_ai,
+            "confidence": 0.80 if budget_ai else 0.70,
+            "agent_name": "BudgetEstimatorAgent"
+        }
+        logger.info(f"✅ Scored {len(scenes)} scenes in {len(batches)} batch(es) (AI: risks {risk_ai}, budgets {budget_ai})")
+        return scenes, risks, budgets, extraction_result, risk_result, budget_result
+    
+    async def _score_scenes(self, scenes: List[Dict], script_text: str, scene_index) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Features, then risk and budget scoring (concurrently) for one batch of scenes"""
+        await self._extract_features(script_text, scene_index, scenes)
+        return await asyncio.gather(
+            self.safety_layer.execute_with_safety(RiskScorerAgent(self.gemini_client), 'analyze_risks', scenes),
+            self.safety_layer.execute_with_safety(BudgetEstimatorAgent(self.gemini_client), 'estimate_budget', scenes),
         )
-        budgets = budget_result['budgets']
-        logger.info(f"✅ Estimated budgets (AI: {budget_result['ai_used']})")
-        
-        # ═══ TIER 3: CROSS-SCENE INSIGHTS ═══
-        logger.info("⏸️ TIER 3: Cross-Scene Intelligence (AI + Rule-based patterns)")
-        auditor = CrossSceneAuditorAgent(self.gemini_client)
-        insights_result = await self.safety_layer.execute_with_safety(
-            auditor, 'find_insights', scenes, risks
+    
+    async def _extract_features(self, script_text: str, scene_index, scenes: List[Dict]) -> None:
+        """Tier 1B: attach SceneExtractionData features to each scene for tier 2 triage and scoring"""
+        from app.config import settings
+        
+        if not settings.scene_feature_extraction or not scenes:
+            return
+        logger.info(f"⏸️ TIER 1B: Scene Features for {len(scenes)} scenes (AI batches + keyword fallback)")
+        await self.safety_layer.execute_with_safety(
+            SceneFeatureExtractorAgent(self.gemini_client), 'extract_features', script_text, scenes, scene_index
         )
-        insights = insights_result['insights']
-        logger.info(f"✅ Found {len(insights)} insights (AI: {insights_result['ai_used']})")
-        
-        # ═══ TIER 3B: MITIGATION PLANNING ═══
-        logger.info("⏸️ TIER 3B: Mitigation Planning (AI + Templates)")
-        planner = MitigationPlannerAgent(self.gemini_client)
-        mitigation_result = await self.safety_layer.execute_with_safety(
-            planner, 'generate_recommendations', scenes, risks, insights
+    
+    async def _run_revision_tiers(self, script_text: str, scene_index, revision):
+        """
+        Tiers 1-2 for a revised draft: only added/changed scenes are analyzed
+        
+        Returns:
+            (scenes, risks, budgets, extraction_result, risk_result, budget_result, revision_summary),
+            or None when no scene can be reused (caller runs the full pipeline)
+        """
+        from app.services.revisions import changed_subscript, plan_revision
+        
+        plan = plan_revision(script_text, scene_index, revision)
+        summary = plan.summary(revision)
+        if not plan.carried:
+            logger.info("🔁 REVISION: No unchanged scenes - running the full pipeline")
+            return None
+        logger.info(
+            f"🔁 REVISION of {revision.parent_document_id}: reusing {len(plan.carried)} scenes, "
+            f"re-analyzing {len(plan.changed)}, {plan.removed} removed"
         )
-        recommendations = mitigation_result['recommendations']
-        logger.info(f"✅ Generated {len(recommendations)} recommendations (AI: {mitigation_result['ai_used']})")
+        
+        empty = {'ai_used': False}
+        extraction_result, risk_result, budget_result = dict(empty), dict(empty), dict(empty)
+        slots: Dict[int, List[Dict]] = {}
+        new_risks: List[Dict] = []
+        new_budgets: List[Dict] = []
+        
+        if plan.changed:
+            # ═══ TIER 1: EXTRACT CHANGED SCENES ═══
+            logger.info(f"⏸️ TIER 1: Scene Extraction for {len(plan.changed)} added/changed scenes")
+            sub_text, sub_index = changed_subscript(script_text, scene_index, plan.changed)
+            extractor = SceneExtractorAgent(self.gemini_client)
+            extraction_result = await self.safety_layer.execute_with_safety(
+                extractor, 'extract_scenes', sub_text, sub_index
+            )
+            
+            # Put extracted scenes back at their heading's position; extra
+            # scenes the LLM found follow the heading they were found after
+            position_by_number = {str(scene_index[position].scene_number): position for position in plan.changed}
+            current = plan.changed[0]
+            changed_scenes = extraction_result['scenes']
+            for scene in changed_scenes:
+                current = position_by_number.get(str(scene.get('scene_number')), current)
+                slots.setdefault(current, []).append(scene)
+            
+            # ═══ TIER 1B: FEATURES FOR CHANGED SCENES ═══
+            await self._extract_features(sub_text, sub_index, changed_scenes)
+            
+            # ═══ TIER 2: RISKS + BUDGETS FOR CHANGED SCENES ═══
+            logger.info("⏸️ TIER 2: Risk + Budget Analysis for added/changed scenes")
+            risk_result = await self.safety_layer.execute_with_safety(
+                RiskScorerAgent(self.gemini_client), 'analyze_risks', changed_scenes
+            )
+            budget_result = await self.safety_layer.execute_with_safety(
+                BudgetEstimatorAgent(self.gemini_client), 'estimate_budget', changed_scenes
+            )
+            new_risks = risk_result.get('risks', [])
+            new_budgets = budget_result.get('budgets', [])
+        
+        scenes, risks, budgets = [], [], []
+        for position in range(len(scene_index)):
+            if position in plan.carried:
+                scene, risk, budget = plan.carried[position]
+                scenes.append(scene)
+                risks.append(risk)
+                budgets.append(budget)
+            else:
+                scenes.extend(slots.get(position, []))
+        
+        # Keep tier 2 results in script order
+        order = {str(scene.get('scene_number')): i for i, scene in enumerate(scenes)}
+        risks = sorted(risks + new_risks, key=lambda r: order.get(str(r.get('scene_number')), len(order)))
+        budgets = sorted(budgets + new_budgets, key=lambda b: order.get(str(b.get('scene_number')), len(order)))
+        
+        logger.info(f"✅ Merged {len(scenes)} scenes ({len(plan.carried)} reused)")
+        return scenes, risks, budgets, extraction_result, risk_result, budget_result, summary
+    
+    async def _run_cross_scene_tiers(
+        self,
+        project_id: str,
+        scenes: List[Dict],
+        risks: List[Dict],
+        budgets: List[Dict],
+        extraction_result: Dict[str, Any],
+        risk_result: Dict[str, Any],
+        budget_result: Dict[str, Any],
+        revision_summary: Dict[str, Any] = None,
+    ) -> Dict[str, Any]:
+        """Tiers 3-4 and final assembly, always computed from the full scene set"""
+        from app.utils.deadline import tier_scope
+        
+        with tier_scope("cross_scene"):
+            # ═══ TIER 3: CROSS-SCENE INSIGHTS ═══
+            logger.info("⏸️ TIER 3: Cross-Scene Intelligence (AI + Rule-based patterns)")
+            auditor = CrossSceneAuditorAgent(self.gemini_client)
+            insights_result = await self.safety_layer.execute_with_safety(
+                auditor, 'find_insights', scenes, risks
+            )
+            insights = insights_result['insights']
+            logger.info(f"✅ Found {len(insights)} insights (AI: {insights_result['ai_used']})")
+            
+            # ═══ TIER 3B: MITIGATION PLANNING ═══
+            logger.info("⏸️ TIER 3B: Mitigation Planning (AI + Templates)")
+            planner = MitigationPlannerAgent(self.gemini_client)
+            mitigation_result = await self.safety_layer.execute_with_safety(
+                planner, 'generate_recommendations', scenes, risks, insights
+            )
+            recommendations = mitigation_result['recommendations']
+            logger.info(f"✅ Generated {len(recommendations)} recommendations (AI: {mitigation_result['ai_used']})")
         
         # ═══ TIER 4: BUDGET OPTIMIZATION (NEW) ═══
         logger.info("⏸️ TIER 4: Budget Optimization Engine (NEW!)")
@@ -1014,6 +1869,8 @@ class FullAIEnhancedOrchestrator:
             "LAYER_12_executive_summary": executive_summary,
             "generated_at": datetime.utcnow().isoformat()
         }
+        if revision_summary:
+            enhanced_output["revision"] = revision_summary
         
         logger.info("🎉 FULL AI PIPELINE COMPLETED")
         return enhanced_output
@@ -1,18 +1,24 @@
 """
 Runs API Router - Direct pipeline execution from document
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import logging
 import uuid
 from datetime import datetime
 import asyncio
+from typing import Optional
 
 from app.database import get_db
-from app.models.database import Document, Run, Job, RunStatus
+from app.models.database import Document, DocumentStatus, Run, Job, RunStatus
 from app.models.schemas import RunStatusResponse
 from app.config import settings
+from app.services.document_text import read_full_text
+from app.services.documents import resolve_canonical
+from app.services.revisions import load_revision_baseline
+from app.services.scene_index import build_scene_index, get_scene_index, load_scene_index
+from app.utils.llm_telemetry import RunTelemetry, run_telemetry
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -231,6 +237,8 @@ async def _store_pipeline_results(run_id: str, result: dict, session: AsyncSessi
 @router.post("/{document_id}/start", response_model=RunStatusResponse, status_code=status.HTTP_202_ACCEPTED)
 async def start_run(
     document_id: str,
+    incremental: bool = True,
+    deadline_seconds: Optional[float] = Query(None, ge=0),
     session: AsyncSession = Depends(get_db)
 ):
     """
@@ -238,13 +246,17 @@ async def start_run(
     
     **Args:**
     - document_id: UUID of the uploaded script
+    - incremental: For a revised draft (uploaded with `parent_document_id`),
+      reuse the parent's latest run for unchanged scenes (default true)
+    - deadline_seconds: Time budget for the LLM tiers; once spent, agents use
+      their template/rule fallbacks (default settings.run_deadline_seconds, 0 = none)
     
     **Returns:** Run ID + status
     
     **Workflow:**
     1. Validates document exists
     2. Creates Run record
-    3. Executes pipeline
+    3. Executes pipeline (only added/changed scenes for revised drafts)
     4. Stores results
     """
     try:
@@ -260,12 +272,40 @@ async def start_run(
                 detail=f"Document {document_id} not found"
             )
         
-        if not document.text_content:
+        # Re-uploads share the canonical document's extracted text
+        canonical = await resolve_canonical(session, document)
+        
+        if canonical.status == DocumentStatus.EXTRACTING:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Document is still extracting ({canonical.pages_done or 0}/{canonical.page_count or '?'} pages)"
+            )
+        
+        if canonical.status == DocumentStatus.FAILED:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Text extraction failed: {canonical.extraction_error}"
+            )
+        
+        script_text = await read_full_text(session, canonical)
+        
+        if not script_text:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Document has no text content"
             )
         
+        # Scene headings are indexed at ingestion; backfill documents that predate it
+        scene_index = await get_scene_index(session, canonical)
+        if scene_index is None:
+            rows = await asyncio.to_thread(build_scene_index, script_text)
+            canonical.scene_index_json = rows
+            canonical.scene_count = len(rows)
+            scene_index = load_scene_index(rows)
+        
+        # Revised drafts diff against the parent draft's latest run
+        revision = await load_revision_baseline(session, document) if incremental else None
+        
         # Create run
         run = Run(
             id=str(uuid.uuid4()),
@@ -282,11 +322,16 @@ async def start_run(
         
         # Execute pipeline synchronously
         if orchestrator:
+            telemetry = RunTelemetry()
             try:
-                result = await orchestrator.run_pipeline_full_ai(
-                    document_id, 
-                    document.text_content
-                )
+                with run_telemetry(telemetry):
+                    result = await orchestrator.run_pipeline_full_ai(
+                        document_id, 
+                        script_text,
+                        scene_index=scene_index,
+                        revision=revision,
+                        deadline_seconds=settings.run_deadline_seconds if deadline_seconds is None else deadline_seconds
+                    )
                 
                 # Store results
                 await _store_pipeline_results(run.id, result, session)
@@ -294,6 +339,7 @@ async def start_run(
                 # Update run status
                 run.status = RunStatus.COMPLETED
                 run.completed_at = datetime.utcnow()
+                run.llm_telemetry_json = telemetry.summary()
                 await session.commit()
                 
                 logger.info(f"✅ Run completed: {run.id}")
@@ -302,14 +348,23 @@ async def start_run(
                 logger.error(f"❌ Pipeline execution failed: {e}")
                 run.status = RunStatus.FAILED
                 run.error_message = str(e)
+                run.llm_telemetry_json = telemetry.summary()
                 await session.commit()
+            
+            total = telemetry.summary()["total"]
+            logger.info(
+                f"📡 Run {run.id} LLM calls: {total['calls']} ({total['cache_hits']} cached), "
+                f"{total['prompt_tokens'] + total['completion_tokens']:,} tokens, "
+                f"{total['latency_seconds']:.1f}s upstream"
+            )
         
         return RunStatusResponse(
             run_id=run.id,
             document_id=document_id,
             status=run.status.value,
             started_at=run.started_at,
-            completed_at=run.completed_at
+            completed_at=run.completed_at,
+            llm_telemetry=run.llm_telemetry_json
         )
         
     except HTTPException:
@@ -348,7 +403,8 @@ async def get_run_status(
             status=run.status.value,
             started_at=run.started_at,
             completed_at=run.completed_at,
-            error=run.error_message
+            error=run.error_message,
+            llm_telemetry=run.llm_telemetry_json
         )
         
     except HTTPException:
@@ -1,19 +1,29 @@
 """
 File Upload API Router - Direct script upload (no project needed)
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Tuple
+import asyncio
+import json
 import logging
 import uuid
 from pathlib import Path
-import pdfplumber
-from docx import Document as DocxDocument
 
-from app.database import get_db
-from app.models.database import Document
+from app.database import get_db, AsyncSessionLocal
+from app.models.database import Document, DocumentStatus, Run
 from app.models.schemas import UploadResponse
 from app.config import settings
+from app.services.storage import stream_upload_to_temp, UploadTooLargeError
+from app.services.document_text import text_length
+from app.services.documents import (
+    find_by_content_hash, resolve_canonical, make_alias, remove_document
+)
+from app.services.ingestion import ingestion_queue
+from app.services.retention import delete_runs, remove_files
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -22,106 +32,163 @@ UPLOAD_DIR = Path(settings.storage_path) / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def extract_text_from_pdf(file_path: str) -> tuple[str, int]:
-    """Extract text and page count from PDF"""
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text() + "\n"
-            return text, len(pdf.pages)
-    except Exception as e:
-        logger.error(f"PDF extraction error: {e}")
-        raise
+async def _store_alias(
+    session: AsyncSession,
+    canonical: Document,
+    document_id: str,
+    filename: str,
+    parent_document_id: Optional[str] = None
+) -> Tuple[UploadResponse, Optional[asyncio.Task]]:
+    """Create a document id aliased to an already-stored upload"""
+    # A previous upload of this content failed to extract - try again
+    if canonical.status == DocumentStatus.FAILED:
+        canonical.status = DocumentStatus.EXTRACTING
+        canonical.pages_done = 0
+        canonical.extraction_error = None
+    
+    document = make_alias(canonical, document_id, filename)
+    document.parent_document_id = parent_document_id
+    session.add(document)
+    await session.commit()
+    await session.refresh(document)
+    
+    task = None
+    if canonical.status == DocumentStatus.EXTRACTING:
+        task = ingestion_queue.submit(canonical.id)
+    
+    logger.info(f"♻️ Duplicate upload: {document_id} - {filename} aliased to {canonical.id}")
+    
+    return UploadResponse(
+        document_id=document_id,
+        filename=filename,
+        format=document.format,
+        page_count=canonical.page_count,
+        uploaded_at=document.uploaded_at,
+        status=(canonical.status or DocumentStatus.READY).value,
+        duplicate_of=canonical.id,
+        parent_document_id=parent_document_id
+    ), task
 
 
-def extract_text_from_docx(file_path: str) -> tuple[str, int]:
-    """Extract text and page count from DOCX"""
+async def _ingest_upload(
+    session: AsyncSession,
+    file: UploadFile,
+    parent_document_id: Optional[str] = None
+) -> Tuple[UploadResponse, Optional[asyncio.Task]]:
+    """
+    Validate, store and queue extraction for one uploaded file
+    
+    Args:
+        session: Database session
+        file: Uploaded file
+        parent_document_id: Draft this upload revises, if any
+    
+    Returns:
+        (upload response, extraction task or None if nothing to extract)
+    
+    Raises:
+        HTTPException: 400 for unsupported formats or an unknown parent, 413 for oversized files
+    """
+    # Validate file format
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext not in ['.pdf', '.docx']:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only PDF and DOCX files are supported"
+        )
+    
+    if parent_document_id and await session.get(Document, parent_document_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Parent document {parent_document_id} not found"
+        )
+    
+    # Stream file to a temp file, enforcing the size limit as bytes arrive
+    document_id = str(uuid.uuid4())
     try:
-        doc = DocxDocument(file_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        estimated_pages = max(1, len(text) // 3000)
-        return text, estimated_pages
-    except Exception as e:
-        logger.error(f"DOCX extraction error: {e}")
-        raise
+        stored = await stream_upload_to_temp(file, UPLOAD_DIR)
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds limit of {settings.upload_max_size_mb}MB"
+        )
+    
+    # Duplicate content: alias the existing document, no save or parse
+    canonical = await find_by_content_hash(session, stored.sha256)
+    if canonical:
+        stored.discard()
+        return await _store_alias(session, canonical, document_id, file.filename, parent_document_id)
+    
+    file_path = stored.commit(UPLOAD_DIR / f"{document_id}{file_ext}")
+    file_format = file_ext.lstrip('.')
+    
+    # Store in database - text is filled in by the extraction job
+    document = Document(
+        id=document_id,
+        filename=file.filename,
+        file_path=str(file_path),
+        format=file_format,
+        content_hash=stored.sha256,
+        parent_document_id=parent_document_id,
+        status=DocumentStatus.EXTRACTING,
+        pages_done=0
+    )
+    
+    session.add(document)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Lost a race with an identical concurrent upload - alias the winner
+        await session.rollback()
+        file_path.unlink(missing_ok=True)
+        canonical = await find_by_content_hash(session, stored.sha256)
+        if not canonical:
+            raise
+        return await _store_alias(session, canonical, document_id, file.filename, parent_document_id)
+    await session.refresh(document)
+    
+    # Extract text in the background (process pool, progress on the row)
+    task = ingestion_queue.submit(document_id)
+    
+    logger.info(f"✅ Script uploaded: {document_id} - {file.filename} (extracting)")
+    
+    return UploadResponse(
+        document_id=document_id,
+        filename=file.filename,
+        format=file_format,
+        page_count=None,
+        uploaded_at=document.uploaded_at,
+        status=DocumentStatus.EXTRACTING.value,
+        parent_document_id=parent_document_id
+    ), task
 
 
 # ============== UPLOAD SCRIPT (NO PROJECT NEEDED) ==============
 @router.post("/upload", response_model=UploadResponse)
 async def upload_script(
     file: UploadFile = File(...),
+    parent_document_id: Optional[str] = Form(None),
     session: AsyncSession = Depends(get_db)
 ):
     """
     Upload a film script directly (PDF or DOCX)
-    No project creation needed - ready to analyze immediately!
+    No project creation needed - returns as soon as the file is stored!
+    
+    Text extraction runs as a background job; poll `GET /scripts/{id}`
+    until `status` is `ready` before starting a run.
     
     **Args:**
     - file: Script file (PDF or DOCX)
+    - parent_document_id: Optional id of the draft this file revises; runs
+      on the new draft then only re-analyze added or changed scenes
     
-    **Returns:** Document ID + upload details
+    **Returns:** Document ID + upload details (status `extracting`)
     **Supported:** .pdf, .docx
     **Max size:** 100 MB
     """
     try:
-        # Validate file format
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in ['.pdf', '.docx']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Only PDF and DOCX files are supported"
-            )
-        
-        # Validate file size
-        file_size_mb = len(await file.read()) / (1024 * 1024)
-        await file.seek(0)
-        
-        if file_size_mb > settings.upload_max_size_mb:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File exceeds limit of {settings.upload_max_size_mb}MB"
-            )
-        
-        # Save file
-        document_id = str(uuid.uuid4())
-        file_path = UPLOAD_DIR / f"{document_id}{file_ext}"
-        
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Extract text
-        if file_ext == '.pdf':
-            text_content, page_count = extract_text_from_pdf(str(file_path))
-            file_format = "pdf"
-        else:
-            text_content, page_count = extract_text_from_docx(str(file_path))
-            file_format = "docx"
-        
-        # Store in database
-        document = Document(
-            id=document_id,
-            filename=file.filename,
-            file_path=str(file_path),
-            format=file_format,
-            text_content=text_content,
-            page_count=page_count
-        )
-        
-        session.add(document)
-        await session.commit()
-        await session.refresh(document)
-        
-        logger.info(f"✅ Script uploaded: {document_id} - {file.filename} ({page_count} pages)")
-        
-        return UploadResponse(
-            document_id=document_id,
-            filename=file.filename,
-            format=file_format,
-            page_count=page_count,
-            uploaded_at=document.uploaded_at
-        )
+        response, _ = await _ingest_upload(session, file, parent_document_id)
+        return response
         
     except HTTPException:
         raise
@@ -134,6 +201,82 @@ async def upload_script(
         )
 
 
+# ============== BATCH UPLOAD ==============
+async def _batch_result(index: int, filename: str, response: UploadResponse, task: Optional[asyncio.Task]) -> dict:
+    """Wait for a batch file's extraction (without cancelling it) and describe the outcome"""
+    if task is not None:
+        # asyncio.wait never cancels the job, even if the client disconnects
+        await asyncio.wait([task])
+    
+    async with AsyncSessionLocal() as session:
+        document = await session.get(Document, response.document_id)
+        if document is None:
+            return {"index": index, "filename": filename, "document_id": response.document_id,
+                    "status": "deleted", "error": "Document was deleted during extraction"}
+        canonical = await resolve_canonical(session, document)
+        doc_status = canonical.status or DocumentStatus.READY
+        return {
+            "index": index,
+            "filename": filename,
+            "document_id": document.id,
+            "status": doc_status.value,
+            "page_count": canonical.page_count,
+            "scene_count": canonical.scene_count,
+            "duplicate_of": document.canonical_id,
+            "error": canonical.extraction_error,
+        }
+
+
+@router.post("/upload/batch")
+async def upload_scripts_batch(
+    files: List[UploadFile] = File(...),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Upload many scripts at once (e.g. onboarding a slate of drafts)
+    
+    Every file is streamed to disk and queued first; extraction then runs
+    concurrently under the global ingestion limit
+    (`INGESTION_MAX_CONCURRENT`). The response is NDJSON with one line per file,
+    written as soon as that file is ready, failed or rejected.
+    
+    **Args:**
+    - files: Script files (PDF or DOCX), up to `UPLOAD_BATCH_MAX_FILES`
+    
+    **Returns:** `application/x-ndjson` lines with index, filename,
+    document_id, status (`ready` / `failed` / `rejected`), page_count,
+    scene_count, duplicate_of and error
+    """
+    if len(files) > settings.upload_batch_max_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.upload_batch_max_files} files per batch"
+        )
+    
+    rejected, accepted = [], []
+    for index, file in enumerate(files):
+        try:
+            response, task = await _ingest_upload(session, file)
+            accepted.append((index, file.filename, response, task))
+        except HTTPException as e:
+            rejected.append({"index": index, "filename": file.filename, "status": "rejected", "error": e.detail})
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"❌ Batch upload failed for {file.filename}: {e}")
+            rejected.append({"index": index, "filename": file.filename, "status": "rejected", "error": str(e)})
+    
+    logger.info(f"📦 Batch upload: {len(accepted)} accepted, {len(rejected)} rejected")
+    
+    async def stream_results():
+        for line in rejected:
+            yield json.dumps(line) + "\n"
+        pending = [_batch_result(*item) for item in accepted]
+        for next_result in asyncio.as_completed(pending):
+            yield json.dumps(await next_result, default=str) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 # ============== GET SCRIPT ==============
 @router.get("/{document_id}")
 async def get_script(
@@ -155,13 +298,25 @@ async def get_script(
                 detail=f"Document {document_id} not found"
             )
         
+        canonical = await resolve_canonical(session, document)
+        doc_status = canonical.status or DocumentStatus.READY
+        page_count = canonical.page_count
+        pages_done = page_count if doc_status == DocumentStatus.READY else (canonical.pages_done or 0)
+        
         return {
             "id": document.id,
             "filename": document.filename,
             "format": document.format,
-            "page_count": document.page_count,
+            "status": doc_status.value,
+            "page_count": page_count,
+            "pages_done": pages_done,
+            "progress_percent": int(100 * pages_done / page_count) if page_count else 0,
+            "error": canonical.extraction_error,
             "uploaded_at": document.uploaded_at,
-            "text_length": len(document.text_content) if document.text_content else 0
+            "text_length": await text_length(session, canonical),
+            "scene_count": canonical.scene_count,
+            "duplicate_of": document.canonical_id,
+            "parent_document_id": document.parent_document_id
         }
         
     except HTTPException:
@@ -195,16 +350,24 @@ async def delete_script(
                 detail=f"Document {document_id} not found"
             )
         
-        # Delete file
-        try:
-            Path(document.file_path).unlink()
-        except:
-            logger.warning(f"Could not delete file: {document.file_path}")
+        # Delete the document's runs (scenes, risks, costs, reports...) first
+        run_ids = (await session.execute(
+            select(Run.id).where(Run.document_id == document_id)
+        )).scalars().all()
+        report_files = await session.run_sync(delete_runs, run_ids)
         
-        # Delete from database
-        await session.delete(document)
+        # Delete from database (aliases keep shared content alive)
+        delete_file = await remove_document(session, document)
         await session.commit()
         
+        # Delete files once no row references them
+        remove_files(report_files)
+        if delete_file:
+            try:
+                Path(document.file_path).unlink()
+            except:
+                logger.warning(f"Could not delete file: {document.file_path}")
+        
         logger.info(f"🗑️ Document deleted: {document_id}")
         
     except HTTPException:
@@ -12,6 +12,7 @@ from datetime import datetime
 from app.database import get_db
 from app.models.database import Run, Scene, SceneExtraction, SceneRisk, SceneCost, RunStatus
 from app.models.schemas import WhatIfRequest, WhatIfResponse
+from app.utils.llm_telemetry import agent_scope, mark_parse_failure
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -159,7 +160,8 @@ Consider:
 """
         
         # Fix: Use call_model() method (async for Qwen3)
-        response = await llm_client.call_model(prompt)
+        with agent_scope("WhatIfRisk"):
+            response = await llm_client.call_model(prompt)
         
         # Fix: Extract JSON from response text with sanitization for + signs
         try:
@@ -172,9 +174,11 @@ Consider:
                 analysis = json.loads(json_str)
             else:
                 logger.warning("No JSON found in Qwen3 response, using fallback")
+                mark_parse_failure()
                 return simulate_risk_change(old_extraction, new_extraction, old_risk), "JSON parse error"
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error: {e}, response: {response[:200]}")
+            mark_parse_failure()
             return simulate_risk_change(old_extraction, new_extraction, old_risk), "JSON parse error"
         
         # Apply LLM-calculated deltas
@@ -298,7 +302,8 @@ Consider:
 """
         
         # Fix: Use call_model() method (async for Qwen3)
-        response = await llm_client.call_model(prompt)
+        with agent_scope("WhatIfBudget"):
+            response = await llm_client.call_model(prompt)
         
         # Fix: Extract JSON from response text with sanitization for + signs
         try:
@@ -311,9 +316,11 @@ Consider:
                 analysis = json.loads(json_str)
             else:
                 logger.warning("No JSON found in Qwen3 response, using fallback")
+                mark_parse_failure()
                 return simulate_budget_change(old_extraction, new_extraction, old_budget), "JSON parse error"
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error: {e}, response: {response[:200]}")
+            mark_parse_failure()
             return simulate_budget_change(old_extraction, new_extraction, old_budget), "JSON parse error"
         
         # Apply LLM-calculated deltas
@@ -514,7 +521,8 @@ async def run_whatif_analysis(
 - Feasibility change: {feasibility_delta*100:.1f}%
 Provide a 1-2 sentence executive summary."""
                 # Fix: Use call_model() method (async for Qwen3)
-                llm_reasoning = await llm_client.call_model(reasoning_prompt)
+                with agent_scope("WhatIfSummary"):
+                    llm_reasoning = await llm_client.call_model(reasoning_prompt)
             except Exception as e:
                 logger.warning(f"Could not generate overall reasoning: {e}")
         
@@ -32,6 +32,27 @@ class Settings(BaseSettings):
     qwen3_base_url: str = "http://localhost:1234/v1"
     qwen3_model: str = "qwen3"
     qwen3_api_key: str = "lm-studio"  # Dummy key for local use
+    llm_http_pool_size: int = 100  # Connections kept by each client's pooled session
+    llm_http_pool_per_host: int = 32  # ...of which to one host (LM Studio)
+    llm_http_keepalive_seconds: float = 60.0  # Idle time before a pooled connection is closed
+    llm_http_dns_cache_seconds: int = 300
+    
+    # LLM response cache (utils/llm_cache.py)
+    llm_cache_enabled: bool = True
+    llm_cache_memory_entries: int = 512  # L1: responses kept in memory
+    llm_cache_disk_max_mb: float = 256  # L2: SQLite payload cap before LRU eviction
+    llm_cache_ttl_hours: float = 168  # Entries older than this are misses (0 = never expire)
+    
+    # Process-wide LLM limiter (utils/llm_limiter.py), per provider; 0 = unlimited
+    qwen3_max_in_flight: int = 4  # Concurrent requests to LM Studio
+    qwen3_requests_per_second: float = 0.0
+    qwen3_tokens_per_second: float = 0.0  # Estimated prompt + response tokens
+    gemini_max_in_flight: int = 8
+    gemini_requests_per_second: float = 0.0  # gemini_request_delay still spaces request starts
+    gemini_tokens_per_second: float = 0.0
+    llm_breaker_failure_threshold: int = 3  # Consecutive failures that open an endpoint's circuit
+    llm_breaker_cooldown_seconds: float = 30.0  # Open time before a half-open probe call
+    run_deadline_seconds: float = 90.0  # LLM tier budget for interactive runs (POST /runs/{id}/start); 0 = none
     
     # RAG / Vector DB
     qdrant_url: str = "http://localhost:6333"
@@ -40,6 +61,45 @@ class Settings(BaseSettings):
     # Storage
     storage_path: str = "./storage"
     upload_max_size_mb: int = 100
+    upload_chunk_size_kb: int = 1024  # Streamed upload read size
+    upload_batch_max_files: int = 50  # Files accepted by POST /scripts/upload/batch
+    extraction_workers: int = 4  # Process pool size for PDF/DOCX parsing
+    extraction_pages_per_shard: int = 16  # Progress granularity for PDF jobs
+    ingestion_max_concurrent: int = 2  # Documents extracted at the same time
+    
+    # LLM scene extraction
+    scene_extraction_mode: str = "hybrid"  # hybrid (regex + LLM for ambiguous segments), llm (windowed) or regex
+    scene_gap_tokens: int = 2000  # Hybrid: heading-free stretches longer than this go to the LLM
+    scene_suspect_context_lines: int = 2  # Hybrid: context around a malformed heading line
+    scene_window_tokens: int = 6000  # Script tokens per extraction prompt
+    scene_window_overlap_lines: int = 5  # Lines of the previous window repeated as context
+    scene_window_output_tokens: int = 8192  # max_tokens per window response
+    scene_extraction_max_concurrent: int = 3  # Windows in flight at once
+    llm_stream_responses: bool = True  # Stream extraction responses (SSE) and score scenes as they arrive
+    stream_tier2_batch_size: int = 25  # Scenes per risk/budget call while extraction is still running
+    
+    # Structured scene features (SceneExtractionData) for the deterministic scorers
+    scene_feature_extraction: bool = True
+    scene_feature_batch_size: int = 8  # Scenes per feature prompt
+    scene_feature_max_chars: int = 3000  # Scene body characters sent per scene
+    scene_feature_max_concurrent: int = 3  # Feature prompts in flight at once
+    budget_base_city: str = "Mumbai"  # City/scale for deterministic scene budgets
+    budget_scale: str = "mid_budget"
+    
+    # Compressed columns (script text / run JSON)
+    db_compression_codec: str = "zstd"  # zstd (falls back to zlib if not installed), zlib or none
+    db_compression_level: int = 3
+    db_compression_min_bytes: int = 256  # Smaller values are stored uncompressed
+    
+    # Retention (workers.tasks.cleanup_old_uploads, daily)
+    retention_run_days: int = 90  # Expire runs older than this (0 = keep forever)
+    retention_keep_runs_per_document: int = 3  # Newest runs per document are never expired
+    retention_document_days: int = 0  # Expire untouched uploads (0 = keep forever)
+    retention_archive_runs: bool = True  # Write expired runs to storage/archive/runs first
+    retention_orphan_grace_hours: int = 24  # Unreferenced files younger than this are kept
+    retention_batch_size: int = 500  # Ids per DELETE statement
+    retention_vacuum_free_ratio: float = 0.25  # VACUUM SQLite once this share of pages is free
+    retention_schedule_hour: int = 3  # UTC hour of the daily compaction
     
     # Celery
     celery_broker_url: str = "redis://localhost:6379/0"
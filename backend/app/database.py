@@ -3,8 +3,9 @@ Database initialization and session management
 """
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Engine, create_engine
+from sqlalchemy import Engine, Enum, create_engine, inspect, text
 from app.config import settings
+from typing import List
 import logging
 
 logger = logging.getLogger(__name__)
@@ -47,10 +48,69 @@ async def get_db():
             await session.close()
 
 
+# ============== SCHEMA UPGRADES ==============
+# create_all() creates missing tables but never alters existing ones. Columns
+# added to a table after it first shipped are listed here; upgrade_schema()
+# adds them to older databases with ALTER TABLE (types come from the models).
+# All of them are nullable, and the code treats NULL as the legacy value.
+ADDED_COLUMNS = {
+    "documents": [
+        "char_count",
+        "line_count",
+        "scene_index_json",
+        "scene_count",
+        "content_hash",
+        "canonical_id",
+        "parent_document_id",
+        "status",
+        "pages_done",
+        "extraction_error",
+    ],
+    "runs": [
+        "llm_telemetry_json",
+    ],
+}
+
+
+def upgrade_schema(conn) -> List[str]:
+    """
+    Bring a database up to the models (sync connection; use run_sync from async code)
+    
+    Creates missing tables, adds the ADDED_COLUMNS an existing table lacks
+    and creates its missing indexes (e.g. the unique idx_document_content_hash).
+    Safe to run on every start.
+    
+    Returns:
+        "table.column" for each column added
+    """
+    import app.models.database  # noqa: F401 - registers the models on Base.metadata
+    
+    Base.metadata.create_all(conn)
+    inspector = inspect(conn)
+    added = []
+    for table_name, column_names in ADDED_COLUMNS.items():
+        table = Base.metadata.tables[table_name]
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        for name in column_names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            if isinstance(column.type, Enum):
+                column.type.create(conn, checkfirst=True)  # Native enum type (PostgreSQL)
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+            added.append(f"{table_name}.{name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    if added:
+        logger.info(f"🔧 Schema upgraded, added columns: {', '.join(added)}")
+    return added
+
+
 async def init_db():
-    """Initialize database tables"""
+    """Initialize database tables (and upgrade older databases in place)"""
     async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
         logger.info("Database tables created")
 
 
@@ -3,10 +3,19 @@ FastAPI main application entry point
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from app.config import settings
 from app.database import init_db, close_db
 from app.datasets import dataset_loader
+from app.services.extraction import shutdown_extraction_pool
+from app.services.ingestion import ingestion_queue
+from app.utils.circuit_breaker import circuit_breakers
+from app.utils.llm_cache import llm_cache
+from app.utils.llm_limiter import llm_limiter
+from app.utils.llm_telemetry import llm_metrics
+from app.utils.single_flight import single_flight
+from app.utils.llm_client import close_llm_clients
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,6 +44,12 @@ async def lifespan(app: FastAPI):
         logger.warning(f"⚠️ Database initialization skipped: {e}")
         logger.warning("ℹ️ System will run without persistent storage")
     
+    # Resume extraction jobs interrupted by a restart
+    try:
+        await ingestion_queue.resume_pending()
+    except Exception as e:
+        logger.warning(f"⚠️ Ingestion resume skipped: {e}")
+    
     # Load datasets
     try:
         dataset_loader.load_all()
@@ -48,6 +63,10 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down...")
+    await ingestion_queue.shutdown()
+    shutdown_extraction_pool()
+    await close_llm_clients()
+    llm_cache.close()
     try:
         await close_db()
         logger.info("✅ Database connection closed")
@@ -85,6 +104,23 @@ async def health_check():
     }
 
 
+@app.get("/health/llm")
+async def llm_health():
+    """LLM circuit breakers plus response cache, limiter and single-flight counters"""
+    return {
+        "breakers": circuit_breakers.stats(),
+        "cache": llm_cache.stats(),
+        "limiter": llm_limiter.stats(),
+        "single_flight": single_flight.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """LLM call counters and latency/token histograms per agent (Prometheus text format)"""
+    return PlainTextResponse(llm_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ============== ROOT ==============
 @app.get("/")
 async def root():
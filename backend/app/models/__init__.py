@@ -1,12 +1,12 @@
 """Models package"""
 from app.models.database import (
-    Project, Document, Run, Scene, SceneExtraction,
+    Project, Document, DocumentPage, Run, Scene, SceneExtraction,
     SceneRisk, SceneCost, CrossSceneInsight, ProjectSummary,
     Job, Report, Decision, Assumption
 )
 
 __all__ = [
-    "Project", "Document", "Run", "Scene", "SceneExtraction",
+    "Project", "Document", "DocumentPage", "Run", "Scene", "SceneExtraction",
     "SceneRisk", "SceneCost", "CrossSceneInsight", "ProjectSummary",
     "Job", "Report", "Decision", "Assumption"
 ]
@@ -0,0 +1,131 @@
+"""
+Compressed column types - transparent zstd/zlib compression for large text/JSON
+
+Values are stored as binary with a 4-byte header:
+
+    b"\\x00CZ" + codec   (codec: b"s" zstd, b"z" zlib, b"r" raw/uncompressed)
+
+The leading NUL never starts valid text or JSON, so rows written before a
+column switched to a compressed type (plain TEXT/JSON strings) are still read
+transparently; migrate_compress_columns.py rewrites them in place.
+"""
+from typing import Any, Optional
+import json
+import zlib
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.config import settings
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency - zlib is always available
+    zstandard = None
+
+MAGIC = b"\x00CZ"
+CODEC_ZSTD = b"s"
+CODEC_ZLIB = b"z"
+CODEC_RAW = b"r"
+
+
+# ============== CODEC ==============
+def _codec_for(name: str) -> bytes:
+    if name == "zstd" and zstandard is not None:
+        return CODEC_ZSTD
+    if name in ("zstd", "zlib"):
+        return CODEC_ZLIB
+    return CODEC_RAW
+
+
+def compress_bytes(data: bytes, codec: Optional[str] = None) -> bytes:
+    """
+    Compress bytes and prepend the codec header
+
+    Args:
+        data: Raw payload
+        codec: "zstd", "zlib" or "none" (defaults to settings.db_compression_codec;
+            zstd falls back to zlib when `zstandard` is not installed)
+    """
+    tag = _codec_for(codec or settings.db_compression_codec)
+    if len(data) < settings.db_compression_min_bytes:
+        tag = CODEC_RAW
+
+    if tag == CODEC_ZSTD:
+        payload = zstandard.ZstdCompressor(level=settings.db_compression_level).compress(data)
+    elif tag == CODEC_ZLIB:
+        payload = zlib.compress(data, min(9, settings.db_compression_level))
+    else:
+        payload = data
+    return MAGIC + tag + payload
+
+
+def is_compressed(value: Any) -> bool:
+    """Whether a raw column value carries the compression header"""
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:3]) == MAGIC
+
+
+def decompress_bytes(value: Any) -> bytes:
+    """
+    Decode a stored value back to bytes
+
+    Accepts headered blobs as well as legacy str/bytes values without a header.
+    """
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    value = bytes(value)
+    if value[:3] != MAGIC:
+        return value
+
+    tag, payload = value[3:4], value[4:]
+    if tag == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Value is zstd-compressed but `zstandard` is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if tag == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if tag == CODEC_RAW:
+        return payload
+    raise ValueError(f"Unknown compression codec {tag!r}")
+
+
+# ============== COLUMN TYPES ==============
+class _CompressedBase(TypeDecorator):
+    impl = LargeBinary
+
+    def result_processor(self, dialect, coltype):
+        # Skip LargeBinary's own processor: legacy rows come back as str
+        def process(value):
+            if value is None:
+                return None
+            return self.process_result_value(value, dialect)
+        return process
+
+
+class CompressedText(_CompressedBase):
+    """Text column stored compressed (opt-in replacement for Text)"""
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return compress_bytes(value.encode("utf-8"))
+
+    def process_result_value(self, value: Any, dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return decompress_bytes(value).decode("utf-8")
+
+
+class CompressedJSON(_CompressedBase):
+    """JSON column stored compressed (opt-in replacement for JSON)"""
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return compress_bytes(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+    def process_result_value(self, value: Any, dialect) -> Any:
+        if value is None:
+            return None
+        return json.loads(decompress_bytes(value))
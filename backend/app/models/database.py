@@ -2,9 +2,10 @@
 SQLAlchemy ORM models for ShootSafe AI
 """
 from sqlalchemy import Column, String, Integer, Float, DateTime, Text, JSON, Boolean, Enum as SQLEnum, ForeignKey, UniqueConstraint, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.database import Base
+from app.models.compressed import CompressedText, CompressedJSON
 from datetime import datetime
 import enum
 import uuid
@@ -30,6 +31,12 @@ class RunStatus(str, enum.Enum):
     FAILED = "failed"
 
 
+class DocumentStatus(str, enum.Enum):
+    EXTRACTING = "extracting"
+    READY = "ready"
+    FAILED = "failed"
+
+
 class InsightType(str, enum.Enum):
     LOCATION_CHAIN = "location_chain"
     FATIGUE_CLUSTER = "fatigue_cluster"
@@ -67,15 +74,54 @@ class Document(Base):
     filename = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
     format = Column(String(20), nullable=False)  # pdf, docx
-    text_content = Column(Text)
+    text_content = deferred(Column(CompressedText))  # Legacy full text; new uploads use DocumentPage
     page_count = Column(Integer)
+    char_count = Column(Integer)   # Precomputed text length (no need to load the text)
+    line_count = Column(Integer)
+    scene_index_json = deferred(Column(CompressedJSON))  # Scene headings found at ingestion (see services/scene_index.py)
+    scene_count = Column(Integer)
     uploaded_at = Column(DateTime, server_default=func.now())
     
+    # Content-addressed dedup: canonical documents carry the SHA-256 of the
+    # uploaded file; re-uploads become aliases that share its file and text
+    content_hash = Column(String(64), nullable=True)
+    canonical_id = Column(String(36), ForeignKey("documents.id"), nullable=True)
+    
+    # Revised drafts point at the draft they revise (incremental re-analysis)
+    parent_document_id = Column(String(36), ForeignKey("documents.id"), nullable=True)
+    
+    # Background extraction progress (legacy rows with NULL status are ready)
+    status = Column(SQLEnum(DocumentStatus), default=DocumentStatus.READY)
+    pages_done = Column(Integer, default=0)
+    extraction_error = Column(Text)
+    
     # Relationships
     runs = relationship("Run", back_populates="document")
     
     __table_args__ = (
         Index("idx_document_id", "id"),
+        Index("idx_document_content_hash", "content_hash", unique=True),
+        Index("idx_document_canonical", "canonical_id"),
+        Index("idx_document_parent", "parent_document_id"),
+    )
+
+
+# ============== DOCUMENT PAGES ==============
+class DocumentPage(Base):
+    __tablename__ = "document_pages"
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    document_id = Column(String(36), ForeignKey("documents.id"), nullable=False)
+    page_number = Column(Integer, nullable=False)  # 1-based
+    text = Column(CompressedText, nullable=False)
+    char_start = Column(Integer, nullable=False)   # Offset of the page in the joined text
+    char_count = Column(Integer, nullable=False)
+    line_start = Column(Integer, nullable=False)   # 0-based index of the page's first line
+    line_count = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index("idx_document_page", "document_id", "page_number", unique=True),
+        Index("idx_document_page_lines", "document_id", "line_start"),
     )
 
 
@@ -89,13 +135,13 @@ class Run(Base):
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
     error_message = Column(Text)
-    enhanced_result_json = Column(JSON, nullable=True)  # Store complete enhanced output with grounding
+    enhanced_result_json = Column(CompressedJSON, nullable=True)  # Store complete enhanced output with grounding
     
     # ══════ NEW: Optimization Data ══════
-    location_clusters_json = Column(JSON, nullable=True)        # Location clustering results
-    stunt_relocations_json = Column(JSON, nullable=True)        # Stunt analysis & relocations
-    optimized_schedule_json = Column(JSON, nullable=True)       # Optimized shooting schedule
-    department_scaling_json = Column(JSON, nullable=True)       # Department cost scaling
+    location_clusters_json = Column(CompressedJSON, nullable=True)      # Location clustering results
+    stunt_relocations_json = Column(CompressedJSON, nullable=True)      # Stunt analysis & relocations
+    optimized_schedule_json = Column(CompressedJSON, nullable=True)     # Optimized shooting schedule
+    department_scaling_json = Column(CompressedJSON, nullable=True)     # Department cost scaling
     
     # Optimization Summary
     optimized_budget_min = Column(Integer, nullable=True)       # Optimized budget (min)
@@ -104,6 +150,9 @@ class Run(Base):
     total_optimization_savings = Column(Integer, nullable=True) # Total savings in rupees
     schedule_savings_percent = Column(Float, nullable=True)     # Schedule compression %
     
+    # Per-agent LLM call totals: calls, outcomes, tokens, latency (utils/llm_telemetry.py)
+    llm_telemetry_json = Column(CompressedJSON, nullable=True)
+    
     # Relationships
     document = relationship("Document", back_populates="runs")
     scenes = relationship("Scene", back_populates="run")
@@ -47,6 +47,9 @@ class UploadResponse(BaseModel):
     format: str
     page_count: Optional[int]
     uploaded_at: datetime
+    status: str = "ready"  # extracting | ready | failed
+    duplicate_of: Optional[str] = None  # Canonical document id for re-uploads
+    parent_document_id: Optional[str] = None  # Draft this upload revises
 
 
 # ============== RUN SCHEMAS ==============
@@ -63,6 +66,7 @@ class RunStatusResponse(BaseModel):
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     error: Optional[str] = None
+    llm_telemetry: Optional[Dict[str, Any]] = None
     
     # Optional fields for complex workflows (not used in Option B)
     job_id: Optional[str] = None
@@ -0,0 +1,159 @@
+"""
+Document text - per-page storage and lazy page/line range access
+
+Extracted text is stored one row per page (DocumentPage) with precomputed
+char/line offsets, so callers can read a slice of a long script without
+loading the whole thing. The full text is "\n".join(pages).
+
+Documents ingested before per-page storage only have the legacy
+Document.text_content column; readers fall back to it transparently.
+"""
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+import logging
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Document, DocumentPage
+
+logger = logging.getLogger(__name__)
+
+
+# ============== WRITE ==============
+async def store_pages(session: AsyncSession, document_id: str, pages: Sequence[str]) -> Tuple[int, int]:
+    """
+    Replace a document's stored pages (caller commits)
+
+    Args:
+        session: Database session
+        document_id: Canonical document that owns the text
+        pages: Page texts in order
+
+    Returns:
+        (char_count, line_count) of the joined text
+    """
+    await session.execute(delete(DocumentPage).where(DocumentPage.document_id == document_id))
+
+    char_start = line_start = 0
+    for number, text in enumerate(pages, start=1):
+        line_count = text.count("\n") + 1
+        session.add(DocumentPage(
+            document_id=document_id,
+            page_number=number,
+            text=text,
+            char_start=char_start,
+            char_count=len(text),
+            line_start=line_start,
+            line_count=line_count,
+        ))
+        # +1 for the "\n" that joins this page to the next
+        char_start += len(text) + 1
+        line_start += line_count
+
+    if not pages:
+        return 0, 0
+    return char_start - 1, line_start
+
+
+# ============== READ ==============
+async def _legacy_text(session: AsyncSession, document_id: str) -> Optional[str]:
+    """Load the legacy full-text column explicitly (it is deferred on the model)"""
+    result = await session.execute(
+        select(Document.text_content).where(Document.id == document_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def has_pages(session: AsyncSession, document_id: str) -> bool:
+    """Whether a document's text is stored per page"""
+    result = await session.execute(
+        select(DocumentPage.id).where(DocumentPage.document_id == document_id).limit(1)
+    )
+    return result.first() is not None
+
+
+async def text_length(session: AsyncSession, document: Document) -> int:
+    """Character count of a document's text (precomputed, so the text isn't loaded)"""
+    if document.char_count is not None:
+        return document.char_count
+    # Legacy row not yet backfilled by migrate_compress_columns.py; the column
+    # may be compressed, so its length can't be taken in SQL
+    return len(await _legacy_text(session, document.id) or "")
+
+
+async def read_pages(
+    session: AsyncSession,
+    document: Document,
+    start_page: int = 1,
+    end_page: Optional[int] = None,
+) -> List[str]:
+    """
+    Read pages [start_page, end_page] (1-based, inclusive)
+
+    Legacy documents without stored pages are treated as a single page.
+    """
+    query = (
+        select(DocumentPage.text)
+        .where(DocumentPage.document_id == document.id, DocumentPage.page_number >= start_page)
+        .order_by(DocumentPage.page_number)
+    )
+    if end_page is not None:
+        query = query.where(DocumentPage.page_number <= end_page)
+    pages = list((await session.execute(query)).scalars().all())
+
+    if not pages and start_page <= 1 and not await has_pages(session, document.id):
+        legacy = await _legacy_text(session, document.id)
+        return [legacy] if legacy else []
+    return pages
+
+
+async def iter_pages(session: AsyncSession, document: Document, batch_size: int = 16) -> AsyncIterator[str]:
+    """Yield page texts in order, loading `batch_size` pages at a time"""
+    start = 1
+    while True:
+        batch = await read_pages(session, document, start, start + batch_size - 1)
+        for page in batch:
+            yield page
+        if len(batch) < batch_size:
+            return
+        start += batch_size
+
+
+async def read_lines(
+    session: AsyncSession,
+    document: Document,
+    start_line: int,
+    end_line: Optional[int] = None,
+) -> List[str]:
+    """
+    Read lines [start_line, end_line) (0-based) of the joined text
+
+    Only the pages overlapping the range are loaded.
+    """
+    query = (
+        select(DocumentPage.text, DocumentPage.line_start)
+        .where(
+            DocumentPage.document_id == document.id,
+            DocumentPage.line_start + DocumentPage.line_count > start_line,
+        )
+        .order_by(DocumentPage.page_number)
+    )
+    if end_line is not None:
+        query = query.where(DocumentPage.line_start < end_line)
+    rows = (await session.execute(query)).all()
+
+    if not rows:
+        if await has_pages(session, document.id):
+            return []
+        legacy = await _legacy_text(session, document.id) or ""
+        return legacy.split("\n")[start_line:end_line]
+
+    first_line = rows[0].line_start
+    lines = "\n".join(row.text for row in rows).split("\n")
+    stop = None if end_line is None else end_line - first_line
+    return lines[start_line - first_line:stop]
+
+
+async def read_full_text(session: AsyncSession, document: Document) -> str:
+    """Load a document's complete text (pages joined, or the legacy column)"""
+    return "\n".join(await read_pages(session, document))
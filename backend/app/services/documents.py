@@ -0,0 +1,120 @@
+"""
+Document helpers - content-addressed dedup and alias resolution
+"""
+from typing import Optional
+import logging
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Document, DocumentPage
+
+logger = logging.getLogger(__name__)
+
+
+async def find_by_content_hash(session: AsyncSession, content_hash: str) -> Optional[Document]:
+    """Get the canonical document for a SHA-256 content hash, if any"""
+    result = await session.execute(
+        select(Document).where(Document.content_hash == content_hash)
+    )
+    return result.scalars().first()
+
+
+async def resolve_canonical(session: AsyncSession, document: Document) -> Document:
+    """
+    Resolve an alias to the canonical document that owns its file and text
+
+    Canonical documents resolve to themselves.
+    """
+    if not document.canonical_id:
+        return document
+    canonical = await session.get(Document, document.canonical_id)
+    if canonical is None:
+        logger.warning(f"Alias {document.id} points at missing canonical {document.canonical_id}")
+        return document
+    return canonical
+
+
+def make_alias(canonical: Document, document_id: str, filename: str) -> Document:
+    """Build a new document row that reuses a canonical document's file and text"""
+    return Document(
+        id=document_id,
+        filename=filename,
+        file_path=canonical.file_path,
+        format=canonical.format,
+        page_count=canonical.page_count,
+        canonical_id=canonical.id,
+    )
+
+
+async def _repoint_revisions(session: AsyncSession, document: Document, parent_id: Optional[str]) -> None:
+    """Keep later drafts linked when the draft they revise is deleted"""
+    await session.execute(
+        update(Document).where(Document.parent_document_id == document.id).values(parent_document_id=parent_id)
+    )
+
+
+async def remove_document(session: AsyncSession, document: Document) -> bool:
+    """
+    Delete a document row, keeping shared content alive for its aliases
+
+    Aliases are simply deleted. When a canonical document still has aliases,
+    the oldest alias is promoted to canonical (taking over the content hash and
+    stored pages) and the others are re-pointed at it. Drafts that revise the
+    deleted document are re-linked to whatever now holds its content (or to
+    its own parent draft).
+
+    Returns:
+        True if the caller should also delete the stored file
+    """
+    if document.canonical_id:
+        await _repoint_revisions(session, document, document.canonical_id)
+        await session.delete(document)
+        return False
+
+    result = await session.execute(
+        select(Document)
+        .where(Document.canonical_id == document.id)
+        .order_by(Document.uploaded_at, Document.id)
+    )
+    aliases = result.scalars().all()
+    if not aliases:
+        await _repoint_revisions(session, document, document.parent_document_id)
+        await session.execute(delete(DocumentPage).where(DocumentPage.document_id == document.id))
+        await session.delete(document)
+        return True
+
+    heir, others = aliases[0], aliases[1:]
+    content_hash = document.content_hash
+    # Large deferred columns are moved in SQL rather than loaded
+    own_row = select(Document).where(Document.id == document.id).subquery()
+
+    # Release the unique hash before the heir claims it
+    document.content_hash = None
+    await session.flush()
+
+    heir.canonical_id = None
+    heir.content_hash = content_hash
+    heir.page_count = document.page_count
+    heir.char_count = document.char_count
+    heir.line_count = document.line_count
+    heir.scene_count = document.scene_count
+    heir.status = document.status
+    heir.pages_done = document.pages_done
+    heir.extraction_error = document.extraction_error
+    for alias in others:
+        alias.canonical_id = heir.id
+    await _repoint_revisions(session, document, heir.id)
+    await session.execute(
+        update(Document).where(Document.id == heir.id).values(
+            text_content=select(own_row.c.text_content).scalar_subquery(),
+            scene_index_json=select(own_row.c.scene_index_json).scalar_subquery(),
+        )
+    )
+    await session.execute(
+        update(DocumentPage).where(DocumentPage.document_id == document.id).values(document_id=heir.id)
+    )
+    await session.delete(document)
+
+    logger.info(f"Promoted alias {heir.id} to canonical for {document.id}")
+    return False
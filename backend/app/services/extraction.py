@@ -0,0 +1,329 @@
+"""
+Script text extraction - PDF/DOCX parsing off the event loop
+
+PDF parsing is CPU-bound, so pages are sharded into contiguous ranges and
+parsed in a shared process pool. Results are put back in page order.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import zipfile
+
+import pdfplumber
+from lxml import etree
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Get (or lazily create) the shared extraction process pool"""
+    global _pool
+    if _pool is None:
+        workers = max(1, settings.extraction_workers)
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Extraction pool started with {workers} workers")
+    return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    """Shut down the shared extraction pool (called on app shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        logger.info("Extraction pool stopped")
+
+
+# ============== SYNC EXTRACTORS (run inside pool workers) ==============
+def count_pdf_pages(file_path: str) -> int:
+    """Count pages in a PDF"""
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract text for pages [start, end) of a PDF"""
+    with pdfplumber.open(file_path) as pdf:
+        return [(pdf.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def extract_text_from_pdf(file_path: str) -> tuple[str, int]:
+    """Extract text and page count from PDF (serial, in-process)"""
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            text = ""
+            for page in pdf.pages:
+                text += (page.extract_text() or "") + "\n"
+            return text, len(pdf.pages)
+    except Exception as e:
+        logger.error(f"PDF extraction error: {e}")
+        raise
+
+
+def extract_text_from_docx(file_path: str) -> tuple[str, int]:
+    """Extract text and page count from DOCX (streaming, tables included)"""
+    try:
+        pages = extract_docx_pages(file_path)
+        return "\n".join(pages), len(pages)
+    except Exception as e:
+        logger.error(f"DOCX extraction error: {e}")
+        raise
+
+
+# ============== DOCX STREAMING ==============
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P, _TC, _T, _TAB = f"{_W}p", f"{_W}tc", f"{_W}t", f"{_W}tab"
+_BR, _CR, _PPR, _SECTPR = f"{_W}br", f"{_W}cr", f"{_W}pPr", f"{_W}sectPr"
+_RENDERED_BREAK = f"{_W}lastRenderedPageBreak"
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[Tuple[str, bool]]:
+    """
+    Stream paragraphs and table cells from word/document.xml in document order
+
+    The XML is iterparsed straight from the zip and each top-level block is
+    discarded once read, so memory stays bounded by the largest paragraph or
+    table rather than the whole document.
+
+    Yields:
+        (text, page_break_before) - one item per body paragraph and per table
+        cell (its paragraphs joined by newlines). page_break_before is True when
+        a page or section break precedes the block.
+    """
+    with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+        parts: List[str] = []    # Text of the paragraph being read
+        cell: List[str] = []     # Paragraphs of the table cell being read
+        break_pending = False    # A break was seen since the last yielded block
+
+        # End events only (lxml filters tags in C); a paragraph's text
+        # elements always end before the paragraph itself
+        events = etree.iterparse(
+            xml, events=("end",),
+            tag=(_P, _TC, _T, _TAB, _BR, _CR, _SECTPR, _RENDERED_BREAK),
+        )
+        for _, elem in events:
+            tag = elem.tag
+            if tag == _T:
+                if elem.text:
+                    parts.append(elem.text)
+            elif tag == _TAB:
+                parts.append("\t")
+            elif tag == _BR or tag == _RENDERED_BREAK:
+                kind = elem.get(f"{_W}type") if tag == _BR else "page"
+                if kind == "page":
+                    # Before any text the paragraph starts the new page,
+                    # otherwise the page turns after it
+                    parts.append("\f" if parts else "\v")
+                elif kind != "column":
+                    parts.append("\n")
+            elif tag == _CR:
+                parts.append("\n")
+            elif tag == _SECTPR:
+                # Section break (in pPr) ends the page after this paragraph
+                if elem.getparent().tag == _PPR:
+                    parts.append("\f")
+            elif tag == _P:
+                text = "".join(parts)
+                parts = []
+                starts_page = text.startswith("\v")
+                ends_page = "\f" in text
+                text = text.replace("\v", "").replace("\f", "")
+                if starts_page and not text:
+                    # A paragraph holding only a page break ends the page
+                    starts_page, ends_page = False, True
+                break_pending = break_pending or starts_page
+                parent = elem.getparent()
+                if parent.tag == _TC:
+                    cell.append(text)
+                    elem.clear()
+                else:
+                    yield text, break_pending
+                    break_pending = False
+                    _drop_finished(elem)
+                break_pending = break_pending or ends_page
+            elif tag == _TC:
+                # Nested table cells are folded into their outermost cell
+                if next(elem.iterancestors(_TC), None) is None:
+                    yield "\n".join(cell), break_pending
+                    cell, break_pending = [], False
+                    elem.clear()
+
+
+def _drop_finished(elem) -> None:
+    """Free a parsed block and everything before it in its parent"""
+    elem.clear()
+    parent = elem.getparent()
+    while elem.getprevious() is not None:
+        del parent[0]
+
+
+def extract_docx_pages(file_path: str) -> List[str]:
+    """
+    Extract DOCX text split into pages on page/section breaks
+
+    Word stores no page layout, so pages come from explicit page breaks,
+    section breaks and Word's last-rendered page markers. Documents without
+    any of those fall back to ~3000 character pages.
+    """
+    pages: List[List[str]] = [[]]
+    for text, page_break in iter_docx_blocks(file_path):
+        if page_break and pages[-1]:
+            pages.append([])
+        pages[-1].append(text)
+
+    if len(pages) == 1:
+        return paginate_text("\n".join(pages[0]))
+    return ["\n".join(lines) for lines in pages]
+
+
+def paginate_text(text: str, target_chars: int = 3000) -> List[str]:
+    """
+    Split text without real page breaks into ~target_chars pages on line boundaries
+
+    Joining the result with "\n" gives back the original text.
+    """
+    pages, current, size = [], [], 0
+    for line in text.split("\n"):
+        if current and size + len(line) > target_chars:
+            pages.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    pages.append("\n".join(current))
+    return pages
+
+
+def plan_page_ranges(page_count: int, shards: int) -> List[Tuple[int, int]]:
+    """
+    Split pages into contiguous, near-equal [start, end) ranges
+
+    Args:
+        page_count: Total pages in the document
+        shards: Desired number of ranges
+
+    Returns:
+        Ordered list of (start, end) page ranges
+    """
+    shards = max(1, min(shards, page_count))
+    base, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        end = start + base + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+# ============== ASYNC ENTRY POINTS ==============
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+async def extract_pdf_pages(
+    file_path: str,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> List[str]:
+    """
+    Extract per-page PDF text in the process pool
+
+    Pages are cut into shards of about settings.extraction_pages_per_shard
+    (at least one shard per worker) so progress can be reported as shards
+    finish; the pool bounds how many run at once.
+
+    Args:
+        file_path: Path to the PDF
+        workers: Minimum number of shards (defaults to settings.extraction_workers)
+        on_progress: Awaited with (pages_done, total_pages) as shards finish
+
+    Returns:
+        Page texts in page order
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+    page_count = await loop.run_in_executor(pool, count_pdf_pages, file_path)
+    if on_progress:
+        await on_progress(0, page_count)
+    if page_count == 0:
+        return []
+
+    per_shard = max(1, settings.extraction_pages_per_shard)
+    shard_count = max(workers or settings.extraction_workers, -(-page_count // per_shard))
+    ranges = plan_page_ranges(page_count, shard_count)
+
+    async def run_shard(start: int, end: int) -> Tuple[int, List[str]]:
+        pages = await loop.run_in_executor(pool, extract_pdf_page_range, file_path, start, end)
+        return start, pages
+
+    shards = {}
+    pages_done = 0
+    for next_shard in asyncio.as_completed([run_shard(start, end) for start, end in ranges]):
+        start, pages = await next_shard
+        shards[start] = pages
+        pages_done += len(pages)
+        if on_progress:
+            await on_progress(pages_done, page_count)
+
+    return [page for start, _ in ranges for page in shards[start]]
+
+
+async def extract_document_pages(
+    file_path: str,
+    file_format: str,
+    on_progress: Optional[ProgressCallback] = None,
+) -> List[str]:
+    """
+    Extract per-page text without blocking the event loop
+
+    DOCX files are split on their page/section breaks (see extract_docx_pages).
+
+    Args:
+        file_path: Path to the stored upload
+        file_format: "pdf" or "docx"
+        on_progress: Awaited with (pages_done, total_pages) during extraction
+
+    Returns:
+        Page texts in order; "\n".join(pages) is the full script text
+    """
+    try:
+        if file_format == "pdf":
+            return await extract_pdf_pages(file_path, on_progress=on_progress)
+
+        loop = asyncio.get_running_loop()
+        pages = await loop.run_in_executor(get_extraction_pool(), extract_docx_pages, file_path)
+        if on_progress:
+            await on_progress(len(pages), len(pages))
+        return pages
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge file) - start a fresh pool next time
+        logger.error(f"{file_format.upper()} extraction worker crashed, resetting pool")
+        shutdown_extraction_pool()
+        raise
+    except Exception as e:
+        logger.error(f"{file_format.upper()} extraction error: {e}")
+        raise
+
+
+async def extract_document_text(
+    file_path: str,
+    file_format: str,
+    on_progress: Optional[ProgressCallback] = None,
+) -> tuple[str, int]:
+    """
+    Extract full text and page count without blocking the event loop
+
+    Returns:
+        (text, page_count)
+    """
+    pages = await extract_document_pages(file_path, file_format, on_progress)
+    return "\n".join(pages), len(pages)
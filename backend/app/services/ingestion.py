@@ -0,0 +1,144 @@
+"""
+Ingestion jobs - background text extraction for uploaded scripts
+
+Uploads are persisted and acknowledged right away; extraction then runs as an
+in-process asyncio job that reports page progress on the Document row.
+"""
+from typing import Dict, Optional
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.database import Document, DocumentStatus
+from app.services.document_text import store_pages
+from app.services.extraction import extract_document_pages
+from app.services.scene_index import build_scene_index
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueue:
+    """Runs extraction jobs in the API process with bounded concurrency"""
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max_concurrent or settings.ingestion_max_concurrent
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, document_id: str) -> asyncio.Task:
+        """
+        Schedule extraction for a document (idempotent while a job is running)
+
+        Returns:
+            The asyncio task running the job
+        """
+        task = self._tasks.get(document_id)
+        if task and not task.done():
+            return task
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        task = asyncio.create_task(self._run(document_id), name=f"ingest-{document_id}")
+        self._tasks[document_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(document_id, None))
+        return task
+
+    async def resume_pending(self) -> int:
+        """Re-submit documents left mid-extraction by a previous process"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Document.id).where(Document.status == DocumentStatus.EXTRACTING)
+            )
+            pending = result.scalars().all()
+
+        for document_id in pending:
+            self.submit(document_id)
+        if pending:
+            logger.info(f"🔁 Resumed {len(pending)} pending extraction jobs")
+        return len(pending)
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs (they are resumed on next startup)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, document_id: str) -> None:
+        """Extract one document and record progress / outcome"""
+        async with self._semaphore:
+            async with AsyncSessionLocal() as session:
+                document = await session.get(Document, document_id)
+                if document is None:
+                    logger.warning(f"Ingestion skipped, document {document_id} no longer exists")
+                    return
+
+                content_hash = document.content_hash
+                file_path, file_format = document.file_path, document.format
+
+                async def owner() -> Optional[Document]:
+                    # Deleting the original upload may promote an alias that
+                    # now owns this content - keep writing to whoever owns it
+                    doc = await session.get(Document, document_id, populate_existing=True)
+                    if doc is None and content_hash:
+                        result = await session.execute(
+                            select(Document).where(Document.content_hash == content_hash)
+                        )
+                        doc = result.scalars().first()
+                    return doc
+
+                async def on_progress(pages_done: int, total_pages: int) -> None:
+                    try:
+                        doc = await owner()
+                        if doc is not None:
+                            doc.pages_done = pages_done
+                            doc.page_count = total_pages
+                            await session.commit()
+                    except Exception as e:
+                        # Progress is best-effort; never fail the extraction over it
+                        logger.debug(f"Progress update skipped for {document_id}: {e}")
+                        await session.rollback()
+
+                try:
+                    logger.info(f"📄 Extracting {document_id} ({file_format})")
+                    pages = await extract_document_pages(
+                        file_path, file_format, on_progress=on_progress
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Extraction failed for {document_id}: {e}")
+                    await session.rollback()
+                    doc = await owner()
+                    if doc is not None:
+                        doc.status = DocumentStatus.FAILED
+                        doc.extraction_error = str(e)
+                        await session.commit()
+                    return
+
+                doc = await owner()
+                if doc is None:
+                    logger.warning(f"Document {document_id} deleted during extraction")
+                    return
+
+                page_count = len(pages)
+                scene_index = await asyncio.to_thread(build_scene_index, "\n".join(pages))
+                doc.char_count, doc.line_count = await store_pages(session, doc.id, pages)
+                doc.scene_index_json = scene_index
+                doc.scene_count = len(scene_index)
+                doc.page_count = page_count
+                doc.pages_done = page_count
+                doc.status = DocumentStatus.READY
+                doc.extraction_error = None
+                await session.commit()
+
+                logger.info(f"✅ Extraction complete: {doc.id} ({page_count} pages, {len(scene_index)} scenes)")
+
+
+# Global instance
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,351 @@
+"""
+Retention - batched cleanup of expired/orphaned rows and files
+
+Deleting a script used to leave its runs, scenes, risks, costs and report
+PDFs behind, and nothing ever expired old runs. This module deletes whole
+run trees in batched statements, optionally archiving each run's JSON to a
+compressed file first, and sweeps files nothing references any more.
+
+Everything here is synchronous (Celery worker / Session.run_sync friendly).
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+import json
+import logging
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.compressed import compress_bytes, decompress_bytes
+from app.models.database import (
+    CrossSceneInsight, Decision, Document, DocumentPage, Job, ProjectSummary,
+    Report, Run, RunStatus, Scene, SceneCost, SceneExtraction, SceneRisk,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIX = ".json.cz"
+
+RUN_JSON_COLUMNS = (
+    "enhanced_result_json",
+    "location_clusters_json",
+    "stunt_relocations_json",
+    "optimized_schedule_json",
+    "department_scaling_json",
+)
+
+
+@dataclass
+class RetentionStats:
+    """What a compaction pass removed"""
+    rows_deleted: Dict[str, int] = field(default_factory=dict)
+    files_deleted: int = 0
+    runs_archived: int = 0
+    vacuumed: bool = False
+
+    def add(self, table: str, count: int) -> None:
+        if count:
+            self.rows_deleted[table] = self.rows_deleted.get(table, 0) + count
+
+    def to_dict(self) -> dict:
+        return {
+            "rows_deleted": self.rows_deleted,
+            "files_deleted": self.files_deleted,
+            "runs_archived": self.runs_archived,
+            "vacuumed": self.vacuumed,
+        }
+
+
+def _batches(ids: Sequence[str], size: Optional[int] = None) -> Iterator[List[str]]:
+    size = size or settings.retention_batch_size
+    for start in range(0, len(ids), size):
+        yield list(ids[start:start + size])
+
+
+def _storage_dir(name: str) -> Path:
+    return Path(settings.storage_path) / name
+
+
+# ============== RUN TREES ==============
+def delete_runs(session: Session, run_ids: Sequence[str], stats: Optional[RetentionStats] = None) -> List[str]:
+    """
+    Delete runs and every row hanging off them, in batched statements
+
+    The caller commits, then removes the returned files (report PDFs) so a
+    rollback never leaves rows pointing at deleted files.
+
+    Returns:
+        Paths of report PDFs that belonged to the deleted runs
+    """
+    stats = stats or RetentionStats()
+    files: List[str] = []
+
+    for batch in _batches(run_ids):
+        scene_ids = select(Scene.id).where(Scene.run_id.in_(batch))
+        files.extend(session.execute(
+            select(Report.pdf_path).where(Report.run_id.in_(batch))
+        ).scalars())
+
+        for model, condition in (
+            (SceneRisk, SceneRisk.scene_id.in_(scene_ids)),
+            (SceneCost, SceneCost.scene_id.in_(scene_ids)),
+            (Decision, Decision.scene_id.in_(scene_ids)),
+            (SceneExtraction, SceneExtraction.scene_id.in_(scene_ids)),
+            (Scene, Scene.run_id.in_(batch)),
+            (CrossSceneInsight, CrossSceneInsight.run_id.in_(batch)),
+            (ProjectSummary, ProjectSummary.run_id.in_(batch)),
+            (Job, Job.run_id.in_(batch)),
+            (Report, Report.run_id.in_(batch)),
+            (Run, Run.id.in_(batch)),
+        ):
+            result = session.execute(delete(model).where(condition), execution_options={"synchronize_session": False})
+            stats.add(model.__tablename__, result.rowcount)
+
+    return files
+
+
+def remove_files(paths: Sequence[str], stats: Optional[RetentionStats] = None) -> int:
+    """Delete files, ignoring ones already gone; returns how many were removed"""
+    removed = 0
+    for path in paths:
+        try:
+            Path(path).unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not delete file {path}: {e}")
+    if stats:
+        stats.files_deleted += removed
+    return removed
+
+
+# ============== ARCHIVE ==============
+def archive_run(run: Run, archive_dir: Optional[Path] = None) -> Path:
+    """
+    Write a run's metadata and JSON blobs to a compressed archive file
+
+    Files land in <storage>/archive/runs/<YYYY-MM>/<run_id>.json.cz and use
+    the same header/codec as the compressed DB columns (see load_run_archive).
+    """
+    archive_dir = archive_dir or _storage_dir("archive") / "runs"
+    stamp = run.completed_at or run.started_at or datetime.utcnow()
+    target_dir = archive_dir / stamp.strftime("%Y-%m")
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    payload = {
+        "run_id": run.id,
+        "document_id": run.document_id,
+        "status": run.status.value if run.status else None,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "completed_at": run.completed_at.isoformat() if run.completed_at else None,
+        "error_message": run.error_message,
+        "optimized_budget_likely": run.optimized_budget_likely,
+        "total_optimization_savings": run.total_optimization_savings,
+        **{column: getattr(run, column) for column in RUN_JSON_COLUMNS},
+    }
+    path = target_dir / f"{run.id}{ARCHIVE_SUFFIX}"
+    path.write_bytes(compress_bytes(json.dumps(payload, default=str).encode("utf-8")))
+    return path
+
+
+def load_run_archive(path: Path) -> dict:
+    """Read back a run archived by archive_run"""
+    return json.loads(decompress_bytes(Path(path).read_bytes()))
+
+
+def _archive_runs(session: Session, run_ids: Sequence[str], stats: RetentionStats) -> None:
+    """Archive a batch of runs (call before delete_runs); detaches the loaded rows"""
+    for run in session.execute(select(Run).where(Run.id.in_(run_ids))).scalars():
+        archive_run(run)
+        stats.runs_archived += 1
+    session.expunge_all()
+
+
+# ============== SELECTION ==============
+def find_expired_runs(session: Session, now: datetime) -> List[str]:
+    """
+    Runs past settings.retention_run_days, except each document's newest ones
+
+    The latest settings.retention_keep_runs_per_document runs of a document are
+    always kept; runs still RUNNING/QUEUED are never expired.
+    """
+    if settings.retention_run_days <= 0:
+        return []
+    cutoff = now - timedelta(days=settings.retention_run_days)
+
+    newest = func.row_number().over(
+        partition_by=Run.document_id,
+        order_by=(Run.started_at.desc(), Run.id.desc()),
+    ).label("newest")
+    ranked = select(Run.id, Run.started_at, Run.status, newest).subquery()
+    return list(session.execute(
+        select(ranked.c.id).where(
+            ranked.c.newest > settings.retention_keep_runs_per_document,
+            ranked.c.started_at < cutoff,
+            ranked.c.status.in_([RunStatus.COMPLETED, RunStatus.FAILED]),
+        )
+    ).scalars())
+
+
+def find_orphaned_runs(session: Session) -> List[str]:
+    """Runs whose document was deleted"""
+    return list(session.execute(
+        select(Run.id).where(~select(Document.id).where(Document.id == Run.document_id).exists())
+    ).scalars())
+
+
+def find_expired_documents(session: Session, now: datetime) -> List[str]:
+    """
+    Upload groups (canonical + aliases) older than settings.retention_document_days
+
+    A group only expires when neither the canonical upload nor any alias nor
+    any of their runs is newer than the cutoff.
+    """
+    if settings.retention_document_days <= 0:
+        return []
+    cutoff = now - timedelta(days=settings.retention_document_days)
+
+    group = func.coalesce(Document.canonical_id, Document.id)
+    recent_upload = select(group).where(Document.uploaded_at >= cutoff)
+    recent_run = (
+        select(group)
+        .join(Run, Run.document_id == Document.id)
+        .where(Run.started_at >= cutoff)
+    )
+    return list(session.execute(
+        select(Document.id).where(
+            group.not_in(recent_upload),
+            group.not_in(recent_run),
+        )
+    ).scalars())
+
+
+# ============== COMPACTION ==============
+def _delete_documents(
+    session: Session,
+    document_ids: Sequence[str],
+    stats: RetentionStats,
+    archive: bool = False,
+) -> List[str]:
+    """Delete documents with their pages and runs (archived first if asked); returns files to remove"""
+    files: List[str] = []
+    for batch in _batches(document_ids):
+        run_ids = list(session.execute(select(Run.id).where(Run.document_id.in_(batch))).scalars())
+        if archive and run_ids:
+            _archive_runs(session, run_ids, stats)
+        files.extend(delete_runs(session, run_ids, stats))
+        files.extend(session.execute(
+            select(Document.file_path).where(Document.id.in_(batch), Document.canonical_id.is_(None))
+        ).scalars())
+        for model, condition in (
+            (DocumentPage, DocumentPage.document_id.in_(batch)),
+            (Document, Document.id.in_(batch)),
+        ):
+            result = session.execute(delete(model).where(condition), execution_options={"synchronize_session": False})
+            stats.add(model.__tablename__, result.rowcount)
+    return files
+
+
+def _sweep_orphaned_rows(session: Session, stats: RetentionStats) -> List[str]:
+    """Delete child rows whose parent is gone (left by older deletes)"""
+    files = delete_runs(session, find_orphaned_runs(session), stats)
+
+    result = session.execute(
+        delete(DocumentPage).where(~select(Document.id).where(Document.id == DocumentPage.document_id).exists()),
+        execution_options={"synchronize_session": False},
+    )
+    stats.add(DocumentPage.__tablename__, result.rowcount)
+
+    orphan_reports = select(Report.id).where(
+        Report.run_id.is_not(None),
+        ~select(Run.id).where(Run.id == Report.run_id).exists(),
+    )
+    files.extend(session.execute(
+        select(Report.pdf_path).where(Report.id.in_(orphan_reports))
+    ).scalars())
+    result = session.execute(
+        delete(Report).where(Report.id.in_(orphan_reports)),
+        execution_options={"synchronize_session": False},
+    )
+    stats.add(Report.__tablename__, result.rowcount)
+    return files
+
+
+def _sweep_orphaned_files(session: Session, now: datetime, stats: RetentionStats) -> None:
+    """Remove upload/report files no row references (after a grace period)"""
+    grace = now - timedelta(hours=settings.retention_orphan_grace_hours)
+    referenced = set(session.execute(select(Document.file_path)).scalars())
+    referenced.update(session.execute(select(Report.pdf_path)).scalars())
+    referenced = {str(Path(path).resolve()) for path in referenced if path}
+
+    stale = []
+    for directory in (_storage_dir("uploads"), _storage_dir("reports")):
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            if not path.is_file() or str(path.resolve()) in referenced:
+                continue
+            # Leave in-flight uploads (.part) and just-written files alone
+            if datetime.utcfromtimestamp(path.stat().st_mtime) < grace:
+                stale.append(str(path))
+    remove_files(stale, stats)
+
+
+def _maybe_vacuum(session: Session, stats: RetentionStats) -> None:
+    """VACUUM SQLite once enough pages are free, so the file shrinks back"""
+    if session.get_bind().dialect.name != "sqlite":
+        return
+    page_count = session.execute(text("PRAGMA page_count")).scalar() or 0
+    free_pages = session.execute(text("PRAGMA freelist_count")).scalar() or 0
+    session.execute(text("PRAGMA optimize"))
+    # VACUUM needs every other transaction closed, including ours
+    session.commit()
+    if page_count and free_pages / page_count >= settings.retention_vacuum_free_ratio:
+        with session.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        stats.vacuumed = True
+
+
+def run_compaction(session: Session, now: Optional[datetime] = None, archive: Optional[bool] = None) -> RetentionStats:
+    """
+    One retention pass: expire, archive, delete and sweep
+
+    Args:
+        session: Sync session (commits as it goes)
+        now: Reference time (defaults to utcnow)
+        archive: Archive expired runs (including those of expired
+            documents) before deleting them (defaults to settings.retention_archive_runs)
+
+    Returns:
+        RetentionStats for logging / the task result
+    """
+    now = now or datetime.utcnow()
+    archive = settings.retention_archive_runs if archive is None else archive
+    stats = RetentionStats()
+
+    # Expired documents take their runs with them
+    files = _delete_documents(session, find_expired_documents(session, now), stats, archive)
+    session.commit()
+    remove_files(files, stats)
+
+    expired_runs = find_expired_runs(session, now)
+    for batch in _batches(expired_runs):
+        if archive:
+            _archive_runs(session, batch, stats)
+        files = delete_runs(session, batch, stats)
+        session.commit()
+        remove_files(files, stats)
+
+    files = _sweep_orphaned_rows(session, stats)
+    session.commit()
+    remove_files(files, stats)
+
+    _sweep_orphaned_files(session, now, stats)
+    _maybe_vacuum(session, stats)
+
+    logger.info(f"🧹 Retention: {stats.to_dict()}")
+    return stats
@@ -0,0 +1,217 @@
+"""
+Revisions - scene-level diff between a script draft and its predecessor
+
+A revised draft is uploaded as a new Document with parent_document_id set.
+Every indexed scene is fingerprinted as its normalized heading plus a hash of
+its body; scenes whose fingerprint also appears in the parent draft keep the
+parent run's extraction, risk and budget results, and only added or changed
+scenes go back through the per-scene agents.
+
+Normalization ignores what drafts routinely shuffle without changing a
+scene: scene numbers, page numbers (standalone or appended to headings by PDF
+export) and line wrapping.
+"""
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import copy
+import hashlib
+import logging
+import re
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Document, Run, RunStatus
+from app.services.document_text import read_full_text
+from app.services.documents import resolve_canonical
+from app.services.scene_index import SceneHeading, build_scene_index, get_scene_index, iter_scene_bodies, load_scene_index
+
+logger = logging.getLogger(__name__)
+
+_LEADING_NUMBER = re.compile(r"^\s*\d+(?:\.\d+)*[A-Z]?\s*\.?\s*", re.IGNORECASE)
+_TRAILING_NUMBER = re.compile(r"\s+\d+(?:\.\d+)*\s*$")
+_PAGE_NUMBER_LINE = re.compile(r"^\s*\d+\s*\.?\s*$", re.MULTILINE)
+
+
+# ============== FINGERPRINTS ==============
+def normalize_heading(line: str) -> str:
+    """Heading without scene/page numbers, case or spacing differences"""
+    line = _TRAILING_NUMBER.sub("", _LEADING_NUMBER.sub("", line))
+    return " ".join(line.replace("–", "-").upper().split())
+
+
+def body_hash(body: str) -> str:
+    """Hash of a scene body, insensitive to re-wrapping and page-number lines"""
+    text = " ".join(_PAGE_NUMBER_LINE.sub("", body).split())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint_scenes(script_text: str, headings: Sequence[SceneHeading]) -> List[str]:
+    """One fingerprint per indexed scene, in script order"""
+    fingerprints = []
+    for _, scene in iter_scene_bodies(script_text, headings):
+        heading_line, _, body = scene.partition("\n")
+        fingerprints.append(f"{normalize_heading(heading_line)}|{body_hash(body)}")
+    return fingerprints
+
+
+# ============== BASELINE ==============
+@dataclass
+class RevisionBaseline:
+    """The parent draft's scene fingerprints and its latest completed run's results"""
+    parent_document_id: str
+    parent_run_id: str
+    scene_numbers: Dict[str, List[str]]   # fingerprint -> parent scene numbers (script order)
+    scenes: Dict[str, dict]               # scene number -> extracted scene
+    risks: Dict[str, dict]                # scene number -> risk entry
+    budgets: Dict[str, dict]              # scene number -> budget entry
+
+    def take(self, fingerprint: str) -> Optional[Tuple[dict, dict, dict]]:
+        """Claim a parent scene with this fingerprint (each parent scene is reused once)"""
+        for number in self.scene_numbers.get(fingerprint, []):
+            if number in self.scenes and number in self.risks and number in self.budgets:
+                self.scene_numbers[fingerprint].remove(number)
+                return self.scenes[number], self.risks[number], self.budgets[number]
+        return None
+
+
+def _by_scene_number(entries: Optional[list]) -> Dict[str, dict]:
+    by_number = {}
+    for entry in entries or []:
+        if isinstance(entry, dict) and entry.get("scene_number") is not None:
+            by_number.setdefault(str(entry["scene_number"]), entry)
+    return by_number
+
+
+def baseline_from_result(
+    parent_document_id: str,
+    parent_run_id: str,
+    script_text: str,
+    headings: Sequence[SceneHeading],
+    result: Dict[str, Any],
+) -> RevisionBaseline:
+    """Build a baseline from the parent's text, scene index and enhanced result JSON"""
+    scene_numbers: Dict[str, List[str]] = {}
+    for heading, fingerprint in zip(headings, fingerprint_scenes(script_text, headings)):
+        scene_numbers.setdefault(fingerprint, []).append(str(heading.scene_number))
+    return RevisionBaseline(
+        parent_document_id=parent_document_id,
+        parent_run_id=parent_run_id,
+        scene_numbers=scene_numbers,
+        scenes=_by_scene_number((result.get("scenes_analysis") or {}).get("scenes")),
+        risks=_by_scene_number((result.get("risk_intelligence") or {}).get("risks")),
+        budgets=_by_scene_number((result.get("budget_intelligence") or {}).get("budgets")),
+    )
+
+
+async def load_revision_baseline(session: AsyncSession, document: Document) -> Optional[RevisionBaseline]:
+    """
+    Baseline for an incremental run of a revised draft
+
+    Uses the parent's latest completed run across the parent's upload group
+    (canonical + aliases). Returns None when the document has no parent, the
+    parent is gone, or the parent was never analyzed.
+    """
+    parent_id = document.parent_document_id
+    if not parent_id and document.canonical_id:
+        parent_id = (await resolve_canonical(session, document)).parent_document_id
+    if not parent_id:
+        return None
+
+    parent = await session.get(Document, parent_id)
+    if parent is None:
+        logger.warning(f"⚠️ Parent draft {parent_id} of {document.id} no longer exists")
+        return None
+    parent_canonical = await resolve_canonical(session, parent)
+
+    result = await session.execute(
+        select(Run)
+        .join(Document, Document.id == Run.document_id)
+        .where(
+            or_(Document.id == parent_canonical.id, Document.canonical_id == parent_canonical.id),
+            Run.status == RunStatus.COMPLETED,
+            Run.enhanced_result_json.is_not(None),
+        )
+        .order_by(Run.completed_at.desc())
+        .limit(1)
+    )
+    parent_run = result.scalars().first()
+    if parent_run is None:
+        logger.info(f"ℹ️ Parent draft {parent_id} has no completed run - running a full analysis")
+        return None
+
+    script_text = await read_full_text(session, parent_canonical)
+    headings = await get_scene_index(session, parent_canonical)
+    if headings is None:
+        headings = load_scene_index(await asyncio.to_thread(build_scene_index, script_text))
+
+    return await asyncio.to_thread(
+        baseline_from_result, parent_id, parent_run.id, script_text, headings, parent_run.enhanced_result_json
+    )
+
+
+# ============== PLAN ==============
+@dataclass
+class RevisionPlan:
+    """Which scenes of the new draft can reuse parent results"""
+    carried: Dict[int, Tuple[dict, dict, dict]] = field(default_factory=dict)  # position -> (scene, risk, budget)
+    changed: List[int] = field(default_factory=list)                           # positions to re-analyze
+    removed: int = 0                                                           # parent scenes not reused
+
+    def summary(self, baseline: RevisionBaseline) -> Dict[str, Any]:
+        return {
+            "parent_document_id": baseline.parent_document_id,
+            "parent_run_id": baseline.parent_run_id,
+            "scenes_reused": len(self.carried),
+            "scenes_reanalyzed": len(self.changed),
+            "scenes_removed": self.removed,
+        }
+
+
+def plan_revision(script_text: str, headings: Sequence[SceneHeading], baseline: RevisionBaseline) -> RevisionPlan:
+    """
+    Diff a draft against its baseline at the scene level
+
+    Carried results are deep copies renumbered to the new draft's scene
+    numbers, so later tiers can mutate them freely.
+    """
+    plan = RevisionPlan()
+    parent_total = sum(len(numbers) for numbers in baseline.scene_numbers.values())
+
+    for position, fingerprint in enumerate(fingerprint_scenes(script_text, headings)):
+        reused = baseline.take(fingerprint)
+        if reused is None:
+            plan.changed.append(position)
+            continue
+        number = headings[position].scene_number
+        plan.carried[position] = tuple(
+            {**copy.deepcopy(entry), "scene_number": number} for entry in reused
+        )
+
+    plan.removed = parent_total - len(plan.carried)
+    return plan
+
+
+def changed_subscript(
+    script_text: str,
+    headings: Sequence[SceneHeading],
+    positions: Sequence[int],
+) -> Tuple[str, List[SceneHeading]]:
+    """
+    Text and scene index holding only the given scenes
+
+    Headings keep their scene numbers; offsets and line numbers are rebased
+    onto the sub-script.
+    """
+    wanted = set(positions)
+    bodies, sub_index = [], []
+    offset = line = 0
+    for position, (heading, body) in enumerate(iter_scene_bodies(script_text, headings)):
+        if position not in wanted:
+            continue
+        sub_index.append(replace(heading, char_offset=offset, line=line))
+        bodies.append(body)
+        offset += len(body) + 1
+        line += body.count("\n") + 1
+    return "\n".join(bodies), sub_index
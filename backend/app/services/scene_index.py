@@ -0,0 +1,414 @@
+"""
+Scene index - scene-heading detection done once per document
+
+Headings are scanned at ingestion and stored on the Document as a compact
+list of rows, so later runs (and chunked LLM extraction) can slice scene
+bodies straight from the stored text instead of rescanning every line.
+
+Row layout (JSON array, one per heading, in script order):
+
+    [char_offset, line, scene_number, int_ext, location, time_of_day, priority]
+
+char_offset is the offset of the heading line in "\n".join(pages); line is its
+0-based line number. priority is the pattern that matched (1 numbered,
+2 standard, 3 minimal) and maps to the regex extractor's confidence.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+import logging
+import re
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Document
+from app.services.document_text import read_lines
+
+logger = logging.getLogger(__name__)
+
+# One pass over the whole buffer instead of three re.match calls per line.
+# [^\S\n] is "whitespace but not a newline" so no match spans lines, and
+# values ending in \S (or followed by the (?<=\S) guard) plus the trailing
+# [^\S\n]* reproduce matching against line.strip(). The pattern starts with
+# a literal newline so the engine jumps from line start to line start. The
+# leading whitespace is matched once, atomically: the lookahead captures it
+# and the backreference consumes exactly that, so an indented dialogue line
+# is never backtracked into (the same effect as a possessive *+, which needs
+# Python 3.11). The second lookahead then rejects lines that cannot open with
+# a number or INT/EXT before any heading form is tried.
+#
+#   num + ie + loc [- time]   Pattern 1: numbered "29.5 INT. LOCATION - TIME"
+#   ie + loc - time           Pattern 2: standard "INT. LOCATION - TIME"
+#   min_ie + min_loc          Pattern 3: minimal "INT. LOCATION" (no time)
+#
+# Patterns 1 and 2 share one branch (the number is optional); an unnumbered
+# match without a time falls through to pattern 3 in scan_scene_headings.
+_WS = r"[^\S\n]"
+_INT_EXT = r"(?:INT(?:/EXT)?|EXT)"
+HEADING_PATTERN = re.compile(
+    rf"\n(?=(?P<indent>{_WS}*))(?P=indent)(?=\d|[IE][NX]T)(?:"
+    rf"(?:(?P<num>\d+(?:\.\d+)*){_WS}*\.?{_WS}+)?(?P<ie>{_INT_EXT}){_WS}*\.?{_WS}+"
+    rf"(?P<loc>[A-Z][^-\n]+?)(?:{_WS}*[-–]{_WS}*(?P<time>[^\n]*\S)|(?<=\S))"
+    rf"|(?P<min_ie>{_INT_EXT}){_WS}*\.?{_WS}+(?P<min_loc>[A-Z][^\n]*?\S)"
+    rf"){_WS}*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Lines that look like a slug line but match no heading form: numbered lines
+# (including non-Latin "12. <location>"), INTERIOR/EXTERIOR, I/E, SCENE 4 ...
+SUSPECT_HEADING_PATTERN = re.compile(
+    rf"\n{_WS}*(?:\d+[A-Z]?(?:\.\d+)*[.):]?{_WS}+\S|(?:INTERIOR|EXTERIOR|INT|EXT|I/E|E/I|SCENE|SC)\b)[^\n]{{0,80}}$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+PRIORITY_CONFIDENCE = {1: 0.98, 2: 0.90, 3: 0.70}
+
+
+@dataclass
+class SceneHeading:
+    """One detected scene heading"""
+    char_offset: int
+    line: int
+    scene_number: Union[str, int]
+    int_ext: str
+    location: str
+    time_of_day: str
+    priority: int
+
+    def to_row(self) -> list:
+        return [self.char_offset, self.line, self.scene_number, self.int_ext,
+                self.location, self.time_of_day, self.priority]
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "SceneHeading":
+        return cls(*row)
+
+
+# ============== SCAN ==============
+def _iter_line_matches(pattern: re.Pattern, script_text: str) -> Iterator[tuple]:
+    """Yield (line_offset, match) for a newline-prefixed line pattern"""
+    # Matches begin at the newline before a line; the first line has none,
+    # so it is matched on its own with one prepended
+    first_end = script_text.find("\n")
+    first_line = "\n" + (script_text if first_end < 0 else script_text[:first_end])
+    match = pattern.match(first_line)
+    if match:
+        yield 0, match
+    for match in pattern.finditer(script_text):
+        yield match.start() + 1, match
+
+
+def scan_scene_headings(script_text: str) -> List[SceneHeading]:
+    """
+    Detect scene headings in one compiled pass over the text
+
+    Keeps the regex extractor's rules: numbered headings win, unnumbered ones
+    get sequential numbers, duplicate scene numbers are skipped and minimal
+    headings only count on lines shorter than 100 characters.
+
+    Args:
+        script_text: Full script text
+
+    Returns:
+        Headings in script order
+    """
+    headings = []
+    sequential_number = 0
+    seen_scene_numbers = set()
+    line = 0
+    last_offset = 0
+
+    for offset, match in _iter_line_matches(HEADING_PATTERN, script_text):
+        line += script_text.count("\n", last_offset, offset)
+        last_offset = offset
+
+        num, int_ext, location, time_of_day, min_ie, min_loc = match.group("num", "ie", "loc", "time", "min_ie", "min_loc")
+        if num is not None:
+            if num in seen_scene_numbers:
+                logger.debug(f"⚠️ Skipping duplicate scene number: {num}")
+                continue
+            seen_scene_numbers.add(num)
+            headings.append(SceneHeading(
+                offset, line, num, int_ext.upper(), location.strip(),
+                time_of_day.strip() if time_of_day else "DAY", 1,
+            ))
+            continue
+
+        if time_of_day is not None:
+            priority, time_of_day = 2, time_of_day.strip()
+        elif len(match.group().strip()) < 100:
+            priority, int_ext, location, time_of_day = 3, min_ie or int_ext, min_loc or location, "DAY"
+        else:
+            continue
+
+        # Only unnumbered headings consume sequential numbers
+        scene_num = sequential_number + 1
+        if scene_num in seen_scene_numbers:
+            logger.debug(f"⚠️ Skipping duplicate sequential number: {scene_num}")
+            continue
+        sequential_number = scene_num
+        seen_scene_numbers.add(scene_num)
+        headings.append(SceneHeading(
+            offset, line, scene_num, int_ext.upper(), location.strip(), time_of_day, priority,
+        ))
+
+    return headings
+
+
+def build_scene_index(script_text: str) -> List[list]:
+    """Scan a script and return the compact rows stored on Document.scene_index_json"""
+    return [heading.to_row() for heading in scan_scene_headings(script_text)]
+
+
+def load_scene_index(rows: Optional[Sequence[Sequence[Any]]]) -> List[SceneHeading]:
+    """Turn stored rows back into SceneHeading objects"""
+    return [SceneHeading.from_row(row) for row in rows or []]
+
+
+# ============== USE ==============
+def heading_line(script_text: str, heading: SceneHeading) -> str:
+    """The stripped heading line for a scene"""
+    end = script_text.find("\n", heading.char_offset)
+    return script_text[heading.char_offset:end if end >= 0 else None].strip()
+
+
+def scenes_from_index(script_text: str, headings: Sequence[SceneHeading]) -> List[Dict[str, Any]]:
+    """Build regex-extractor scene dicts from an index (no rescanning)"""
+    return [
+        {
+            "scene_number": heading.scene_number,
+            "location": heading.location,
+            "time_of_day": heading.time_of_day,
+            "description": heading_line(script_text, heading),
+            "confidence": PRIORITY_CONFIDENCE[heading.priority],
+            "is_continuation": heading.priority == 1 and "." in heading.scene_number,
+        }
+        for heading in headings
+    ]
+
+
+def iter_scene_bodies(script_text: str, headings: Sequence[SceneHeading]) -> Iterator[tuple]:
+    """
+    Yield (heading, body) pairs sliced straight from the text
+
+    A scene's body runs from its heading line up to the next heading.
+    """
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].char_offset if i + 1 < len(headings) else len(script_text)
+        yield heading, script_text[heading.char_offset:end].rstrip("\n")
+
+
+# ============== LLM WINDOWS ==============
+CHARS_PER_TOKEN = 4  # Rough budget estimate; no tokenizer dependency
+
+
+@dataclass
+class ScriptWindow:
+    """A slice of the script sent to the LLM in one prompt"""
+    index: int
+    start: int          # Char offset where the window's own content starts
+    end: int            # Char offset where it ends (exclusive)
+    text: str           # Overlap context + content
+    headings: List[SceneHeading]
+
+
+def plan_windows(
+    script_text: str,
+    headings: Sequence[SceneHeading],
+    max_tokens: int,
+    overlap_lines: int = 0,
+) -> List[ScriptWindow]:
+    """
+    Split a script into token-bounded windows on scene-heading boundaries
+
+    Whole scenes are packed greedily into each window; a single scene longer
+    than the budget is cut on line boundaries. Each window is prefixed with
+    the last `overlap_lines` lines before it so the model sees the context
+    around a boundary (scenes seen twice are deduped by the caller).
+
+    Args:
+        script_text: Full script text
+        headings: Scene index for the script (may be empty)
+        max_tokens: Token budget for a window's script text
+        overlap_lines: Lines of preceding context repeated at the window start
+
+    Returns:
+        Windows in script order covering the whole script
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+
+    # Scene boundaries (plus any preamble before the first heading)
+    cuts = [h.char_offset for h in headings]
+    if not cuts or cuts[0] != 0:
+        cuts.insert(0, 0)
+    cuts.append(len(script_text))
+
+    spans = []
+    for start, end in zip(cuts, cuts[1:]):
+        while end - start > max_chars:
+            # Oversized scene - cut at the last line break inside the budget
+            cut = script_text.rfind("\n", start, start + max_chars) + 1
+            if cut <= start:
+                cut = start + max_chars
+            spans.append((start, cut))
+            start = cut
+        if end > start:
+            spans.append((start, end))
+
+    windows: List[ScriptWindow] = []
+    window_start = window_end = 0
+    for start, end in spans:
+        if end - window_start > max_chars and window_end > window_start:
+            windows.append(_make_window(script_text, headings, len(windows), window_start, window_end, overlap_lines))
+            window_start = start
+        window_end = end
+    if window_end > window_start or not windows:
+        windows.append(_make_window(script_text, headings, len(windows), window_start, window_end, overlap_lines))
+    return windows
+
+
+def _make_window(script_text, headings, index, start, end, overlap_lines) -> ScriptWindow:
+    context_start = start
+    for _ in range(overlap_lines if start else 0):
+        previous = script_text.rfind("\n", 0, max(0, context_start - 1))
+        context_start = previous + 1
+        if previous < 0:
+            break
+    return ScriptWindow(
+        index=index,
+        start=start,
+        end=end,
+        text=script_text[context_start:end],
+        headings=[h for h in headings if start <= h.char_offset < end],
+    )
+
+
+# ============== AMBIGUOUS SEGMENTS ==============
+@dataclass
+class ScriptSegment:
+    """A region the heading scanner could not settle on its own"""
+    start: int
+    end: int
+    reason: str         # "gap" (long stretch without a heading) or "suspect" (malformed heading)
+
+
+def find_ambiguous_segments(
+    script_text: str,
+    headings: Sequence[SceneHeading],
+    gap_tokens: int,
+    context_lines: int = 2,
+) -> List[ScriptSegment]:
+    """
+    Regions worth a second look from the LLM in hybrid extraction
+
+    A region is ambiguous when it runs longer than `gap_tokens` without a
+    heading (a missed heading would hide a scene there), or when a line looks
+    like a slug line but matched no heading form. Suspect lines come with
+    `context_lines` lines on either side. Overlapping regions are merged.
+
+    Args:
+        script_text: Full script text
+        headings: Scene index for the script
+        gap_tokens: Longest heading-free stretch accepted without a check
+        context_lines: Lines of context around a suspect line
+
+    Returns:
+        Non-overlapping segments in script order
+    """
+    gap_chars = gap_tokens * CHARS_PER_TOKEN
+    segments = []
+
+    # Long stretches without a heading (the whole script if none was found)
+    bounds = [(0, headings[0].char_offset if headings else len(script_text))]
+    for i, heading in enumerate(headings):
+        body_start = script_text.find("\n", heading.char_offset) + 1 or len(script_text)
+        body_end = headings[i + 1].char_offset if i + 1 < len(headings) else len(script_text)
+        bounds.append((body_start, body_end))
+    for start, end in bounds:
+        if end - start > gap_chars or (not headings and script_text.strip()):
+            segments.append(ScriptSegment(start, end, "gap"))
+
+    # Slug-like lines the heading pattern rejected
+    heading_offsets = {heading.char_offset for heading in headings}
+    for offset, _ in _iter_line_matches(SUSPECT_HEADING_PATTERN, script_text):
+        if offset in heading_offsets:
+            continue
+        start = offset
+        for _ in range(context_lines):
+            start = script_text.rfind("\n", 0, max(0, start - 1)) + 1
+        end = offset
+        for _ in range(context_lines + 1):
+            next_break = script_text.find("\n", end)
+            end = len(script_text) if next_break < 0 else next_break + 1
+        segments.append(ScriptSegment(start, end, "suspect"))
+
+    merged: List[ScriptSegment] = []
+    for segment in sorted(segments, key=lambda segment: segment.start):
+        if merged and segment.start <= merged[-1].end:
+            merged[-1].end = max(merged[-1].end, segment.end)
+            if segment.reason == "gap":
+                merged[-1].reason = "gap"
+        else:
+            merged.append(segment)
+    return merged
+
+
+def batch_segments(
+    script_text: str,
+    segments: Sequence[ScriptSegment],
+    max_tokens: int,
+) -> List[List[ScriptSegment]]:
+    """
+    Pack segments into prompts of at most `max_tokens` script tokens
+
+    Segments longer than the budget are cut on line boundaries first.
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    pieces = []
+    for segment in segments:
+        if segment.end - segment.start <= max_chars:
+            pieces.append(segment)
+            continue
+        for window in plan_windows(script_text[segment.start:segment.end], [], max_tokens):
+            pieces.append(ScriptSegment(segment.start + window.start, segment.start + window.end, segment.reason))
+
+    batches: List[List[ScriptSegment]] = []
+    size = 0
+    for piece in pieces:
+        length = piece.end - piece.start
+        if batches and size + length <= max_chars:
+            batches[-1].append(piece)
+            size += length
+        else:
+            batches.append([piece])
+            size = length
+    return batches
+
+
+async def get_scene_index(session: AsyncSession, document: Document) -> Optional[List[SceneHeading]]:
+    """Load a document's stored scene index (None if it was never built)"""
+    result = await session.execute(
+        select(Document.scene_index_json).where(Document.id == document.id)
+    )
+    rows = result.scalar_one_or_none()
+    return None if rows is None else load_scene_index(rows)
+
+
+async def read_scene_body(
+    session: AsyncSession,
+    document: Document,
+    headings: Sequence[SceneHeading],
+    position: int,
+) -> str:
+    """
+    Lazily read one scene's body using the stored per-page text
+
+    Args:
+        session: Database session
+        document: Canonical document
+        headings: The document's scene index
+        position: Index into `headings`
+    """
+    start = headings[position].line
+    end = headings[position + 1].line if position + 1 < len(headings) else None
+    return "\n".join(await read_lines(session, document, start, end)).rstrip("\n")
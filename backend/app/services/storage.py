@@ -0,0 +1,132 @@
+"""
+Upload storage - stream script uploads to disk in fixed-size chunks
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import hashlib
+import logging
+import os
+import uuid
+
+from fastapi import UploadFile
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload passes the configured size limit"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"Upload exceeds limit of {max_bytes} bytes")
+
+
+@dataclass
+class StoredUpload:
+    """An upload written to disk (temp file until committed)"""
+    path: Path
+    size_bytes: int
+    sha256: str
+
+    def commit(self, final_path: Path) -> Path:
+        """Atomically rename the temp file to its final name"""
+        os.replace(self.path, final_path)
+        self.path = final_path
+        return final_path
+
+    def discard(self) -> None:
+        """Remove the temp file (e.g. when the content is a duplicate)"""
+        self.path.unlink(missing_ok=True)
+
+
+async def stream_upload_to_temp(
+    upload: UploadFile,
+    dest_dir: Path,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Stream an upload to a hidden temp file in `dest_dir` without buffering it
+
+    The SHA-256 digest and byte count are updated as chunks arrive and the
+    size limit is enforced early, so an oversized upload is aborted as soon
+    as it passes the limit. The caller decides whether to commit() the temp
+    file under its final name or discard() it.
+
+    Args:
+        upload: Incoming FastAPI upload
+        dest_dir: Directory for the temp file (same filesystem as the final file)
+        max_bytes: Size limit (defaults to settings.upload_max_size_mb)
+        chunk_size: Read size in bytes (defaults to settings.upload_chunk_size_kb)
+
+    Returns:
+        StoredUpload pointing at the temp file
+
+    Raises:
+        UploadTooLargeError: If the upload passes max_bytes
+    """
+    if max_bytes is None:
+        max_bytes = settings.upload_max_size_mb * 1024 * 1024
+    if chunk_size is None:
+        chunk_size = settings.upload_chunk_size_kb * 1024
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = dest_dir / f".{uuid.uuid4().hex}.part"
+
+    digest = hashlib.sha256()
+    size_bytes = 0
+
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size_bytes += len(chunk)
+                if size_bytes > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                digest.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    logger.debug(f"Streamed upload to {temp_path.name}: {size_bytes} bytes")
+    return StoredUpload(path=temp_path, size_bytes=size_bytes, sha256=digest.hexdigest())
+
+
+async def stream_upload_to_disk(
+    upload: UploadFile,
+    dest_dir: Path,
+    filename: str,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Stream an upload to `dest_dir/filename` and commit it atomically
+
+    Args:
+        upload: Incoming FastAPI upload
+        dest_dir: Directory to store the file in
+        filename: Final file name inside dest_dir
+        max_bytes: Size limit (defaults to settings.upload_max_size_mb)
+        chunk_size: Read size in bytes (defaults to settings.upload_chunk_size_kb)
+
+    Returns:
+        StoredUpload with final path, size and hex digest
+
+    Raises:
+        UploadTooLargeError: If the upload passes max_bytes
+    """
+    stored = await stream_upload_to_temp(upload, dest_dir, max_bytes, chunk_size)
+    try:
+        stored.commit(dest_dir / filename)
+    except BaseException:
+        stored.discard()
+        raise
+    return stored
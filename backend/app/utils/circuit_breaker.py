@@ -0,0 +1,180 @@
+"""
+Circuit breakers for LLM endpoints
+
+When LM Studio is down (or hung) every agent would otherwise wait out its
+own connection error or 120s timeout before falling back. Each endpoint gets
+a breaker:
+
+- closed: requests flow; settings.llm_breaker_failure_threshold consecutive
+  failures (timeouts, connection errors, 5xx) open it
+- open: requests fail immediately for settings.llm_breaker_cooldown_seconds,
+  so agents go straight to their template/rule fallbacks
+- half_open: after the cool-down one probe request is let through; success
+  closes the breaker, failure opens it for another cool-down
+
+State is reported on /health/llm.
+"""
+from typing import Callable, Dict, Optional
+import logging
+import threading
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one endpoint"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        cooldown_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            name: Endpoint label (URL or provider:model)
+            failure_threshold: Consecutive failures that open the breaker
+                (defaults to settings.llm_breaker_failure_threshold)
+            cooldown_seconds: Time spent open before a probe is allowed
+                (defaults to settings.llm_breaker_cooldown_seconds)
+            clock: Time source (tests)
+        """
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.counters: Dict[str, int] = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def failure_threshold(self) -> int:
+        if self._failure_threshold is not None:
+            return self._failure_threshold
+        return settings.llm_breaker_failure_threshold
+
+    @property
+    def cooldown_seconds(self) -> float:
+        if self._cooldown_seconds is not None:
+            return self._cooldown_seconds
+        return settings.llm_breaker_cooldown_seconds
+
+    def _cooled_down(self) -> bool:
+        return self.opened_at is not None and self._clock() - self.opened_at >= self.cooldown_seconds
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected (does not start a probe)"""
+        with self._lock:
+            if self.state == OPEN:
+                return not self._cooled_down()
+            return self.state == HALF_OPEN and self._probe_in_flight
+
+    def allow(self) -> bool:
+        """
+        Ask to send one request
+
+        Returns:
+            False if the caller should fail fast. After the cool-down the first
+            caller is let through as the half-open probe.
+        """
+        with self._lock:
+            if self.state == OPEN and self._cooled_down():
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"🟡 LLM circuit half-open, probing {self.name}")
+            if self.state == HALF_OPEN and (
+                not self._probe_in_flight or self._clock() - self._probe_started >= self.cooldown_seconds
+            ):
+                # A probe that never reported back (cancelled caller) is replaced after a cool-down
+                self._probe_in_flight = True
+                self._probe_started = self._clock()
+                return True
+            if self.state == CLOSED:
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def check(self) -> None:
+        """allow(), raising CircuitOpenError when the caller should fail fast"""
+        if not self.allow():
+            raise CircuitOpenError(f"LLM circuit open for {self.name}")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.counters["successes"] += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info(f"🟢 LLM circuit closed, {self.name} is responding again")
+            self.state = CLOSED
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counters["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state == CLOSED:
+                    self.counters["opened"] += 1
+                    logger.warning(
+                        f"🔴 LLM circuit open after {self.consecutive_failures} failures: {self.name} "
+                        f"(skipping calls for {self.cooldown_seconds:.0f}s)"
+                    )
+                self.state = OPEN
+                self.opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN and self.opened_at is not None:
+                retry_in = round(max(0.0, self.opened_at + self.cooldown_seconds - self._clock()), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_seconds": retry_in,
+                **self.counters,
+            }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per endpoint, shared by every client talking to it"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def for_endpoint(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Per-endpoint state for /health/llm"""
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {name: breaker.stats() for name, breaker in breakers}
+
+
+# Global instance
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,141 @@
+"""
+Deadline budgets for pipeline runs
+
+run_pipeline_full_ai can be given an overall deadline (start_run uses
+settings.run_deadline_seconds). The deadline is split into per-tier shares,
+and the current tier's deadline is kept in a context variable, so it reaches
+every LLM call - including ones made from tasks the tier spawns - without
+threading a parameter through each agent:
+
+- the clients cap each request's timeout at the time left (call_timeout)
+- llm_available() sends agents straight to their template/rule fallbacks
+  once the tier's time is spent
+
+Shares are of the time *remaining* when a tier starts, so time an early tier
+does not use rolls over to the later ones.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """The current tier's time budget is spent; use the fallback instead of calling the LLM"""
+
+
+class Deadline:
+    """A point in time (time.monotonic) work should finish by"""
+
+    def __init__(self, expires_at: float, clock: Callable[[], float] = time.monotonic):
+        self.expires_at = expires_at
+        self._clock = clock
+
+    @classmethod
+    def after(cls, seconds: float, clock: Callable[[], float] = time.monotonic) -> "Deadline":
+        return cls(clock() + seconds, clock)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def share(self, fraction: float) -> "Deadline":
+        """Child deadline covering `fraction` of the time left (never past this one)"""
+        return Deadline(self._clock() + self.remaining() * min(max(fraction, 0.0), 1.0), self._clock)
+
+
+class DeadlineBudget:
+    """An overall deadline split between named tiers, in run order"""
+
+    def __init__(self, deadline: Deadline, shares: Dict[str, float]):
+        """
+        Args:
+            deadline: Deadline for the whole run
+            shares: Tier name -> relative share, in the order the tiers run
+        """
+        self.deadline = deadline
+        self.shares = dict(shares)
+
+    def tier(self, *names: str) -> Deadline:
+        """
+        Deadline for the given tier(s), run together (e.g. overlapped tiers 1 and 2)
+
+        The tiers get their share of the time left relative to themselves and
+        every tier after them.
+        """
+        order = list(self.shares)
+        first = min(order.index(name) for name in names)
+        later = sum(self.shares[name] for name in order[first:])
+        share = sum(self.shares[name] for name in names)
+        return self.deadline.share(share / later if later else 1.0)
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("llm_deadline", default=None)
+_current_budget: ContextVar[Optional[DeadlineBudget]] = ContextVar("pipeline_budget", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the tier running in this context, if any"""
+    return _current_deadline.get()
+
+
+def deadline_expired() -> bool:
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired
+
+
+def call_timeout(default: Optional[float]) -> Optional[float]:
+    """
+    Timeout for one LLM request: the client's default, capped at the time left
+
+    Raises:
+        DeadlineExceeded: if the current deadline has already passed
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("run deadline spent")
+    return remaining if default is None else min(default, remaining)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make `deadline` current for the block (None leaves calls unbounded)"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def pipeline_budget(seconds: Optional[float], shares: Dict[str, float]) -> Iterator[Optional[DeadlineBudget]]:
+    """Start a run's budget; seconds None/0 means no deadline"""
+    budget = DeadlineBudget(Deadline.after(seconds), shares) if seconds and seconds > 0 else None
+    budget_token = _current_budget.set(budget)
+    try:
+        with deadline_scope(budget.deadline if budget else None):
+            yield budget
+    finally:
+        _current_budget.reset(budget_token)
+
+
+@contextmanager
+def tier_scope(*names: str) -> Iterator[Optional[Deadline]]:
+    """Run a block under its tier's share of the current pipeline budget"""
+    budget = _current_budget.get()
+    if budget is None:
+        yield None
+        return
+    deadline = budget.tier(*names)
+    logger.info(f"⏱️ {' + '.join(names)}: {deadline.remaining():.1f}s of the run deadline")
+    with deadline_scope(deadline):
+        yield deadline
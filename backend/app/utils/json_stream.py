@@ -0,0 +1,124 @@
+"""
+Incremental JSON array parsing for streamed LLM responses
+
+The extraction prompts ask for a single JSON array of objects. Fed the
+response a chunk at a time, IncrementalJSONArrayParser returns each element
+of that array as soon as its closing brace arrives, so callers can act on
+early scenes while the model is still generating the rest.
+
+Anything before the opening '[' (prose, ```json fences) is skipped, and
+elements that fail to parse are dropped like the non-streaming
+_parse_json_safely helpers would drop the whole response.
+"""
+from typing import Any, AsyncIterable, AsyncIterator, List
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalJSONArrayParser:
+    """Yield top-level array elements from a JSON array delivered in chunks"""
+
+    def __init__(self):
+        self.started = False   # Seen the opening '['
+        self.done = False      # Seen the matching ']'
+        self.skipped = 0       # Elements that were not valid JSON
+        self._buffer = ""
+        self._pos = 0          # Next character of _buffer to scan
+        self._start = None     # Buffer index where the current element began
+        self._depth = 0        # Nesting depth inside the top-level array
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume the next piece of the response
+
+        Args:
+            chunk: Text exactly as streamed (may split tokens, strings or escapes)
+
+        Returns:
+            Array elements completed by this chunk, in order
+        """
+        if self.done or not chunk:
+            return []
+
+        self._buffer += chunk
+        if not self.started:
+            opening = self._buffer.find("[")
+            if opening < 0:
+                self._buffer = ""
+                return []
+            self.started = True
+            self._buffer = self._buffer[opening + 1:]
+            self._pos = 0
+
+        completed = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                if self._start is None:
+                    self._start = i
+            elif char in "{[":
+                if self._start is None:
+                    self._start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # The top-level array itself closed
+                    self._finish_scalar(buffer, i, completed)
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buffer[self._start:i + 1], completed)
+                    self._start = None
+            elif char == "," and self._depth == 0:
+                self._finish_scalar(buffer, i, completed)
+            elif self._start is None and not char.isspace():
+                self._start = i  # Bare number / true / false / null
+            i += 1
+
+        # Drop what has been consumed so the buffer only holds the open element
+        if self._start is not None:
+            self._buffer = buffer[self._start:]
+            self._pos = i - self._start
+            self._start = 0
+        else:
+            self._buffer = ""
+            self._pos = 0
+        return completed
+
+    def _finish_scalar(self, buffer: str, end: int, completed: List[Any]) -> None:
+        """A ',' or ']' at depth 0 ends a string/scalar element, if one is open"""
+        if self._start is not None:
+            self._emit(buffer[self._start:end].strip(), completed)
+            self._start = None
+
+    def _emit(self, text: str, completed: List[Any]) -> None:
+        try:
+            completed.append(json.loads(text))
+        except json.JSONDecodeError:
+            self.skipped += 1
+            logger.warning(f"⚠️ Skipping unparseable array element: {text[:80]!r}")
+
+
+async def iter_json_array(chunks: AsyncIterable[str]) -> AsyncIterator[Any]:
+    """Yield array elements from an async stream of text chunks as they complete"""
+    parser = IncrementalJSONArrayParser()
+    async for chunk in chunks:
+        for element in parser.feed(chunk):
+            yield element
+        if parser.done:
+            break
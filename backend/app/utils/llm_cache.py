@@ -0,0 +1,295 @@
+"""
+LLM response cache - in-memory LRU (L1) in front of a size-capped SQLite file (L2)
+
+Re-running an unchanged script, or a what-if preset, sends prompts the model
+has already answered. Responses are cached under a hash of
+(provider, model, prompt, temperature, max_tokens):
+
+- L1: OrderedDict LRU of the most recent settings.llm_cache_memory_entries
+- L2: <storage>/cache/llm_cache.sqlite3, values compressed like the DB
+  columns (models/compressed.py), least-recently-used rows evicted once the
+  file's payload passes settings.llm_cache_disk_max_mb
+
+Entries older than settings.llm_cache_ttl_hours are treated as misses and
+dropped. Responses cut off at max_tokens are never stored, and answers an
+agent could not parse are discarded (llm_telemetry.mark_parse_failure).
+Both clients use aget/aput from the event loop (L2 work runs in a worker
+thread); the lock keeps every entry point safe from any thread.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+from app.models.compressed import compress_bytes, decompress_bytes
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at);
+"""
+
+
+def cache_key(provider: str, model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    """Stable key for one model call"""
+    payload = json.dumps([provider, model, prompt, round(float(temperature), 4), int(max_tokens)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-level (memory + SQLite) LRU cache of LLM responses with a TTL"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        memory_entries: Optional[int] = None,
+        disk_max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: SQLite file (defaults to <storage>/cache/llm_cache.sqlite3)
+            memory_entries: L1 size (defaults to settings.llm_cache_memory_entries)
+            disk_max_bytes: L2 payload cap (defaults to settings.llm_cache_disk_max_mb)
+            ttl_seconds: Entry lifetime, 0 = never expire (defaults to settings.llm_cache_ttl_hours)
+            clock: Time source (tests)
+        """
+        self._path = path
+        self._memory_entries = memory_entries
+        self._disk_max_bytes = disk_max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        self.counters: Dict[str, int] = dict.fromkeys(
+            ("hits_memory", "hits_disk", "misses", "stores", "evictions", "expired", "bypassed", "discarded"), 0
+        )
+
+    # ============== CONFIG ==============
+    @property
+    def enabled(self) -> bool:
+        return settings.llm_cache_enabled
+
+    @property
+    def path(self) -> Path:
+        return self._path or Path(settings.storage_path) / "cache" / "llm_cache.sqlite3"
+
+    @property
+    def memory_entries(self) -> int:
+        return self._memory_entries if self._memory_entries is not None else settings.llm_cache_memory_entries
+
+    @property
+    def disk_max_bytes(self) -> int:
+        if self._disk_max_bytes is not None:
+            return self._disk_max_bytes
+        return int(settings.llm_cache_disk_max_mb * 1024 * 1024)
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self._ttl_seconds if self._ttl_seconds is not None else settings.llm_cache_ttl_hours * 3600
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    # ============== L2 (SQLITE) ==============
+    def _connection(self) -> sqlite3.Connection:
+        """Open the L2 file on first use, dropping expired rows (caller holds the lock)"""
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            if self.ttl_seconds > 0:
+                db.execute("DELETE FROM llm_cache WHERE created_at < ?", (self._clock() - self.ttl_seconds,))
+            self._disk_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            self._db = db
+        return self._db
+
+    def _evict_disk(self, db: sqlite3.Connection) -> None:
+        """Drop least-recently-used rows until the payload is back under 90% of the cap"""
+        target = int(self.disk_max_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = db.execute(
+                "SELECT key, size FROM llm_cache ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            for key, size in rows:
+                if self._disk_bytes <= target:
+                    break
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._disk_bytes -= size
+                self.counters["evictions"] += 1
+
+    # ============== GET / PUT ==============
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if self._expired(created_at, now):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > max(0, self.memory_entries):
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for a key, or None (counts the hit/miss)"""
+        now = self._clock()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not None:
+                self.counters["hits_memory"] += 1
+                return value
+            return self._get_disk(key, now)
+
+    def _get_disk(self, key: str, now: float) -> Optional[str]:
+        """L2 lookup, promoting hits to L1 (caller holds the lock)"""
+        try:
+            db = self._connection()
+            row = db.execute("SELECT value, size, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._expired(row[2], now):
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._disk_bytes -= row[1]
+                self.counters["expired"] += 1
+                row = None
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ LLM cache read failed: {e}")
+            self.counters["misses"] += 1
+            return None
+
+        value = decompress_bytes(row[0]).decode("utf-8")
+        self._put_memory(key, value, row[2])
+        self.counters["hits_disk"] += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response in both levels (empty responses are never cached)"""
+        if not value:
+            return
+        now = self._clock()
+        blob = compress_bytes(value.encode("utf-8"))
+        with self._lock:
+            self._put_memory(key, value, now)
+            self.counters["stores"] += 1
+            if len(blob) > self.disk_max_bytes:
+                return
+            try:
+                db = self._connection()
+                previous = db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), now, now),
+                )
+                self._disk_bytes += len(blob) - (previous[0] if previous else 0)
+                self._evict_disk(db)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ LLM cache write failed: {e}")
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for the event loop: L1 inline, L2 in a worker thread"""
+        now = self._clock()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not None:
+                self.counters["hits_memory"] += 1
+                return value
+        return await asyncio.to_thread(self._locked_get_disk, key, now)
+
+    def _locked_get_disk(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            return self._get_disk(key, now)
+
+    async def aput(self, key: str, value: str) -> None:
+        """put() for the event loop (runs in a worker thread)"""
+        if value:
+            await asyncio.to_thread(self.put, key, value)
+
+    def discard(self, key: str) -> None:
+        """Drop one entry from both levels (e.g. an answer that failed to parse)"""
+        with self._lock:
+            removed = self._memory.pop(key, None) is not None
+            try:
+                if self._db is not None or self.path.exists():
+                    db = self._connection()
+                    row = db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self._disk_bytes -= row[0]
+                        removed = True
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ LLM cache delete failed: {e}")
+            if removed:
+                self.counters["discarded"] += 1
+
+    def bypass(self) -> None:
+        """Count a call that skipped the cache (use_cache=False)"""
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    # ============== MAINTENANCE ==============
+    def clear(self) -> None:
+        """Drop every entry (both levels); counters are kept"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None or self.path.exists():
+                self._connection().execute("DELETE FROM llm_cache")
+                self._disk_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, object]:
+        """Counters and sizes for /health/llm"""
+        with self._lock:
+            hits = self.counters["hits_memory"] + self.counters["hits_disk"]
+            lookups = hits + self.counters["misses"]
+            disk_entries = 0
+            if self._db is not None:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {
+                "enabled": self.enabled,
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Global instance
+llm_cache = LLMCache()
@@ -3,53 +3,172 @@ LLM client wrapper for Gemini API and Qwen3 Local (via LM Studio)
 """
 from google import genai
 from app.config import settings
-from tenacity import retry, stop_after_attempt, wait_exponential
+from app.utils.circuit_breaker import CircuitOpenError, circuit_breakers
+from app.utils.deadline import DeadlineExceeded, call_timeout, current_deadline, deadline_expired
+from app.utils.llm_cache import cache_key, llm_cache
+from app.utils.llm_limiter import llm_limiter
+from app.utils.llm_telemetry import (
+    LLMCall, end_call, mark_parse_failure, note_first_byte, note_outcome, note_truncated, note_usage, start_call,
+    track, upstream_call,
+)
+from app.utils.single_flight import single_flight
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
 import json
 import logging
 import asyncio
+import time
+import weakref
 import aiohttp
 
 logger = logging.getLogger(__name__)
 
+QWEN3_REQUEST_TIMEOUT = 120  # Seconds per request (or without data, for streams)
+
+# Live clients, so the app lifespan can close their sessions on shutdown
+_llm_clients: "weakref.WeakSet" = weakref.WeakSet()
+
+
+async def _cached_call(
+    provider: str, model: str, prompt: str, temperature: float, max_tokens: int,
+    use_cache: bool, request: Callable[[], Awaitable[str]]
+) -> str:
+    """
+    Shared call_model path: response cache, then single-flight, then upstream
+    
+    Concurrent callers with the same key share one upstream request
+    (utils/single_flight.py) even when the response cache is disabled. Every
+    call is recorded by utils/llm_telemetry.py. Truncated responses are not
+    cached, and mark_parse_failure() drops an answer that could not be parsed.
+    """
+    with track(provider, prompt) as call:
+        if not use_cache:
+            llm_cache.bypass()
+            return call.done(await request())
+        
+        key = cache_key(provider, model, prompt, temperature, max_tokens)
+        if llm_cache.enabled:
+            call.discard_cached = lambda: llm_cache.discard(key)
+            cached = await llm_cache.aget(key)
+            if cached is not None:
+                call.cache_hit = True
+                return call.done(cached)
+        else:
+            llm_cache.bypass()
+        
+        async def fetch() -> Tuple[str, LLMCall]:
+            # Runs in single-flight's neutral context, on behalf of every caller
+            with upstream_call(provider, prompt) as upstream:
+                response_text = await request()
+            if llm_cache.enabled and not upstream.truncated:
+                await llm_cache.aput(key, response_text)
+            return response_text, upstream
+        
+        call.coalesced = single_flight.in_flight(key)
+        response_text, upstream = await single_flight.run(key, fetch)
+        call.adopt(upstream)
+        return call.done(response_text)
+
 
 class GeminiClient:
-    """Wrapper for Google Gemini API calls (new genai SDK)"""
+    """Async wrapper for Google Gemini API calls (new genai SDK, client.aio surface)"""
     
     def __init__(self):
         self.model = settings.gemini_model
         self.request_delay = settings.gemini_request_delay
         # Initialize client with API key (new SDK)
         self.client = genai.Client(api_key=settings.gemini_api_key)
+        self._next_request_at = 0.0
+        self.breaker = circuit_breakers.for_endpoint(f"gemini:{self.model}")
+        _llm_clients.add(self)
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
-    def call_model(self, prompt: str, temperature: float = 0.3) -> str:
+    @property
+    def circuit_open(self) -> bool:
+        """True while the endpoint's breaker rejects calls (agents use their fallbacks)"""
+        return self.breaker.is_open
+    
+    async def call_model(self, prompt: str, temperature: float = 0.3, max_tokens: int = 4096, use_cache: bool = True) -> str:
         """
-        Call Gemini model with retry logic (using new genai SDK)
+        Call Gemini model with retry logic (same interface as Qwen3Client.call_model)
         
         Args:
             prompt: The prompt text
             temperature: Temperature for generation (0.0-1.0)
+            max_tokens: Max tokens in response
+            use_cache: Serve/store the response via the LLM response cache and
+                share identical in-flight calls (False = always a fresh request)
         
         Returns:
-            Model response text
+            Model response text (raises once retries are exhausted)
         """
+        return await _cached_call(
+            "gemini", self.model, prompt, temperature, max_tokens, use_cache,
+            lambda: self._generate(prompt, temperature, max_tokens)
+        )
+    
+    async def _throttle(self) -> None:
+        """Space request starts at least settings.gemini_request_delay apart without blocking the loop"""
+        now = time.monotonic()
+        start_at = max(now, self._next_request_at)
+        # Reserve the slot before sleeping so concurrent callers queue up behind it
+        self._next_request_at = start_at + self.request_delay
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+    
+    # tenacity sleeps with asyncio.sleep when the wrapped function is a coroutine
+    @retry(
+        retry=retry_if_not_exception_type((CircuitOpenError, DeadlineExceeded)),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Uncached generate_content call (one attempt, admitted by the breaker and limiter)"""
+        timeout = call_timeout(None)  # Only bounded by the run deadline, if any
+        self.breaker.check()
         try:
-            # New SDK API: client.models.generate_content()
-            response = self.client.models.generate_content(
+            text = await asyncio.wait_for(self._generate_once(prompt, temperature, max_tokens), timeout)
+            self.breaker.record_success()
+            note_outcome("ok")  # An earlier failed attempt may have set another outcome
+            return text
+        except asyncio.TimeoutError:
+            note_outcome("timeout")
+            if timeout is None or not deadline_expired():
+                self.breaker.record_failure()
+                logger.error("Gemini API error: request timed out")
+                raise
+            logger.warning(f"Gemini call stopped at the run deadline ({timeout:.1f}s)")
+            raise DeadlineExceeded("run deadline spent during Gemini call")
+        except Exception as e:
+            note_outcome("http_error" if isinstance(e, genai.errors.APIError) else "error")
+            self.breaker.record_failure()
+            logger.error(f"Gemini API error: {e}")
+            raise
+    
+    async def _generate_once(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        async with llm_limiter.slot("gemini", prompt) as slot:
+            await self._throttle()
+            # Async SDK API: client.aio.models.generate_content()
+            response = await self.client.aio.models.generate_content(
                 model=self.model,
                 contents=prompt,
                 config=genai.types.GenerateContentConfig(
                     temperature=temperature,
-                    max_output_tokens=4096,
+                    max_output_tokens=max_tokens,
                 )
             )
-            return response.text
-        except Exception as e:
-            logger.error(f"Gemini API error: {e}")
-            raise
+            note_first_byte()
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                note_usage(usage.prompt_token_count, usage.candidates_token_count)
+            candidates = getattr(response, "candidates", None) or []
+            if candidates and candidates[0].finish_reason == genai.types.FinishReason.MAX_TOKENS:
+                note_truncated()
+            slot.record_response(response.text)
+            return response.text or ""
+    
+    async def close(self) -> None:
+        """Close the SDK's async HTTP client"""
+        await self.client.aio.aclose()
     
     def extract_json_from_response(self, response_text: str) -> dict:
         """
@@ -70,6 +189,7 @@ class GeminiClient:
                 return json.loads(json_str)
         except json.JSONDecodeError:
             logger.error(f"Failed to parse JSON from: {response_text}")
+            mark_parse_failure()
         
         return {}
 
@@ -89,9 +209,56 @@ class Qwen3Client:
         self.base_url = base_url or settings.qwen3_base_url
         self.model = model or settings.qwen3_model
         self.endpoint = f"{self.base_url}/chat/completions"
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.breaker = circuit_breakers.for_endpoint(self.endpoint)
+        _llm_clients.add(self)
         logger.info(f"[Qwen3Client] Initialized at {self.endpoint}")
     
-    async def call_model(self, prompt: str, temperature: float = 0.7, max_tokens: int = 4096) -> str:
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        The client's pooled session, created on first use
+        
+        One session (and TCPConnector) is reused for every call so requests
+        keep their connections alive instead of reconnecting each time. A
+        session belongs to the event loop it was created on; if the client is
+        used from a new loop (scripts calling asyncio.run repeatedly), a fresh
+        session is created there.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._session_loop is not loop:
+            # Can't await the old loop's session from here; detach it so it counts as closed
+            self._session.detach()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=settings.llm_http_pool_size,
+                limit_per_host=settings.llm_http_pool_per_host,
+                keepalive_timeout=settings.llm_http_keepalive_seconds,
+                ttl_dns_cache=settings.llm_http_dns_cache_seconds,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
+    
+    @property
+    def circuit_open(self) -> bool:
+        """True while the endpoint's breaker rejects calls (agents use their fallbacks)"""
+        return self.breaker.is_open
+    
+    def _record_status(self, status: int) -> None:
+        """5xx counts against the breaker; any other answer shows the server is up"""
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+    
+    async def close(self) -> None:
+        """Close the pooled session (it is recreated if the client is used again)"""
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+    
+    async def call_model(self, prompt: str, temperature: float = 0.7, max_tokens: int = 4096, use_cache: bool = True) -> str:
         """
         Call Qwen3 model via LM Studio HTTP API
         
@@ -99,49 +266,233 @@ class Qwen3Client:
             prompt: The prompt text
             temperature: Temperature for generation (0.0-1.0)
             max_tokens: Max tokens in response
+            use_cache: Serve/store the response via the LLM response cache and
+                share identical in-flight calls (False = always a fresh request)
         
         Returns:
-            Model response text
+            Model response text ("" on errors, which are never cached)
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are an expert film production analyst. Provide detailed, structured analysis in valid JSON format."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": False
-                }
-                
-                async with session.post(
-                    self.endpoint,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=120)
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"[Qwen3Client] HTTP {response.status}: {error_text}")
-                        return ""
+            return await _cached_call(
+                "qwen3", self.model, prompt, temperature, max_tokens, use_cache,
+                lambda: self._request(prompt, temperature, max_tokens)
+            )
+        except DeadlineExceeded:
+            # Run deadline passed while waiting on an identical in-flight call
+            logger.warning("[Qwen3Client] Run deadline reached waiting for a shared request")
+            return ""
+    
+    async def _request(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Uncached chat completion request, cut short at the run deadline if one is set"""
+        try:
+            timeout = call_timeout(QWEN3_REQUEST_TIMEOUT)
+        except DeadlineExceeded:
+            note_outcome("skipped")
+            logger.info("[Qwen3Client] Run deadline spent, skipping call")
+            return ""
+        if not self.breaker.allow():
+            note_outcome("skipped")
+            logger.info(f"[Qwen3Client] Circuit open for {self.endpoint}, skipping call")
+            return ""
+        try:
+            payload = {
+                "model": self.model,
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": "You are an expert film production analyst. Provide detailed, structured analysis in valid JSON format."
+                    },
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": False
+            }
+            
+            post = self._post(prompt, payload, timeout)
+            if current_deadline() is not None:
+                # The deadline also bounds time queued in the limiter
+                return await asyncio.wait_for(post, timeout)
+            return await post
         
         except asyncio.TimeoutError:
-            logger.error("[Qwen3Client] Request timeout (120s)")
+            note_outcome("timeout")
+            if deadline_expired():
+                # The run's deadline cut the call short; not the server's fault
+                logger.warning(f"[Qwen3Client] Request stopped at the run deadline ({timeout:.1f}s)")
+            else:
+                self.breaker.record_failure()
+                logger.error(f"[Qwen3Client] Request timeout ({QWEN3_REQUEST_TIMEOUT}s)")
             return ""
         except aiohttp.ClientConnectorError:
+            note_outcome("http_error")
+            self.breaker.record_failure()
             logger.error("[Qwen3Client] Connection refused - is LM Studio running at " + self.endpoint + "?")
             return ""
         except Exception as e:
+            note_outcome("error")
+            self.breaker.record_failure()
             logger.error(f"[Qwen3Client] Error: {str(e)}")
             return ""
     
+    async def _post(self, prompt: str, payload: dict, timeout: float) -> str:
+        """One limiter-admitted POST; returns the content ("" on HTTP errors)"""
+        async with llm_limiter.slot("qwen3", prompt) as slot, self._get_session().post(
+            self.endpoint,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            note_first_byte()
+            if response.status == 200:
+                result = await response.json()
+                choice = result["choices"][0]
+                content = choice["message"]["content"]
+                if choice.get("finish_reason") == "length":
+                    note_truncated()
+                usage = result.get("usage") or {}
+                note_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                slot.record_response(content)
+                self.breaker.record_success()
+                return content
+            else:
+                note_outcome("http_error")
+                error_text = await response.text()
+                self._record_status(response.status)
+                logger.error(f"[Qwen3Client] HTTP {response.status}: {error_text}")
+                return ""
+    
+    async def call_model_stream(
+        self, prompt: str, temperature: float = 0.7, max_tokens: int = 4096, use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion via Server-Sent Events ("stream": true)
+        
+        Args:
+            prompt: The prompt text
+            temperature: Temperature for generation (0.0-1.0)
+            max_tokens: Max tokens in response
+            use_cache: Serve/store the response via the LLM response cache
+                (shared with call_model; a hit is yielded as one chunk)
+        
+        Yields:
+            Content deltas as they arrive. Errors are logged and end the stream
+            early, like call_model returning "" - callers treat an unfinished
+            response as truncated. Only streams that reach [DONE] without
+            hitting max_tokens are cached.
+        """
+        call = start_call("qwen3", prompt)
+        try:
+            key = None
+            if use_cache and llm_cache.enabled:
+                key = cache_key("qwen3", self.model, prompt, temperature, max_tokens)
+                call.discard_cached = lambda: llm_cache.discard(key)
+                cached = await llm_cache.aget(key)
+                if cached is not None:
+                    call.cache_hit = True
+                    yield call.done(cached)
+                    return
+            else:
+                llm_cache.bypass()
+            try:
+                stall_timeout = call_timeout(QWEN3_REQUEST_TIMEOUT)
+            except DeadlineExceeded:
+                call.outcome = "skipped"
+                logger.info("[Qwen3Client] Run deadline spent, skipping stream")
+                return
+            deadline = current_deadline()
+            if not self.breaker.allow():
+                call.outcome = "skipped"
+                logger.info(f"[Qwen3Client] Circuit open for {self.endpoint}, skipping stream")
+                return
+            parts = []
+            
+            payload = {
+                "model": self.model,
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": "You are an expert film production analyst. Provide detailed, structured analysis in valid JSON format."
+                    },
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True,
+                # Final chunk carries token usage (OpenAI-compatible servers)
+                "stream_options": {"include_usage": True}
+            }
+            
+            try:
+                async with llm_limiter.slot("qwen3", prompt) as slot, self._get_session().post(
+                    self.endpoint,
+                    json=payload,
+                    # No total limit unless the run has a deadline: long generations
+                    # are fine while tokens keep coming
+                    timeout=aiohttp.ClientTimeout(
+                        total=deadline.remaining() if deadline else None,
+                        sock_connect=min(30, stall_timeout),
+                        sock_read=stall_timeout,
+                    )
+                ) as response:
+                    if response.status != 200:
+                        call.outcome = "http_error"
+                        error_text = await response.text()
+                        self._record_status(response.status)
+                        logger.error(f"[Qwen3Client] HTTP {response.status}: {error_text}")
+                        return
+                    
+                    # Headers arrived: the model is serving (a stall later still counts below)
+                    self.breaker.record_success()
+                    async for raw_line in response.content:
+                        line = raw_line.decode("utf-8", errors="replace").strip()
+                        if not line.startswith("data:"):
+                            continue  # Blank separators, ": keep-alive" comments, event: lines
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            call.done("".join(parts))
+                            slot.record_response(call.response)
+                            if key and not call.truncated:
+                                await llm_cache.aput(key, call.response)
+                            return
+                        try:
+                            event = json.loads(data)
+                        except json.JSONDecodeError:
+                            logger.warning(f"[Qwen3Client] Skipping malformed SSE event: {data[:100]}")
+                            continue
+                        usage = event.get("usage")
+                        if usage:
+                            call.set_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                        choices = event.get("choices") or [{}]
+                        if choices[0].get("finish_reason") == "length":
+                            call.truncated = True
+                        content = (choices[0].get("delta") or {}).get("content")
+                        if content:
+                            call.first_byte()
+                            parts.append(content)
+                            yield content
+            
+            except asyncio.TimeoutError:
+                call.outcome = "timeout"
+                if deadline_expired():
+                    logger.warning("[Qwen3Client] Stream stopped at the run deadline")
+                else:
+                    self.breaker.record_failure()
+                    logger.error(f"[Qwen3Client] Stream stalled (no data for {stall_timeout:.0f}s)")
+            except aiohttp.ClientConnectorError:
+                call.outcome = "http_error"
+                self.breaker.record_failure()
+                logger.error("[Qwen3Client] Connection refused - is LM Studio running at " + self.endpoint + "?")
+            except Exception as e:
+                call.outcome = "error"
+                self.breaker.record_failure()
+                logger.error(f"[Qwen3Client] Stream error: {str(e)}")
+        except BaseException:
+            if call.outcome is None and call.response is None:
+                call.outcome = "cancelled"  # Consumer closed the stream early or was cancelled
+            raise
+        finally:
+            end_call(call)
+    
     async def extract_json(self, prompt: str) -> list:
         """
         Call Qwen3 and extract JSON array from response
@@ -167,8 +518,17 @@ class Qwen3Client:
                 return json.loads(json_str)
         except json.JSONDecodeError as e:
             logger.warning(f"[Qwen3Client] JSON parse error: {e}")
+            mark_parse_failure()
         except Exception as e:
             logger.error(f"[Qwen3Client] Extraction error: {e}")
         
         return []
 
+
+async def close_llm_clients() -> None:
+    """Close every Gemini/Qwen3 client's HTTP session (FastAPI lifespan shutdown)"""
+    for client in list(_llm_clients):
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"[{type(client).__name__}] Error closing session: {e}")
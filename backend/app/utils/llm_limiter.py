@@ -0,0 +1,198 @@
+"""
+Process-wide LLM limiter - in-flight cap plus request/token rate limits per provider
+
+Every upstream model call (GeminiClient and Qwen3Client, including streams)
+runs inside llm_limiter.slot(provider, prompt). Concurrent runs, what-if
+requests and extraction windows all share the same budget:
+
+- at most settings.<provider>_max_in_flight requests at once; the rest queue
+  in arrival order
+- settings.<provider>_requests_per_second and _tokens_per_second token
+  buckets (one second of burst). Prompt tokens are charged when the call
+  starts, response tokens when it finishes, so a long answer delays the
+  next caller instead of the bucket going unused
+
+Token counts are estimates (~4 characters per token). Queue waits are
+counted for /health/llm. Cache hits never reach the limiter.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+import asyncio
+import logging
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1 if text else 0
+
+
+class _TokenBucket:
+    """Token bucket that lets callers reserve ahead (the level may go negative)"""
+
+    def __init__(self):
+        self.level: Optional[float] = None
+        self.updated = 0.0
+
+    def reserve(self, amount: float, rate: float, now: float) -> float:
+        """
+        Take `amount` from the bucket
+
+        Returns:
+            Seconds the caller must wait before the reservation is covered
+        """
+        if rate <= 0:
+            self.level = None
+            return 0.0
+        capacity = max(rate, 1.0)
+        if self.level is None:
+            self.level = capacity
+        self.level = min(capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+        self.level -= amount
+        return max(0.0, -self.level / rate)
+
+
+class LimiterSlot:
+    """Handle for one admitted call; report the response so its tokens are charged"""
+
+    def __init__(self, limiter: "ProviderLimiter"):
+        self._limiter = limiter
+
+    def record_response(self, text: Optional[str]) -> None:
+        self._limiter.charge_tokens(estimate_tokens(text))
+
+
+class ProviderLimiter:
+    """In-flight cap and rate limits for one provider"""
+
+    def __init__(self, provider: str, clock=time.monotonic):
+        self.provider = provider
+        self._clock = clock
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._requests = _TokenBucket()
+        self._tokens = _TokenBucket()
+        self.counters: Dict[str, float] = {
+            "calls": 0,
+            "queued_calls": 0,
+            "queue_wait_seconds": 0.0,
+            "max_queue_wait_seconds": 0.0,
+            "tokens": 0,
+        }
+
+    # ============== CONFIG ==============
+    @property
+    def max_in_flight(self) -> int:
+        return getattr(settings, f"{self.provider}_max_in_flight", 0)
+
+    @property
+    def requests_per_second(self) -> float:
+        return getattr(settings, f"{self.provider}_requests_per_second", 0.0)
+
+    @property
+    def tokens_per_second(self) -> float:
+        return getattr(settings, f"{self.provider}_tokens_per_second", 0.0)
+
+    # ============== ADMISSION ==============
+    async def _acquire(self) -> None:
+        """Wait for an in-flight slot (FIFO)"""
+        limit = self.max_in_flight
+        if limit <= 0 or (self._in_flight < limit and not self._waiters):
+            self._in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter  # _release hands its slot over (in_flight stays counted)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # Granted just before the cancel; pass it on
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def charge_tokens(self, tokens: int) -> None:
+        """Charge tokens that were not known when the call started (the response)"""
+        if tokens > 0:
+            self.counters["tokens"] += tokens
+            self._tokens.reserve(tokens, self.tokens_per_second, self._clock())
+
+    @asynccontextmanager
+    async def slot(self, prompt: str = "") -> AsyncIterator[LimiterSlot]:
+        """Hold one in-flight slot for the duration of an upstream call"""
+        queued_at = self._clock()
+        await self._acquire()
+        try:
+            prompt_tokens = estimate_tokens(prompt)
+            now = self._clock()
+            delay = max(
+                self._requests.reserve(1, self.requests_per_second, now),
+                self._tokens.reserve(prompt_tokens, self.tokens_per_second, now),
+            )
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            waited = self._clock() - queued_at
+            self.counters["calls"] += 1
+            self.counters["tokens"] += prompt_tokens
+            if waited > 0.001:
+                self.counters["queued_calls"] += 1
+                self.counters["queue_wait_seconds"] += waited
+                self.counters["max_queue_wait_seconds"] = max(self.counters["max_queue_wait_seconds"], waited)
+            if waited > 5:
+                logger.info(f"⏳ {self.provider} call waited {waited:.1f}s for the LLM limiter")
+            yield LimiterSlot(self)
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, object]:
+        calls = self.counters["calls"]
+        return {
+            **self.counters,
+            "queue_wait_seconds": round(self.counters["queue_wait_seconds"], 3),
+            "max_queue_wait_seconds": round(self.counters["max_queue_wait_seconds"], 3),
+            "avg_queue_wait_seconds": round(self.counters["queue_wait_seconds"] / calls, 3) if calls else 0.0,
+            "in_flight": self._in_flight,
+            "waiting": sum(1 for waiter in self._waiters if not waiter.done()),
+            "max_in_flight": self.max_in_flight,
+            "requests_per_second": self.requests_per_second,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+class LLMLimiter:
+    """One ProviderLimiter per provider, shared by every client in the process"""
+
+    def __init__(self):
+        self._providers: Dict[str, ProviderLimiter] = {}
+
+    def for_provider(self, provider: str) -> ProviderLimiter:
+        if provider not in self._providers:
+            self._providers[provider] = ProviderLimiter(provider)
+        return self._providers[provider]
+
+    def slot(self, provider: str, prompt: str = ""):
+        """async with llm_limiter.slot("qwen3", prompt) as slot: ..."""
+        return self.for_provider(provider).slot(prompt)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Per-provider counters for /health/llm"""
+        return {provider: limiter.stats() for provider, limiter in self._providers.items()}
+
+
+# Global instance
+llm_limiter = LLMLimiter()
@@ -0,0 +1,468 @@
+"""
+LLM call telemetry - latency, tokens and outcome per agent
+
+Every call_model / call_model_stream invocation becomes one LLMCall record:
+
+- agent: set by the caller with agent_scope("RiskScorer") (a context
+  variable, like the run deadline, so it reaches calls made from spawned tasks)
+- prompt and completion tokens from the response's usage field (OpenAI
+  `usage`, Gemini `usage_metadata`), estimated when the server sends none
+- latency (call start to response, including limiter queueing) and time to
+  first byte (response headers, or the first streamed token)
+- outcome: ok, timeout, http_error (HTTP status or connection failure),
+  parse_fail (agents report unparseable answers with mark_parse_failure(),
+  which also drops the answer from the response cache), skipped (breaker open or deadline spent), cancelled or error
+- cache_hit / coalesced: served by the response cache or by another caller's
+  identical in-flight request (no upstream tokens)
+
+A request shared by several callers (utils/single_flight.py) runs outside
+their contexts; it is annotated through an upstream_call() record instead,
+which each caller's record then adopts.
+
+Records feed process-wide histograms, rendered for Prometheus on /metrics,
+and the RunTelemetry of the pipeline run they belong to (stored on the Run
+row by start_run).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+from app.utils.llm_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+UNATTRIBUTED = "unattributed"
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+# ============== CALL RECORDS ==============
+_current_agent: ContextVar[str] = ContextVar("llm_agent", default=UNATTRIBUTED)
+_current_run: ContextVar[Optional["RunTelemetry"]] = ContextVar("llm_run_telemetry", default=None)
+_current_call: ContextVar[Optional["LLMCall"]] = ContextVar("llm_call", default=None)
+_last_call: ContextVar[Optional["LLMCall"]] = ContextVar("llm_last_call", default=None)
+
+
+class LLMCall:
+    """One call_model invocation, recorded when it finishes"""
+
+    def __init__(self, provider: str, prompt: str, clock=time.monotonic):
+        self.agent = _current_agent.get()
+        self.provider = provider
+        self.estimated_prompt_tokens = estimate_tokens(prompt)
+        self._clock = clock
+        self.started = clock()
+        self.ttfb: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.outcome: Optional[str] = None
+        self.cache_hit = False
+        self.coalesced = False
+        self.truncated = False  # Stopped at max_tokens; never cached
+        self.discard_cached: Optional[Callable[[], None]] = None  # Set by the client for cacheable calls
+        self.response: Optional[str] = None
+        self._run = _current_run.get()
+        self._finished = False
+
+    @property
+    def upstream(self) -> bool:
+        """True if this call itself talked to the model (not a cache hit, join or skip)"""
+        return not (self.cache_hit or self.coalesced) and self.outcome != "skipped"
+
+    def first_byte(self) -> None:
+        if self.ttfb is None:
+            self.ttfb = self._clock() - self.started
+
+    def set_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        if prompt_tokens is not None:
+            self.prompt_tokens = int(prompt_tokens)
+        if completion_tokens is not None:
+            self.completion_tokens = int(completion_tokens)
+
+    def done(self, response: str) -> str:
+        """Keep the response for finish() and hand it back"""
+        self.response = response
+        return response
+
+    def finish(self) -> None:
+        """Fill in defaults and record the call (once)"""
+        if self._finished:
+            return
+        self._finished = True
+        self.latency = self._clock() - self.started
+        if self.outcome is None:
+            self.outcome = "ok" if self.response else "error"
+        if self.upstream:
+            if self.prompt_tokens is None:
+                self.prompt_tokens = self.estimated_prompt_tokens
+            if self.completion_tokens is None:
+                self.completion_tokens = estimate_tokens(self.response)
+            if self.ttfb is None and self.outcome == "ok":
+                self.ttfb = self.latency
+        llm_metrics.record(self)
+        if self._run is not None:
+            self._run.record(self)
+        logger.debug(
+            f"📡 {self.agent} ({self.provider}): {self.outcome} in {self.latency:.2f}s, "
+            f"{self.prompt_tokens or 0}+{self.completion_tokens or 0} tokens"
+            f"{' (cache hit)' if self.cache_hit else ''}"
+        )
+
+    def adopt(self, upstream: "LLMCall") -> None:
+        """
+        Take the outcome of a shared upstream request (see upstream_call)
+
+        The caller that started the request also takes its tokens and time
+        to first byte; callers that joined it keep counting none.
+        """
+        self.outcome = upstream.outcome
+        self.truncated = upstream.truncated
+        if self.coalesced:
+            return
+        self.set_usage(upstream.prompt_tokens, upstream.completion_tokens)
+        if upstream.ttfb is not None:
+            self.ttfb = upstream.started + upstream.ttfb - self.started
+
+    def reclassify(self, outcome: str) -> None:
+        """Change a recorded call's outcome (e.g. ok -> parse_fail)"""
+        previous, self.outcome = self.outcome, outcome
+        if not self._finished or previous == outcome:
+            return
+        llm_metrics.move_outcome(self, previous)
+        if self._run is not None:
+            self._run.move_outcome(self, previous)
+
+
+def start_call(provider: str, prompt: str) -> LLMCall:
+    """New record for the current agent and run (end_call() it when the call ends)"""
+    return LLMCall(provider, prompt)
+
+
+def end_call(call: LLMCall) -> None:
+    """Record a start_call() record and make it the context's last call for mark_parse_failure()"""
+    call.finish()
+    _last_call.set(call)
+
+
+@contextmanager
+def track(provider: str, prompt: str) -> Iterator[LLMCall]:
+    """
+    Record the call made inside the block
+
+    The record is current for the block, so the client's request code (even
+    in a task the block spawns) can annotate it with note_first_byte(),
+    note_usage() and note_outcome(). Exceptions set the outcome if the client
+    did not. Afterwards it is the context's last call for mark_parse_failure().
+    """
+    call = start_call(provider, prompt)
+    token = _current_call.set(call)
+    try:
+        yield call
+    except BaseException as e:
+        if call.outcome is None:
+            call.outcome = _outcome_for(e)
+        raise
+    finally:
+        _current_call.reset(token)
+        call.finish()
+        _last_call.set(call)
+
+
+@contextmanager
+def upstream_call(provider: str, prompt: str) -> Iterator[LLMCall]:
+    """
+    Collect the note_*() annotations of a request made on behalf of other calls
+
+    The record is never recorded itself; callers hand it to LLMCall.adopt().
+    """
+    upstream = LLMCall(provider, prompt)
+    token = _current_call.set(upstream)
+    try:
+        yield upstream
+    except BaseException as e:
+        if upstream.outcome is None:
+            upstream.outcome = _outcome_for(e)
+        raise
+    finally:
+        _current_call.reset(token)
+
+
+def _outcome_for(error: BaseException) -> str:
+    from app.utils.circuit_breaker import CircuitOpenError
+    from app.utils.deadline import DeadlineExceeded
+
+    if isinstance(error, (asyncio.TimeoutError, DeadlineExceeded)):
+        return "timeout"
+    if isinstance(error, CircuitOpenError):
+        return "skipped"
+    if not isinstance(error, Exception):
+        return "cancelled"  # CancelledError, GeneratorExit
+    return "error"
+
+
+def note_first_byte() -> None:
+    call = _current_call.get()
+    if call is not None:
+        call.first_byte()
+
+
+def note_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    call = _current_call.get()
+    if call is not None:
+        call.set_usage(prompt_tokens, completion_tokens)
+
+
+def note_truncated() -> None:
+    """The model stopped at max_tokens (finish_reason "length"/MAX_TOKENS)"""
+    call = _current_call.get()
+    if call is not None:
+        call.truncated = True
+
+
+def note_outcome(outcome: str) -> None:
+    """Set the current call's outcome (a later retry attempt overwrites it)"""
+    call = _current_call.get()
+    if call is not None:
+        call.outcome = outcome
+
+
+def mark_parse_failure() -> None:
+    """The answer to this context's last call could not be parsed (and must not be replayed)"""
+    call = _last_call.get()
+    if call is not None:
+        if call.outcome == "ok":
+            call.reclassify("parse_fail")
+        if call.discard_cached is not None:
+            call.discard_cached()
+    _last_call.set(None)
+
+
+@contextmanager
+def agent_scope(agent: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block to `agent`"""
+    token = _current_agent.set(agent)
+    try:
+        yield
+    finally:
+        _current_agent.reset(token)
+
+
+# ============== HISTOGRAMS ==============
+class Histogram:
+    """Fixed-bucket histogram (Prometheus semantics: cumulative buckets, sum, count)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs including +Inf"""
+        pairs, running = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            pairs.append((f"{bound:g}", running))
+        pairs.append(("+Inf", self.count))
+        return pairs
+
+
+HISTOGRAMS = {
+    # name -> (help, buckets, LLMCall attribute)
+    "llm_request_duration_seconds": ("LLM call latency, including limiter queueing", LATENCY_BUCKETS, "latency"),
+    "llm_time_to_first_byte_seconds": ("Time to response headers or first streamed token", LATENCY_BUCKETS, "ttfb"),
+    "llm_prompt_tokens": ("Prompt tokens per upstream call", TOKEN_BUCKETS, "prompt_tokens"),
+    "llm_completion_tokens": ("Completion tokens per upstream call", TOKEN_BUCKETS, "completion_tokens"),
+}
+
+
+class LLMMetrics:
+    """Process-wide LLM call counters and histograms, labelled by agent and provider"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[Tuple[str, str, str], int] = {}
+        self.cache_hits: Dict[Tuple[str, str], int] = {}
+        self.coalesced: Dict[Tuple[str, str], int] = {}
+        self.histograms: Dict[str, Dict[Tuple[str, str], Histogram]] = {name: {} for name in HISTOGRAMS}
+
+    def record(self, call: LLMCall) -> None:
+        labels = (call.agent, call.provider)
+        with self._lock:
+            key = labels + (call.outcome,)
+            self.calls[key] = self.calls.get(key, 0) + 1
+            if call.cache_hit:
+                self.cache_hits[labels] = self.cache_hits.get(labels, 0) + 1
+            if call.coalesced:
+                self.coalesced[labels] = self.coalesced.get(labels, 0) + 1
+            if not call.upstream:
+                return
+            for name, (_, buckets, attribute) in HISTOGRAMS.items():
+                value = getattr(call, attribute)
+                if value is not None:
+                    self.histograms[name].setdefault(labels, Histogram(buckets)).observe(value)
+
+    def move_outcome(self, call: LLMCall, previous: str) -> None:
+        with self._lock:
+            old = (call.agent, call.provider, previous)
+            self.calls[old] = max(0, self.calls.get(old, 0) - 1)
+            new = (call.agent, call.provider, call.outcome)
+            self.calls[new] = self.calls.get(new, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.cache_hits.clear()
+            self.coalesced.clear()
+            for series in self.histograms.values():
+                series.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            lines += [
+                "# HELP llm_calls_total LLM calls by agent, provider and outcome",
+                "# TYPE llm_calls_total counter",
+            ]
+            for (agent, provider, outcome), count in sorted(self.calls.items()):
+                lines.append(f"llm_calls_total{_labels(agent=agent, provider=provider, outcome=outcome)} {count}")
+            for name, counts, text in (
+                ("llm_cache_hits_total", self.cache_hits, "LLM calls served by the response cache"),
+                ("llm_coalesced_calls_total", self.coalesced, "LLM calls that joined an identical in-flight call"),
+            ):
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} counter"]
+                for (agent, provider), count in sorted(counts.items()):
+                    lines.append(f"{name}{_labels(agent=agent, provider=provider)} {count}")
+            for name, (text, _, _) in HISTOGRAMS.items():
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} histogram"]
+                for (agent, provider), histogram in sorted(self.histograms[name].items()):
+                    for le, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_labels(agent=agent, provider=provider, le=le)} {count}")
+                    labels = _labels(agent=agent, provider=provider)
+                    lines.append(f"{name}_sum{labels} {histogram.sum:g}")
+                    lines.append(f"{name}_count{labels} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels: str) -> str:
+    """{name="value",...} with backslashes and quotes escaped"""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# ============== PER-RUN SUMMARY ==============
+SUMMED_FIELDS = (
+    "calls", "upstream_calls", "cache_hits", "coalesced", "prompt_tokens", "completion_tokens",
+    "latency_seconds", "ttfb_seconds", "ttfb_calls",
+)
+
+
+def _new_totals() -> Dict[str, Any]:
+    totals: Dict[str, Any] = {field: 0 for field in SUMMED_FIELDS}
+    totals.update(outcomes={}, max_latency_seconds=0.0)
+    return totals
+
+
+class RunTelemetry:
+    """Per-agent totals for the LLM calls of one pipeline run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.agents: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, agent: str) -> Dict[str, Any]:
+        if agent not in self.agents:
+            self.agents[agent] = _new_totals()
+        return self.agents[agent]
+
+    def record(self, call: LLMCall) -> None:
+        with self._lock:
+            entry = self._entry(call.agent)
+            entry["calls"] += 1
+            entry["cache_hits"] += call.cache_hit
+            entry["coalesced"] += call.coalesced
+            entry["outcomes"][call.outcome] = entry["outcomes"].get(call.outcome, 0) + 1
+            if call.upstream:
+                entry["upstream_calls"] += 1
+                entry["prompt_tokens"] += call.prompt_tokens or 0
+                entry["completion_tokens"] += call.completion_tokens or 0
+                entry["latency_seconds"] += call.latency
+                entry["max_latency_seconds"] = max(entry["max_latency_seconds"], call.latency)
+                if call.ttfb is not None:
+                    entry["ttfb_seconds"] += call.ttfb
+                    entry["ttfb_calls"] += 1
+
+    def move_outcome(self, call: LLMCall, previous: str) -> None:
+        with self._lock:
+            outcomes = self._entry(call.agent)["outcomes"]
+            outcomes[previous] = max(0, outcomes.get(previous, 0) - 1)
+            outcomes[call.outcome] = outcomes.get(call.outcome, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        JSON summary stored on the Run row
+
+        Returns:
+            {"agents": {name: totals}, "total": totals}; latencies are totals
+            and averages over upstream calls (cache hits and joins excluded)
+        """
+        with self._lock:
+            agents = {name: _summarize(entry) for name, entry in self.agents.items()}
+            combined = _new_totals()
+            for entry in self.agents.values():
+                for field in SUMMED_FIELDS:
+                    combined[field] += entry[field]
+                combined["max_latency_seconds"] = max(combined["max_latency_seconds"], entry["max_latency_seconds"])
+                for outcome, count in entry["outcomes"].items():
+                    combined["outcomes"][outcome] = combined["outcomes"].get(outcome, 0) + count
+        return {"agents": agents, "total": _summarize(combined)}
+
+
+def _summarize(entry: Dict[str, Any]) -> Dict[str, Any]:
+    upstream, ttfb_calls = entry["upstream_calls"], entry["ttfb_calls"]
+    return {
+        "calls": entry["calls"],
+        "upstream_calls": upstream,
+        "cache_hits": entry["cache_hits"],
+        "coalesced": entry["coalesced"],
+        "outcomes": {outcome: count for outcome, count in entry["outcomes"].items() if count},
+        "prompt_tokens": entry["prompt_tokens"],
+        "completion_tokens": entry["completion_tokens"],
+        "latency_seconds": round(entry["latency_seconds"], 3),
+        "avg_latency_seconds": round(entry["latency_seconds"] / upstream, 3) if upstream else 0.0,
+        "max_latency_seconds": round(entry["max_latency_seconds"], 3),
+        "avg_ttfb_seconds": round(entry["ttfb_seconds"] / ttfb_calls, 3) if ttfb_calls else 0.0,
+    }
+
+
+@contextmanager
+def run_telemetry(telemetry: Optional[RunTelemetry] = None) -> Iterator[RunTelemetry]:
+    """Collect the block's LLM calls (and those of tasks it spawns) into one RunTelemetry"""
+    telemetry = telemetry or RunTelemetry()
+    token = _current_run.set(telemetry)
+    try:
+        yield telemetry
+    finally:
+        _current_run.reset(token)
+
+
+# Global instance
+llm_metrics = LLMMetrics()
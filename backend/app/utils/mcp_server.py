@@ -3,6 +3,7 @@ MCP (Model Context Protocol) Server
 Provides standardized tool and resource access for all agents
 """
 from typing import Any, Dict, Callable, Optional
+import inspect
 import logging
 import json
 
@@ -101,7 +102,7 @@ class MCPServer:
         self.resources[name] = resource
         logger.info(f"✅ Registered resource: {name}")
     
-    def call_tool(self, name: str, **kwargs) -> Any:
+    async def call_tool(self, name: str, **kwargs) -> Any:
         """
         Call a registered tool
         
@@ -110,7 +111,7 @@ class MCPServer:
             **kwargs: Tool parameters
         
         Returns:
-            Tool result
+            Tool result (async tools are awaited)
         """
         if name not in self.tools:
             raise ValueError(f"Tool '{name}' not found. Available: {list(self.tools.keys())}")
@@ -118,6 +119,8 @@ class MCPServer:
         try:
             tool = self.tools[name]
             result = tool.execute(**kwargs)
+            if inspect.isawaitable(result):
+                result = await result
             
             # Log the call
             self.call_history.append({
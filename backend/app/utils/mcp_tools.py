@@ -17,9 +17,9 @@ def setup_mcp_tools():
     logger.info("🔧 Setting up MCP Tools...")
     
     # ============ TOOL 1: Gemini LLM Call ============
-    def gemini_call_tool(prompt: str, temperature: float = 0.3) -> str:
+    async def gemini_call_tool(prompt: str, temperature: float = 0.3) -> str:
         """Call Gemini LLM"""
-        return gemini_client.call_model(prompt, temperature)
+        return await gemini_client.call_model(prompt, temperature)
     
     mcp_server.register_tool(
         name="gemini_call",
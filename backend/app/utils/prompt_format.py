@@ -0,0 +1,110 @@
+"""
+Token-lean prompt serialization for agent prompts
+
+Agents used to paste json.dumps(scene, indent=2) of whole scene dicts into
+their prompts: indentation, long key names, bookkeeping fields
+(confidence, is_continuation) and, since tier 1B, every feature's
+value/confidence/evidence/reasoning. format_scene_table() instead projects
+the columns an agent asks for into one pipe-separated row per scene:
+
+    Columns: n=scene number, loc=location, tod=time of day, feat=production features
+    n|loc|tod|feat
+    12|EXT. ROOFTOP|NIGHT|stunt=heavy crowd=large hazards=fire;explosion
+
+Only non-default feature values are written. Prompt sizes are measured per
+agent by utils/llm_telemetry.py (prompt tokens on /metrics and each run).
+"""
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence
+import json
+
+DESCRIPTION_MAX_CHARS = 160
+
+# Feature fields in table order, with their short names; values equal to the
+# default ("none"/"no"/"day"/"1") are omitted
+FEATURE_SHORT_NAMES = {
+    "stunt_level": "stunt",
+    "water_complexity": "water",
+    "crowd_size": "crowd",
+    "vehicle_types": "vehicles",
+    "animals": "animals",
+    "weather_dependent": "weather",
+    "permit_tier": "permit",
+    "hazards": "hazards",
+}
+FEATURE_DEFAULTS = {"", "none", "no", "1", "[]"}
+
+
+def _clean(value: Any, max_chars: Optional[int] = None) -> str:
+    """One table cell: single line, no column separators, optionally truncated"""
+    text = " ".join(str(value).split()).replace("|", "/")
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars - 1].rstrip() + "…"
+    return text
+
+
+def _feature_value(scene: Mapping, field: str) -> str:
+    data = (scene.get("features") or {}).get(field)
+    value = data.get("value") if isinstance(data, dict) else data
+    if isinstance(value, (list, tuple)):
+        return ";".join(_clean(item) for item in value if item)
+    return _clean(value).lower() if value is not None else ""
+
+
+def compact_features(scene: Mapping) -> str:
+    """Non-default tier 1B features as 'stunt=heavy crowd=large' ('' if none)"""
+    parts = []
+    for field, short in FEATURE_SHORT_NAMES.items():
+        value = _feature_value(scene, field)
+        if value not in FEATURE_DEFAULTS:
+            parts.append(f"{short}={value}")
+    return " ".join(parts)
+
+
+# Column name -> (legend, cell getter)
+COLUMNS: Dict[str, tuple] = {
+    "n": ("scene number", lambda scene: _clean(scene.get("scene_number", ""))),
+    "loc": ("location", lambda scene: _clean(scene.get("location", ""), 60)),
+    "tod": ("time of day", lambda scene: _clean(scene.get("time_of_day", ""))),
+    "feat": ("production features", compact_features),
+    "desc": ("description", lambda scene: _clean(scene.get("description", ""), DESCRIPTION_MAX_CHARS)),
+}
+
+
+def format_scene_table(
+    scenes: Iterable[Mapping],
+    columns: Sequence[str],
+    extra: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    extra_legend: Optional[Mapping[str, str]] = None,
+) -> str:
+    """
+    Project scenes onto the given columns as a compact pipe-separated table
+
+    Args:
+        scenes: Scene dicts (tier 1 output, optionally with tier 1B 'features')
+        columns: Column names from COLUMNS, or keys of `extra`
+        extra: Per-scene values not stored on the scene, keyed by
+            str(scene_number) then column (e.g. {"12": {"risk": 78}})
+        extra_legend: Legend text for the extra columns
+
+    Returns:
+        Legend line, header line and one row per scene
+    """
+    extra = extra or {}
+    extra_legend = extra_legend or {}
+    legend = ", ".join(
+        f"{name}={COLUMNS[name][0] if name in COLUMNS else extra_legend.get(name, name)}" for name in columns
+    )
+    lines = [f"Columns: {legend}", "|".join(columns)]
+    for scene in scenes:
+        row_extra = extra.get(str(scene.get("scene_number")), {})
+        cells = [
+            COLUMNS[name][1](scene) if name in COLUMNS else _clean(row_extra.get(name, ""))
+            for name in columns
+        ]
+        lines.append("|".join(cells))
+    return "\n".join(lines)
+
+
+def compact_json(value: Any) -> str:
+    """Minified JSON for prompts (no indentation or spaces after separators)"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
@@ -0,0 +1,111 @@
+"""
+Single-flight coalescing of identical in-flight LLM calls
+
+Concurrent what-if requests (and the per-change simulations inside one)
+often send byte-identical prompts. The LLM clients run each upstream call
+through single_flight.run(cache_key, ...): the first caller for a key starts
+the call, later callers with the same key await that call instead of sending
+their own, and everyone gets the same response (or exception).
+
+The shared call runs as its own task, so one caller being cancelled does not
+cancel it for the others; it is cancelled once no caller is left waiting.
+The task starts in an empty contextvars.Context: it does not inherit the
+first caller's run deadline, agent or telemetry record, so each caller
+applies its own - waiting at most until its own deadline (utils/deadline.py)
+and recording the call under its own agent (utils/llm_telemetry.py).
+Callers with a deadline only join calls started by other deadlined callers.
+Keys are released as soon as the call finishes; finished responses are the
+response cache's job (utils/llm_cache.py).
+"""
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+import asyncio
+import contextvars
+import logging
+
+from app.utils.deadline import DeadlineExceeded, call_timeout, current_deadline
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _flight_key(key: str) -> str:
+    """Coalesce deadlined and unbounded callers separately (a shared call lives while any caller waits)"""
+    return key if current_deadline() is None else f"{key}:deadline"
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one"""
+
+    def __init__(self):
+        self._calls: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.counters: Dict[str, int] = {"leaders": 0, "coalesced": 0}
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await the in-flight call for `key`, starting it if there is none
+
+        Args:
+            key: Identity of the call (cache_key of provider, model, prompt, ...)
+            call: Zero-argument coroutine factory that makes the upstream call
+                (runs in a fresh context: no deadline, agent or call record)
+
+        Returns:
+            The shared call's result (its exception is raised to every caller)
+
+        Raises:
+            DeadlineExceeded: the caller's deadline passed before the call finished
+        """
+        timeout = call_timeout(None)  # Only bounded by this caller's run deadline, if any
+        key = _flight_key(key)
+        if self._joinable(key):
+            self.counters["coalesced"] += 1
+            logger.debug(f"🔗 Joined in-flight LLM call {key[:12]}")
+            return await self._wait(self._calls[key][1], timeout)
+
+        loop = asyncio.get_running_loop()
+        task = contextvars.Context().run(loop.create_task, call())
+        self._calls[key] = (loop, task)
+        self.counters["leaders"] += 1
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await self._wait(task, timeout)
+
+    async def _wait(self, task: asyncio.Task, timeout: Optional[float]) -> T:
+        """Await the shared task for one caller; cancel it when the last caller stops waiting"""
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            if task.done():
+                raise  # The call itself timed out
+            raise DeadlineExceeded("run deadline spent waiting for a shared LLM call") from None
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()  # Nobody is left to use the answer
+
+    def in_flight(self, key: str) -> bool:
+        """True if run(key, ...) would join an existing call on the running loop"""
+        return self._joinable(_flight_key(key))
+
+    def _joinable(self, key: str) -> bool:
+        entry = self._calls.get(key)
+        return entry is not None and entry[0] is asyncio.get_running_loop() and not entry[1].done()
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        entry = self._calls.get(key)
+        if entry is not None and entry[1] is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved: every caller may have been cancelled already
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for /health/llm"""
+        return {**self.counters, "in_flight": len(self._calls)}
+
+
+# Global instance
+single_flight = SingleFlight()
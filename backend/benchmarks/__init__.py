@@ -0,0 +1 @@
+"""Benchmarks package - standalone performance harnesses"""
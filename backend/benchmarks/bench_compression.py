@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: database size and read latency, plain vs compressed columns
+
+Builds a synthetic 200-scene run (script pages + enhanced result and
+optimization JSON shaped like ENHANCED_OUTPUT_SAMPLE.json) and stores it in
+two SQLite files: one with plain Text/JSON columns, one with the
+CompressedText/CompressedJSON types used by the models.
+
+Usage (from backend/):
+    python -m benchmarks.bench_compression [--scenes 200] [--runs 5] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from sqlalchemy import JSON, Column, Integer, MetaData, String, Table, Text, create_engine, insert, select
+
+from app.config import settings
+from app.models.compressed import CompressedJSON, CompressedText
+
+LOCATIONS = ["WAREHOUSE", "ROOFTOP", "HIGHWAY", "APARTMENT", "HARBOUR", "MARKET", "FOREST", "POLICE STATION"]
+RISKS = ["stunt", "vehicle", "night", "crowd", "water", "fire", "height", "weather"]
+
+
+def _scene_text(rng: random.Random, number: int) -> str:
+    heading = f"{number}. {rng.choice(['INT', 'EXT'])}. {rng.choice(LOCATIONS)} - {rng.choice(['DAY', 'NIGHT'])}"
+    action = " ".join(rng.choice(["RAVI", "MEERA", "the crowd", "a truck", "sirens", "smoke", "rain"]) for _ in range(60))
+    dialogue = "\n".join(f"{rng.choice(['RAVI', 'MEERA'])}\nWe have to move before they find us." for _ in range(6))
+    return f"{heading}\n\n{action}\n\n{dialogue}\n"
+
+
+def _scene_analysis(rng: random.Random, number: int) -> dict:
+    return {
+        "scene_number": number,
+        "location": rng.choice(LOCATIONS),
+        "time_of_day": rng.choice(["DAY", "NIGHT"]),
+        "risk_score": round(rng.uniform(0, 100), 1),
+        "risk_factors": rng.sample(RISKS, 3),
+        "budget": {"min": rng.randint(1, 5) * 100000, "likely": rng.randint(5, 9) * 100000, "max": rng.randint(9, 15) * 100000},
+        "reasoning": "Scene requires coordinated stunt team, permits and night lighting; "
+                     "mitigation includes rehearsal day, safety divers and crowd marshals.",
+        "evidence": [f"line {rng.randint(1, 9000)}: {rng.choice(RISKS)} sequence" for _ in range(4)],
+        "mitigations": [f"Hire certified {risk} coordinator" for risk in rng.sample(RISKS, 2)],
+    }
+
+
+def build_run(scenes: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    script = "".join(_scene_text(rng, n) for n in range(1, scenes + 1))
+    pages = [script[i:i + 3000] for i in range(0, len(script), 3000)]
+    analysis = [_scene_analysis(rng, n) for n in range(1, scenes + 1)]
+    return {
+        "pages": pages,
+        "enhanced_result_json": {"status": "completed", "scenes_analysis": analysis},
+        "location_clusters_json": {"clusters": [{"location": loc, "scenes": list(range(i, scenes, 8))} for i, loc in enumerate(LOCATIONS)]},
+        "stunt_relocations_json": {"relocations": analysis[::4]},
+        "optimized_schedule_json": {"days": [{"day": d, "scenes": list(range(d * 4, d * 4 + 4))} for d in range(scenes // 4)]},
+        "department_scaling_json": {"departments": {risk: {"scale": 1.2, "cost": 250000} for risk in RISKS}},
+    }
+
+
+def make_tables(text_type, json_type):
+    metadata = MetaData()
+    pages = Table(
+        "document_pages", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("document_id", String(36)),
+        Column("text", text_type),
+    )
+    runs = Table(
+        "runs", metadata,
+        Column("id", String(36), primary_key=True),
+        *[Column(name, json_type) for name in (
+            "enhanced_result_json", "location_clusters_json", "stunt_relocations_json",
+            "optimized_schedule_json", "department_scaling_json",
+        )],
+    )
+    return metadata, pages, runs
+
+
+def bench(label: str, path: Path, text_type, json_type, run: dict, run_count: int, repeat: int) -> tuple:
+    metadata, pages, runs = make_tables(text_type, json_type)
+    engine = create_engine(f"sqlite:///{path}")
+    metadata.create_all(engine)
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for r in range(run_count):
+            conn.execute(insert(pages), [
+                {"document_id": f"doc-{r}", "text": page} for page in run["pages"]
+            ])
+            conn.execute(insert(runs), {"id": f"run-{r}", **{k: v for k, v in run.items() if k != "pages"}})
+    write_s = time.perf_counter() - start
+
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            result = conn.execute(select(runs).where(runs.c.id == f"run-{i % run_count}")).one()
+            text = "\n".join(conn.execute(
+                select(pages.c.text).where(pages.c.document_id == f"doc-{i % run_count}").order_by(pages.c.id)
+            ).scalars())
+        timings.append(time.perf_counter() - start)
+        assert result.enhanced_result_json == run["enhanced_result_json"]
+        assert text == "\n".join(run["pages"])
+    engine.dispose()
+
+    size = path.stat().st_size
+    timings.sort()
+    return label, size, write_s, timings[len(timings) // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compressed column benchmark")
+    parser.add_argument("--scenes", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=5, help="Runs stored per database")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    run = build_run(args.scenes)
+    print(f"{args.scenes} scenes, {len(run['pages'])} pages, {args.runs} runs per DB, "
+          f"codec={settings.db_compression_codec} level={settings.db_compression_level}")
+    print(f"{'storage':<12} {'db size KB':>11} {'write s':>8} {'median read ms':>15}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            bench("plain", Path(tmp) / "plain.db", Text, JSON, run, args.runs, args.repeat),
+            bench("compressed", Path(tmp) / "compressed.db", CompressedText, CompressedJSON, run, args.runs, args.repeat),
+        ]
+
+    for label, size, write_s, read_s in results:
+        print(f"{label:<12} {size / 1024:>11.0f} {write_s:>8.3f} {read_s * 1000:>15.2f}")
+    print(f"size ratio: {results[0][1] / results[1][1]:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
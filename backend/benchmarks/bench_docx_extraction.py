@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: python-docx object model vs streaming word/document.xml parser
+
+Runs against the .docx samples in storage/uploads plus a generated long
+script (dialogue kept in tables, page breaks between scenes) to show memory
+behaviour on big files. Each measurement runs in a fresh process so peak RSS
+is comparable.
+
+Usage (from backend/):
+    python -m benchmarks.bench_docx_extraction [--scenes 600] [--repeat 3]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from docx import Document as DocxDocument
+from docx.enum.text import WD_BREAK
+
+from app.services.extraction import extract_docx_pages
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "storage" / "uploads"
+
+
+def python_docx_path(file_path: str) -> tuple:
+    """The previous extractor: paragraphs only, pages = len(text) // 3000"""
+    doc = DocxDocument(file_path)
+    text = "\n".join(para.text for para in doc.paragraphs)
+    return text, max(1, len(text) // 3000)
+
+
+def streaming_path(file_path: str) -> tuple:
+    pages = extract_docx_pages(file_path)
+    return "\n".join(pages), len(pages)
+
+
+METHODS = {"python-docx": python_docx_path, "streaming": streaming_path}
+
+
+def _measure(method: str, file_path: str, repeat: int, queue) -> None:
+    func = METHODS[method]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text, pages = func(file_path)
+        timings.append(time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((min(timings), peak, len(text), pages))
+
+
+def measure(method: str, file_path: str, repeat: int) -> tuple:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(method, file_path, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def build_long_script(path: Path, scenes: int) -> None:
+    """Screenplay-style DOCX with dialogue tables and a page break per scene"""
+    doc = DocxDocument()
+    for number in range(1, scenes + 1):
+        doc.add_paragraph(f"{number}. INT. WAREHOUSE {number % 17} - NIGHT")
+        doc.add_paragraph("Rain hammers the tin roof. RAVI checks the door twice. " * 4)
+        table = doc.add_table(rows=4, cols=2)
+        for row in table.rows:
+            row.cells[0].text = "RAVI"
+            row.cells[1].text = "We leave before the tide turns, or we don't leave at all."
+        doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+    doc.save(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="DOCX extraction benchmark")
+    parser.add_argument("--scenes", type=int, default=600, help="Scenes in the generated script")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        long_script = Path(tmp) / "long_script.docx"
+        build_long_script(long_script, args.scenes)
+        samples = sorted(SAMPLES_DIR.glob("*.docx")) + [long_script]
+
+        print(f"best of {args.repeat}; peak RSS growth measured in a fresh process")
+        print(f"{'file':<28} {'method':<12} {'ms':>8} {'peak MB':>8} {'chars':>9} {'pages':>6}")
+        for sample in samples:
+            for method in METHODS:
+                seconds, peak_kb, chars, pages = measure(method, str(sample), args.repeat)
+                print(f"{sample.name[:28]:<28} {method:<12} {seconds * 1000:>8.1f} "
+                      f"{peak_kb / 1024:>8.1f} {chars:>9} {pages:>6}")
+
+
+if __name__ == "__main__":
+    main()
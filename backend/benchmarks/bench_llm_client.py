@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call aiohttp session vs Qwen3Client's pooled session
+
+Runs an OpenAI-compatible stub server in a separate process and measures
+sequential and concurrent call latency with the previous call pattern (a new
+ClientSession - and TCP connection - per call) against the pooled client.
+The stub counts the TCP connections it accepted for each phase.
+
+Usage (from backend/):
+    python -m benchmarks.bench_llm_client [--calls 300] [--concurrency 16] [--latency-ms 0]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import aiohttp
+from aiohttp import web
+
+from app.utils.llm_client import Qwen3Client
+
+SYSTEM_PROMPT = "You are an expert film production analyst. Provide detailed, structured analysis in valid JSON format."
+REPLY = json.dumps([{"scene_number": "1", "location": "ROOFTOP", "time_of_day": "NIGHT"}])
+
+
+# ============== STUB SERVER ==============
+def _serve(port: int, latency: float, ready) -> None:
+    peers = set()
+
+    async def completions(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        return web.json_response({"choices": [{"message": {"content": REPLY}}]})
+
+    async def connections(request):
+        count = len(peers)
+        peers.clear()
+        return web.json_response({"connections": count})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    app.router.add_get("/connections", connections)
+    ready.set()
+    web.run_app(app, host="127.0.0.1", port=port, print=None, handle_signals=False, access_log=None)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _connections_used(base: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base}/connections") as response:
+            return (await response.json())["connections"]
+
+
+# ============== CALL PATTERNS ==============
+async def per_call_session(endpoint: str, prompt: str) -> str:
+    """The previous Qwen3Client.call_model: a fresh ClientSession for every call"""
+    async with aiohttp.ClientSession() as session:
+        payload = {
+            "model": "bench",
+            "messages": [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+            "temperature": 0.2,
+            "max_tokens": 512,
+            "stream": False
+        }
+        async with session.post(endpoint, json=payload, timeout=aiohttp.ClientTimeout(total=120)) as response:
+            result = await response.json()
+            return result["choices"][0]["message"]["content"]
+
+
+async def run_phase(call, calls: int, concurrency: int) -> tuple:
+    """Returns (wall seconds, per-call latencies)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            assert await call(f"prompt {i}") == REPLY
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(calls)])
+    return time.perf_counter() - start, latencies
+
+
+async def benchmark(base: str, calls: int, concurrency: int) -> None:
+    endpoint = f"{base}/v1/chat/completions"
+    client = Qwen3Client(base_url=f"{base}/v1", model="bench")
+    methods = {
+        "per-call session": lambda prompt: per_call_session(endpoint, prompt),
+        "pooled session": lambda prompt: client.call_model(prompt, temperature=0.2, max_tokens=512),
+    }
+
+    # Warm up both paths (imports, first connection)
+    for call in methods.values():
+        await call("warmup")
+    await _connections_used(base)
+
+    print(f"{'mode':<12} {'method':<18} {'wall s':>7} {'calls/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'conns':>6}")
+    for mode, width in (("sequential", 1), ("concurrent", concurrency)):
+        for name, call in methods.items():
+            wall, latencies = await run_phase(call, calls, width)
+            latencies.sort()
+            connections = await _connections_used(base)
+            print(f"{mode:<12} {name:<18} {wall:>7.2f} {calls / wall:>8.0f} "
+                  f"{statistics.median(latencies) * 1000:>7.2f} "
+                  f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>7.2f} {connections:>6}")
+    await client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Qwen3Client connection pooling benchmark")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated model latency per call")
+    args = parser.parse_args()
+
+    port = _free_port()
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    server = ctx.Process(target=_serve, args=(port, args.latency_ms / 1000, ready), daemon=True)
+    server.start()
+    ready.wait()
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):  # Wait until the stub accepts connections
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    print(f"{args.calls} calls per phase, concurrency {args.concurrency}, stub latency {args.latency_ms} ms")
+    try:
+        asyncio.run(benchmark(base, args.calls, args.concurrency))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
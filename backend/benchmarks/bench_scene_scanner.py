@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-line re.match scene extraction vs single-pass finditer scan
+
+The legacy path is the original SceneExtractorAgent._extract_scenes_regex
+loop (split lines, up to three re.match calls with pattern strings per line,
+a log call per scene). The new path is scan_scene_headings + scenes_from_index
+from app.services.scene_index. Both run on a synthetic screenplay (numbered,
+standard and minimal headings; wrapped action; dialogue blocks) and their
+scene dicts are checked to be identical before timing.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scene_scanner [--scenes 10000] [--repeat 5]
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.scene_index import scan_scene_headings, scenes_from_index
+
+logger = logging.getLogger(__name__)
+
+LOCATIONS = ["WAREHOUSE", "ROOFTOP", "HIGHWAY", "APARTMENT", "HARBOUR", "MARKET", "FOREST", "POLICE STATION"]
+WORDS = ["RAVI", "MEERA", "the crowd", "a truck", "sirens", "smoke", "rain", "slowly", "turns", "runs", "towards"]
+
+
+def legacy_extract(script_text: str) -> list:
+    """The original regex extractor loop"""
+    scenes = []
+    sequential_number = 0
+    seen_scene_numbers = set()
+
+    pattern_numbered = r"^(\d+(?:\.\d+)*)\s*\.?\s+(INT|EXT|INT/EXT)\s*\.?\s+([A-Z][^-\n]+?)(?:\s*[-–]\s*([^\n]+))?$"
+    pattern_standard = r"^(INT|EXT|INT/EXT)\s*\.?\s+([A-Z][^-\n]+?)\s*[-–]\s*([^\n]+)$"
+    pattern_minimal = r"^(INT|EXT|INT/EXT)\s*\.?\s+([A-Z][^\n]+?)$"
+
+    for idx, line in enumerate(script_text.split('\n')):
+        line = line.strip()
+        if not line or len(line) < 5:
+            continue
+
+        match = re.match(pattern_numbered, line, re.IGNORECASE)
+        if match:
+            scene_num = match.group(1)
+            if scene_num in seen_scene_numbers:
+                continue
+            seen_scene_numbers.add(scene_num)
+            location = match.group(3).strip()
+            time_of_day = match.group(4).strip() if match.group(4) else "DAY"
+            scenes.append({"scene_number": scene_num, "location": location, "time_of_day": time_of_day,
+                           "description": line, "confidence": 0.98, "is_continuation": "." in scene_num})
+            logger.debug(f"✅ [P1] Scene {scene_num}: {location}")
+            continue
+
+        match = re.match(pattern_standard, line, re.IGNORECASE)
+        if match:
+            sequential_number += 1
+            scene_num = sequential_number
+            if scene_num in seen_scene_numbers:
+                sequential_number -= 1
+                continue
+            seen_scene_numbers.add(scene_num)
+            location = match.group(2).strip()
+            scenes.append({"scene_number": scene_num, "location": location, "time_of_day": match.group(3).strip(),
+                           "description": line, "confidence": 0.90, "is_continuation": False})
+            logger.debug(f"✅ [P2] Scene {scene_num}: {location}")
+            continue
+
+        if len(line) < 100:
+            match = re.match(pattern_minimal, line, re.IGNORECASE)
+            if match:
+                sequential_number += 1
+                scene_num = sequential_number
+                if scene_num in seen_scene_numbers:
+                    sequential_number -= 1
+                    continue
+                seen_scene_numbers.add(scene_num)
+                location = match.group(2).strip()
+                scenes.append({"scene_number": scene_num, "location": location, "time_of_day": "DAY",
+                               "description": line, "confidence": 0.70, "is_continuation": False})
+                logger.debug(f"✅ [P3] Scene {scene_num}: {location}")
+
+    return scenes
+
+
+def single_pass_extract(script_text: str) -> list:
+    return scenes_from_index(script_text, scan_scene_headings(script_text))
+
+
+def build_script(scenes: int, seed: int = 11) -> str:
+    """Screenplay-formatted text: headings, wrapped action, dialogue blocks"""
+    rng = random.Random(seed)
+    parts = []
+    for number in range(1, scenes + 1):
+        location = rng.choice(LOCATIONS)
+        form = rng.random()
+        if form < 0.6:
+            heading = f"{number}. {rng.choice(['INT', 'EXT', 'INT/EXT'])}. {location} - {rng.choice(['DAY', 'NIGHT'])}"
+        elif form < 0.9:
+            heading = f"  {rng.choice(['INT', 'EXT'])}. {location} – {rng.choice(['DUSK', 'DAWN'])}  "
+        else:
+            heading = f"{rng.choice(['int', 'ext'])}. {location.lower()}"
+        lines = [heading, ""]
+        for _ in range(rng.randint(1, 3)):
+            action = " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 40)))
+            lines.extend(textwrap.wrap(action, 60) + [""])
+        for _ in range(rng.randint(2, 5)):
+            speaker = rng.choice(["RAVI", "MEERA", "INSPECTOR", "EVERYONE"])
+            speech = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20)))
+            lines.append(f"{' ' * 20}{speaker}")
+            lines.extend(f"{' ' * 10}{row}" for row in textwrap.wrap(speech, 35))
+            lines.append("")
+        parts.append("\n".join(lines))
+    return "\n".join(parts)
+
+
+def best_of(func, text: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Scene-heading scanner benchmark")
+    parser.add_argument("--scenes", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = build_script(args.scenes)
+    expected = legacy_extract(text)
+    assert single_pass_extract(text) == expected, "extractors disagree"
+
+    legacy_s = best_of(legacy_extract, text, args.repeat)
+    single_s = best_of(single_pass_extract, text, args.repeat)
+    scan_s = best_of(scan_scene_headings, text, args.repeat)
+    print(f"{args.scenes} scenes, {text.count(chr(10)) + 1} lines, {len(text) / 1e6:.1f} MB, "
+          f"{len(expected)} headings (best of {args.repeat})")
+    print(f"{'path':<28} {'ms':>9}")
+    print(f"{'per-line re.match':<28} {legacy_s * 1000:>9.1f}")
+    print(f"{'single-pass + scene dicts':<28} {single_s * 1000:>9.1f}")
+    print(f"{'single-pass scan only':<28} {scan_s * 1000:>9.1f}")
+    print(f"speedup: {legacy_s / single_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+One-shot migration: compress existing script text and run JSON rows in place
+
+Rows written before these columns switched to CompressedText/CompressedJSON
+are still plain TEXT/JSON strings. They read fine, but only rewriting them
+reclaims space. This script:
+- Adds columns missing from databases created before they existed (upgrade_schema)
+- Compresses documents.text_content, document_pages.text and the run JSON blobs
+- Backfills documents.char_count / line_count for legacy documents
+- Optionally VACUUMs the SQLite file so freed pages are returned to the OS
+
+Safe to re-run: already-compressed values are skipped. SQLite happily stores
+the blobs in the existing TEXT columns; on PostgreSQL alter those columns to
+BYTEA first.
+
+Usage (from backend/):
+    python migrate_compress_columns.py [--batch-size 200] [--vacuum]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "migration")
+
+from sqlalchemy import text
+
+from app.database import sync_engine, upgrade_schema
+from app.models.compressed import compress_bytes, decompress_bytes, is_compressed
+
+# table -> (primary key, text columns, JSON columns)
+COLUMNS = {
+    "documents": ("id", ["text_content"], []),
+    "document_pages": ("id", ["text"], []),
+    "runs": ("id", [], [
+        "enhanced_result_json",
+        "location_clusters_json",
+        "stunt_relocations_json",
+        "optimized_schedule_json",
+        "department_scaling_json",
+    ]),
+}
+
+
+def _encode(value, is_json: bool) -> bytes:
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value).decode("utf-8")
+    if is_json:
+        # Re-serialize compactly; the JSON type stored it with default separators
+        value = json.dumps(json.loads(value), separators=(",", ":"))
+    return compress_bytes(value.encode("utf-8"))
+
+
+def migrate_column(conn, table: str, pk: str, column: str, is_json: bool, batch_size: int) -> int:
+    """Compress one column in batches of primary keys; returns rows rewritten"""
+    rewritten = 0
+    last_id = ""
+    while True:
+        rows = conn.execute(
+            text(
+                f"SELECT {pk}, {column} FROM {table} "
+                f"WHERE {pk} > :last_id AND {column} IS NOT NULL "
+                f"ORDER BY {pk} LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": batch_size},
+        ).all()
+        if not rows:
+            break
+
+        updates = [
+            {"pk": row[0], "value": _encode(row[1], is_json)}
+            for row in rows
+            if not is_compressed(row[1])
+        ]
+        if updates:
+            conn.execute(text(f"UPDATE {table} SET {column} = :value WHERE {pk} = :pk"), updates)
+            conn.commit()
+            rewritten += len(updates)
+        last_id = rows[-1][0]
+    return rewritten
+
+
+def backfill_counts(conn) -> int:
+    """Set char_count/line_count for legacy documents that only have text_content"""
+    rows = conn.execute(text(
+        "SELECT id, text_content FROM documents "
+        "WHERE char_count IS NULL AND text_content IS NOT NULL"
+    )).all()
+    for document_id, value in rows:
+        content = decompress_bytes(value).decode("utf-8")
+        conn.execute(
+            text("UPDATE documents SET char_count = :chars, line_count = :lines WHERE id = :id"),
+            {"chars": len(content), "lines": content.count("\n") + 1, "id": document_id},
+        )
+    conn.commit()
+    return len(rows)
+
+
+def migrate(engine, batch_size: int = 200, vacuum: bool = False) -> None:
+    """Upgrade the schema, then compress and backfill every known column"""
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        # char_count/line_count (and the other new columns) must exist before the backfill
+        added = upgrade_schema(conn)
+    print(f"✅ schema: {len(added)} columns added")
+
+    with engine.connect() as conn:
+        existing = set(engine.dialect.get_table_names(conn))
+        for table, (pk, text_columns, json_columns) in COLUMNS.items():
+            if table not in existing:
+                print(f"⏭️  {table}: table not found")
+                continue
+            for column in text_columns + json_columns:
+                count = migrate_column(conn, table, pk, column, column in json_columns, batch_size)
+                print(f"✅ {table}.{column}: {count} rows compressed")
+
+        if "documents" in existing:
+            print(f"✅ documents: {backfill_counts(conn)} text lengths backfilled")
+
+    if vacuum and engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        print("✅ VACUUM complete")
+
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM SQLite afterwards")
+    args = parser.parse_args()
+
+    migrate(sync_engine, args.batch_size, args.vacuum)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Shared test configuration
+"""
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+# The Gemini client is created at import time and refuses an empty key
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+# Keep the test database and uploaded files out of the working tree
+_TEST_DIR = tempfile.mkdtemp(prefix="shootsafe-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TEST_DIR}/shootsafe.db")
+os.environ.setdefault("SYNC_DATABASE_URL", f"sqlite:///{_TEST_DIR}/shootsafe.db")
+os.environ.setdefault("STORAGE_PATH", f"{_TEST_DIR}/storage")
+os.environ.setdefault("API_DEBUG", "false")
+
+# Tests that exercise the LLM response cache turn it on explicitly
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+
+# documents/runs as first shipped, before columns were added to them
+BASELINE_SCHEMA = """
+CREATE TABLE documents (
+    id VARCHAR(36) NOT NULL PRIMARY KEY,
+    filename VARCHAR(255) NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    format VARCHAR(20) NOT NULL,
+    text_content TEXT,
+    page_count INTEGER,
+    uploaded_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE INDEX idx_document_id ON documents (id);
+CREATE TABLE runs (
+    id VARCHAR(36) NOT NULL PRIMARY KEY,
+    document_id VARCHAR(36) NOT NULL REFERENCES documents (id),
+    status VARCHAR(9),
+    started_at DATETIME,
+    completed_at DATETIME,
+    error_message TEXT,
+    enhanced_result_json JSON,
+    location_clusters_json JSON,
+    stunt_relocations_json JSON,
+    optimized_schedule_json JSON,
+    department_scaling_json JSON,
+    optimized_budget_min INTEGER,
+    optimized_budget_likely INTEGER,
+    optimized_budget_max INTEGER,
+    total_optimization_savings INTEGER,
+    schedule_savings_percent FLOAT
+);
+CREATE INDEX idx_document_run ON runs (document_id);
+INSERT INTO documents (id, filename, file_path, format, text_content, page_count)
+VALUES ('doc-1', 'old.pdf', '/tmp/old.pdf', 'pdf', 'INT. ROOM - DAY
+He waits.', 1);
+INSERT INTO runs (id, document_id, status, enhanced_result_json)
+VALUES ('run-1', 'doc-1', 'COMPLETED', '{"scenes": []}');
+"""
+
+
+@pytest.fixture
+def baseline_database(tmp_path):
+    """Path of a SQLite database with the original schema and one document/run"""
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def enabled_cache(monkeypatch, tmp_path):
+    """A fresh, enabled cache in a temp dir, swapped in for the global one"""
+    # Imported here: app settings must see the environment set above
+    from app.config import settings
+    from app.utils import llm_client as llm_client_module
+    from app.utils.llm_cache import LLMCache
+    
+    monkeypatch.setattr(settings, "llm_cache_enabled", True)
+    cache = LLMCache(path=tmp_path / "llm_cache.sqlite3")
+    monkeypatch.setattr(llm_client_module, "llm_cache", cache)
+    yield cache
+    cache.close()
@@ -0,0 +1,79 @@
+"""
+Shared test helpers
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+from tenacity import wait_none
+
+from app.utils.llm_client import GeminiClient
+
+
+class FakeClock:
+    """Manually advanced time source for the `clock=` hooks"""
+    
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+def numbered_script(scenes: int) -> str:
+    """Script text with `scenes` numbered EXT. ROOFTOP headings, 12 action lines each"""
+    body = "RAVI runs across the roof while the police close in.\n" * 12
+    return "\n".join(f"{n}. EXT. ROOFTOP {n} - NIGHT\n{body}" for n in range(1, scenes + 1))
+
+
+@asynccontextmanager
+async def stub_server(handler=None):
+    """OpenAI-compatible stub on a free port; yields (base_url, connection peer ports seen)"""
+    peers = []
+    
+    async def completions(request):
+        peers.append(request.transport.get_extra_info("peername")[1])
+        if handler is not None:
+            return await handler(request)
+        body = await request.json()
+        content = json.dumps([{"echo": body["messages"][-1]["content"]}])
+        return web.json_response({"choices": [{"message": {"content": content}}]})
+    
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1", peers
+    finally:
+        await runner.cleanup()
+
+
+class FakeAsyncModels:
+    """Stands in for client.aio.models; fails the first `failures` calls"""
+    
+    def __init__(self, failures=0, latency=0.0):
+        self.failures = failures
+        self.latency = latency
+        self.started = []
+    
+    async def generate_content(self, model, contents, config):
+        self.started.append(time.monotonic())
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("503 UNAVAILABLE")
+        return type("Response", (), {"text": f"reply to {contents} ({config.max_output_tokens})"})()
+
+
+def gemini_with_models(monkeypatch, models, request_delay=0.0):
+    """GeminiClient whose SDK calls go to `models`, retried without waiting"""
+    client = GeminiClient()
+    client.request_delay = request_delay
+    monkeypatch.setattr(client.client.aio, "_models", models)
+    monkeypatch.setattr(GeminiClient._generate.retry, "wait", wait_none())
+    return client
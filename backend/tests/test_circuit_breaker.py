@@ -0,0 +1,146 @@
+"""
+Unit tests for LLM endpoint circuit breakers
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from app.agents import full_ai_orchestrator as orchestrator_module
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.utils.llm_client import Qwen3Client
+from tests.helpers import FakeAsyncModels, FakeClock, gemini_with_models, stub_server
+
+
+def _breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, cooldown_seconds=30, clock=clock)
+
+
+class TestCircuitBreaker:
+    """Closed -> open -> half-open -> closed/open"""
+    
+    def test_threshold_opens_and_cooldown_allows_one_probe(self):
+        """Consecutive failures open it; after the cool-down a single probe goes through"""
+        clock = FakeClock(100.0)
+        breaker = _breaker(clock)
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        
+        assert breaker.state == OPEN and breaker.is_open
+        assert not breaker.allow()
+        
+        clock.now += 30
+        assert not breaker.is_open
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()
+        
+        breaker.record_success()
+        assert breaker.state == CLOSED and breaker.allow()
+        assert breaker.stats()["rejected"] == 2
+    
+    def test_failed_probe_reopens(self):
+        """A failing probe starts a new cool-down"""
+        clock = FakeClock(100.0)
+        breaker = _breaker(clock)
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 30
+        breaker.allow()
+        
+        breaker.record_failure()
+        
+        assert breaker.state == OPEN
+        assert breaker.stats()["retry_in_seconds"] == 30
+        assert breaker.stats()["opened"] == 1
+    
+    def test_success_resets_failure_count(self):
+        """Only consecutive failures count"""
+        breaker = _breaker(FakeClock(100.0))
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        
+        assert breaker.state == CLOSED
+    
+    def test_check_raises_when_open(self):
+        """check() is allow() for callers that raise on errors"""
+        breaker = _breaker(FakeClock(100.0))
+        for _ in range(3):
+            breaker.record_failure()
+        
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+
+
+class TestClientsFailFast:
+    """Clients stop calling an endpoint while its breaker is open"""
+    
+    def test_qwen3_stops_calling_a_failing_server(self, monkeypatch):
+        """After the threshold of 5xx answers, calls return "" without a request"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "llm_breaker_failure_threshold", 2)
+        
+        async def unavailable(request):
+            return web.Response(status=503, text="model crashed")
+        
+        async def scenario():
+            async with stub_server(unavailable) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                replies = [await client.call_model(f"p{i}", use_cache=False) for i in range(5)]
+                streamed = [chunk async for chunk in client.call_model_stream("s", use_cache=False)]
+                await client.close()
+                return replies, streamed, len(peers), client.circuit_open
+        
+        replies, streamed, requests, circuit_open = asyncio.run(scenario())
+        
+        assert replies == [""] * 5 and streamed == []
+        assert requests == 2
+        assert circuit_open
+    
+    def test_gemini_does_not_retry_an_open_circuit(self, monkeypatch):
+        """CircuitOpenError is raised at once instead of being retried with backoff"""
+        models = FakeAsyncModels()
+        client = gemini_with_models(monkeypatch, models)
+        monkeypatch.setattr(client, "breaker", CircuitBreaker("gemini:test", failure_threshold=1, cooldown_seconds=60))
+        client.breaker.record_failure()
+        
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(client.call_model("prompt", use_cache=False))
+        assert models.started == []
+
+
+class TestAgentsSkipOpenCircuit:
+    """Agents go straight to their deterministic fallbacks"""
+    
+    def test_scene_extractor_uses_regex_when_circuit_open(self):
+        """No LLM call is attempted while the breaker is open"""
+        class OpenCircuitLLM:
+            circuit_open = True
+            
+            async def call_model(self, *args, **kwargs):
+                raise AssertionError("LLM called with an open circuit")
+        
+        script = "\n".join(
+            f"{n}. EXT. ROOFTOP - NIGHT\n" + "Ravi runs across the roof.\n" * 10 for n in range(1, 4)
+        )
+        agent = orchestrator_module.SceneExtractorAgent(OpenCircuitLLM())
+        
+        result = asyncio.run(agent.extract_scenes(script))
+        
+        assert result["mode"] == "regex" and result["ai_used"] is False
+        assert len(result["scenes"]) == 3
+    
+    def test_health_reports_breakers(self):
+        """/health/llm lists each endpoint's breaker state"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        
+        Qwen3Client(base_url="http://127.0.0.1:9/v1", model="test")
+        with TestClient(app) as client:
+            breakers = client.get("/health/llm").json()["breakers"]
+        
+        assert breakers["http://127.0.0.1:9/v1/chat/completions"]["state"] == CLOSED
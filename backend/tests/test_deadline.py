@@ -0,0 +1,145 @@
+"""
+Unit tests for run deadline budgets
+"""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from app.agents import full_ai_orchestrator as orchestrator_module
+from app.config import settings
+from app.utils.deadline import (
+    Deadline,
+    DeadlineBudget,
+    DeadlineExceeded,
+    call_timeout,
+    current_deadline,
+    deadline_scope,
+    pipeline_budget,
+    tier_scope,
+)
+from app.utils.llm_client import Qwen3Client
+from tests.helpers import FakeAsyncModels, FakeClock, gemini_with_models, numbered_script, stub_server
+
+
+class HangingLLM:
+    """Never answers: each call waits until its deadline-capped timeout runs out"""
+    
+    def __init__(self):
+        self.timeouts = []
+    
+    async def call_model(self, prompt, temperature=0.7, max_tokens=4096):
+        timeout = call_timeout(30)
+        self.timeouts.append(timeout)
+        await asyncio.sleep(timeout)
+        return ""
+
+
+class TestDeadlineBudget:
+    """Tier shares of the time left"""
+    
+    def test_unused_time_rolls_over(self):
+        """Each tier gets its share of what is left, relative to the tiers after it"""
+        clock = FakeClock()
+        budget = DeadlineBudget(Deadline.after(100, clock), {"a": 0.5, "b": 0.3, "c": 0.2})
+        
+        assert budget.tier("a").remaining() == pytest.approx(50)
+        clock.now = 10  # Tier a finished early
+        assert budget.tier("b").remaining() == pytest.approx(90 * 0.3 / 0.5)
+        assert budget.tier("a", "b").remaining() == pytest.approx(90 * 0.8)
+        clock.now = 80
+        assert budget.tier("c").remaining() == pytest.approx(20)
+    
+    def test_call_timeout_caps_at_time_left(self):
+        """Without a deadline the default applies; with one, the smaller of the two"""
+        assert call_timeout(120) == 120
+        assert call_timeout(None) is None
+        
+        clock = FakeClock()
+        deadline = Deadline.after(30, clock)
+        with deadline_scope(deadline):
+            assert call_timeout(120) == 30
+            assert call_timeout(10) == 10
+            clock.now = 31
+            with pytest.raises(DeadlineExceeded):
+                call_timeout(120)
+        assert current_deadline() is None
+    
+    def test_deadline_reaches_spawned_tasks(self):
+        """Tasks started inside a tier scope see the tier's deadline"""
+        async def scenario():
+            with pipeline_budget(10, {"one": 0.5, "two": 0.5}):
+                with tier_scope("one"):
+                    return await asyncio.create_task(asyncio.sleep(0, result=current_deadline().remaining()))
+        
+        assert 4 < asyncio.run(scenario()) <= 5
+    
+    def test_no_budget_means_no_deadline(self):
+        """seconds 0/None leave every call unbounded"""
+        with pipeline_budget(0, {"one": 1.0}) as budget:
+            with tier_scope("one") as deadline:
+                assert budget is None and deadline is None
+                assert call_timeout(120) == 120
+
+
+class TestClientsHonourDeadline:
+    """Client timeouts shrink to the time left"""
+    
+    def test_qwen3_request_stops_at_deadline(self):
+        """A hung server is abandoned at the deadline without tripping the breaker"""
+        async def hung(request):
+            await asyncio.sleep(1)
+            return web.json_response({"choices": [{"message": {"content": "late"}}]})
+        
+        async def scenario():
+            async with stub_server(hung) as (base_url, _):
+                client = Qwen3Client(base_url=base_url, model="test")
+                start = time.monotonic()
+                with deadline_scope(Deadline.after(0.2)):
+                    reply = await client.call_model("prompt", use_cache=False)
+                    skipped = await client.call_model("after the deadline", use_cache=False)
+                elapsed = time.monotonic() - start
+                await client.close()
+                return reply, skipped, elapsed, client.breaker.consecutive_failures
+        
+        reply, skipped, elapsed, failures = asyncio.run(scenario())
+        
+        assert reply == "" and skipped == ""
+        assert elapsed < 0.8
+        assert failures == 0
+    
+    def test_gemini_is_not_retried_past_deadline(self, monkeypatch):
+        """DeadlineExceeded ends the call on the first attempt"""
+        models = FakeAsyncModels(latency=5)
+        client = gemini_with_models(monkeypatch, models)
+        
+        async def scenario():
+            with deadline_scope(Deadline.after(0.1)):
+                return await client.call_model("prompt", use_cache=False)
+        
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(scenario())
+        assert len(models.started) == 1
+        assert client.breaker.consecutive_failures == 0
+
+
+class TestPipelineDeadline:
+    """run_pipeline_full_ai finishes near its deadline even when the LLM hangs"""
+    
+    def test_hanging_llm_run_is_bounded(self, monkeypatch):
+        """Every LLM call is capped by its tier's share; the run falls back and completes"""
+        monkeypatch.setattr(settings, "llm_provider", "gemini")
+        monkeypatch.setattr(settings, "scene_extraction_mode", "llm")
+        monkeypatch.setattr(settings, "llm_stream_responses", False)
+        llm = HangingLLM()
+        orchestrator = orchestrator_module.FullAIEnhancedOrchestrator(gemini_client=llm)
+        
+        start = time.monotonic()
+        result = asyncio.run(orchestrator.run_pipeline_full_ai("p", numbered_script(4), deadline_seconds=1.0))
+        elapsed = time.monotonic() - start
+        
+        assert result["executive_summary"]["total_scenes"] == 4
+        assert result["analysis_metadata"]["ai_success_rate"] == 0
+        assert llm.timeouts and max(llm.timeouts) <= 1.0
+        assert elapsed < 3.0
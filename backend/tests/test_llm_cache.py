@@ -0,0 +1,237 @@
+"""
+Unit tests for the LLM response cache
+"""
+import asyncio
+import json
+import random
+
+from app.utils.llm_cache import LLMCache, cache_key
+from app.utils.llm_client import Qwen3Client
+from tests.helpers import FakeClock, stub_server
+
+
+def _incompressible(seed: int) -> str:
+    """~800 characters that zlib can't shrink much"""
+    rng = random.Random(seed)
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(800))
+
+
+class TestCacheKey:
+    """Every parameter that changes the response is part of the key"""
+    
+    def test_key_varies_with_each_parameter(self):
+        """Provider, model, prompt, temperature and max_tokens all change the key"""
+        base = ("qwen3", "m", "prompt", 0.3, 4096)
+        variants = [
+            ("gemini", "m", "prompt", 0.3, 4096),
+            ("qwen3", "m2", "prompt", 0.3, 4096),
+            ("qwen3", "m", "prompt!", 0.3, 4096),
+            ("qwen3", "m", "prompt", 0.4, 4096),
+            ("qwen3", "m", "prompt", 0.3, 8000),
+        ]
+        
+        keys = {cache_key(*base)} | {cache_key(*variant) for variant in variants}
+        
+        assert len(keys) == 6
+        assert cache_key(*base) == cache_key("qwen3", "m", "prompt", 0.30000001, 4096)
+
+
+class TestLLMCache:
+    """L1 memory LRU over an L2 SQLite file"""
+    
+    def test_memory_lru_evicts_oldest(self, tmp_path):
+        """L1 keeps the most recently used entries; evicted ones come back from disk"""
+        cache = LLMCache(path=tmp_path / "c.sqlite3", memory_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        
+        assert list(cache._memory) == ["a", "c"]
+        assert cache.get("b") == "B"
+        assert cache.counters["hits_memory"] == 1 and cache.counters["hits_disk"] == 1
+        cache.close()
+    
+    def test_disk_level_survives_restart(self, tmp_path):
+        """A new instance on the same file serves earlier responses"""
+        path = tmp_path / "c.sqlite3"
+        first = LLMCache(path=path)
+        first.put("key", '[{"scene_number": "1"}]')
+        first.close()
+        
+        second = LLMCache(path=path)
+        
+        assert second.get("key") == '[{"scene_number": "1"}]'
+        assert second.get("other") is None
+        assert second.stats()["hit_rate"] == 0.5
+        second.close()
+    
+    def test_entries_expire_after_ttl(self, tmp_path):
+        """Entries older than the TTL are misses in both levels"""
+        clock = FakeClock(1000.0)
+        cache = LLMCache(path=tmp_path / "c.sqlite3", ttl_seconds=60, clock=clock)
+        cache.put("key", "value")
+        clock.now += 30
+        assert cache.get("key") == "value"
+        
+        clock.now += 31
+        cache._memory.clear()
+        
+        assert cache.get("key") is None
+        assert cache.counters["expired"] == 1
+        assert cache.stats()["disk_entries"] == 0
+        cache.close()
+    
+    def test_disk_size_cap_evicts_least_recently_used(self, tmp_path):
+        """Past the cap, rows not read recently are dropped first"""
+        clock = FakeClock(1000.0)
+        cache = LLMCache(path=tmp_path / "c.sqlite3", memory_entries=0, disk_max_bytes=2500, clock=clock)
+        values = {f"k{i}": _incompressible(i) for i in range(4)}
+        blob_size = None
+        for key, value in values.items():
+            clock.now += 1
+            cache.put(key, value)
+            if blob_size is None:
+                blob_size = cache.stats()["disk_bytes"]
+        assert 400 < blob_size < 1000
+        
+        clock.now += 1
+        cache.get("k0")
+        for i in range(4, 12):
+            clock.now += 1
+            cache.put(f"k{i}", _incompressible(i))
+        
+        stats = cache.stats()
+        assert stats["disk_bytes"] <= 2500
+        assert stats["evictions"] > 0
+        assert cache.get("k1") is None
+        assert cache.get("k11") is not None
+        cache.close()
+    
+    def test_empty_responses_are_not_cached(self, tmp_path):
+        """Failed calls return "" and must not be replayed"""
+        cache = LLMCache(path=tmp_path / "c.sqlite3")
+        cache.put("key", "")
+        
+        assert cache.get("key") is None
+        assert cache.counters["stores"] == 0
+        cache.close()
+
+
+class TestCachedClients:
+    """Qwen3Client consults the cache unless the caller opts out"""
+    
+    def test_repeat_call_is_served_from_cache(self, enabled_cache):
+        """Only the first identical call reaches the server; use_cache=False always does"""
+        async def scenario():
+            async with stub_server() as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                first = await client.call_model("prompt", temperature=0.3)
+                second = await client.call_model("prompt", temperature=0.3)
+                other = await client.call_model("prompt", temperature=0.5)
+                bypassed = await client.call_model("prompt", temperature=0.3, use_cache=False)
+                await client.close()
+                return first, second, other, bypassed, len(peers)
+        
+        first, second, other, bypassed, requests = asyncio.run(scenario())
+        
+        assert first == second == other == bypassed
+        assert requests == 3
+        stats = enabled_cache.stats()
+        assert stats["hits_memory"] == 1 and stats["misses"] == 2 and stats["bypassed"] == 1
+    
+    def test_failed_calls_are_retried(self, enabled_cache):
+        """An HTTP error ("" response) is not cached"""
+        from aiohttp import web
+        
+        async def failing(request):
+            return web.Response(status=503, text="busy")
+        
+        async def scenario():
+            async with stub_server(failing) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                replies = [await client.call_model("prompt") for _ in range(2)]
+                await client.close()
+                return replies, len(peers)
+        
+        assert asyncio.run(scenario()) == (["", ""], 2)
+    
+    def test_truncated_responses_are_not_cached(self, enabled_cache):
+        """An answer cut off at max_tokens (finish_reason "length") is never replayed"""
+        from aiohttp import web
+        
+        async def truncating(request):
+            return web.json_response({"choices": [{"message": {"content": '[{"scene'}, "finish_reason": "length"}]})
+        
+        async def scenario():
+            async with stub_server(truncating) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                replies = [await client.call_model("prompt") for _ in range(2)]
+                await client.close()
+                return replies, len(peers)
+        
+        assert asyncio.run(scenario()) == (['[{"scene', '[{"scene'], 2)
+        assert enabled_cache.counters["stores"] == 0
+    
+    def test_parse_failures_are_discarded(self, enabled_cache):
+        """mark_parse_failure() drops the cached answer so the next call asks again"""
+        from app.utils.llm_telemetry import mark_parse_failure
+        
+        async def scenario():
+            async with stub_server() as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                await client.call_model("prompt")
+                await client.call_model("prompt")  # Cache hit, then rejected by the agent
+                mark_parse_failure()
+                await client.call_model("prompt")
+                await client.close()
+                return len(peers)
+        
+        assert asyncio.run(scenario()) == 2
+        assert enabled_cache.counters["discarded"] == 1
+        assert enabled_cache.counters["hits_memory"] == 1
+    
+    def test_completed_stream_is_cached(self, enabled_cache):
+        """A stream that reached [DONE] is replayed as one chunk"""
+        from aiohttp import web
+        
+        async def streaming(request):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for piece in ['[{"scene_', 'number": 1}', "]"]:
+                event = {"choices": [{"delta": {"content": piece}}]}
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            return response
+        
+        async def scenario():
+            async with stub_server(streaming) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                first = [chunk async for chunk in client.call_model_stream("prompt")]
+                second = [chunk async for chunk in client.call_model_stream("prompt")]
+                await client.close()
+                return first, second, len(peers)
+        
+        first, second, requests = asyncio.run(scenario())
+        
+        assert "".join(first) == '[{"scene_number": 1}]'
+        assert second == ['[{"scene_number": 1}]']
+        assert requests == 1
+
+
+class TestHealthEndpoint:
+    """Cache counters are exposed for monitoring"""
+    
+    def test_health_llm_reports_cache_stats(self):
+        """/health/llm returns the counters and sizes"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        
+        with TestClient(app) as client:
+            response = client.get("/health/llm")
+        
+        assert response.status_code == 200
+        cache = response.json()["cache"]
+        assert cache["enabled"] is False
+        assert {"hits_memory", "hits_disk", "misses", "hit_rate", "disk_bytes"} <= set(cache)
+        assert isinstance(response.json()["limiter"], dict)
@@ -0,0 +1,100 @@
+"""
+Unit tests for the Gemini and Qwen3 LLM clients
+"""
+import asyncio
+import json
+
+from app.utils.llm_client import Qwen3Client, close_llm_clients
+from tests.helpers import FakeAsyncModels, gemini_with_models, stub_server
+
+# Allowed shortfall in measured request spacing (event loop and timer granularity)
+SPACING_TOLERANCE = 0.005
+
+
+class TestPooledSession:
+    """One long-lived session per client, closed on shutdown"""
+    
+    def test_calls_reuse_one_connection(self):
+        """Sequential calls share a keep-alive connection and session"""
+        async def scenario():
+            async with stub_server() as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                replies = [await client.call_model(f"prompt {i}") for i in range(5)]
+                session = client._session
+                await client.call_model("again")
+                same_session = client._session is session
+                await client.close()
+                return replies, peers, same_session, session.closed, client._session
+        
+        replies, peers, same_session, closed, session_after = asyncio.run(scenario())
+        
+        assert json.loads(replies[3]) == [{"echo": "prompt 3"}]
+        assert len(peers) == 6 and len(set(peers)) == 1
+        assert same_session and closed and session_after is None
+    
+    def test_close_llm_clients_closes_every_session(self):
+        """The lifespan hook closes sessions of all live clients"""
+        async def scenario():
+            async with stub_server() as (base_url, _):
+                clients = [Qwen3Client(base_url=base_url, model="test") for _ in range(2)]
+                await asyncio.gather(*[client.call_model(f"hi {i}") for i, client in enumerate(clients)])
+                sessions = [client._session for client in clients]
+                await close_llm_clients()
+                return [session.closed for session in sessions]
+        
+        assert asyncio.run(scenario()) == [True, True]
+    
+    def test_new_event_loop_gets_new_session(self):
+        """A client reused from another event loop does not touch the old loop's session"""
+        client = Qwen3Client(base_url="http://127.0.0.1:9/v1", model="test")
+        
+        async def session_of_this_loop():
+            return client._get_session()
+        
+        first = asyncio.run(session_of_this_loop())
+        second = asyncio.run(session_of_this_loop())
+        
+        assert first is not second
+        asyncio.run(client.close())
+
+
+class TestGeminiClient:
+    """GeminiClient is awaitable and never blocks the event loop"""
+    
+    def test_call_model_is_async_with_retries(self, monkeypatch):
+        """Transient errors are retried; max_tokens reaches the SDK"""
+        models = FakeAsyncModels(failures=2)
+        client = gemini_with_models(monkeypatch, models)
+        
+        reply = asyncio.run(client.call_model("prompt", temperature=0.2, max_tokens=512))
+        
+        assert reply == "reply to prompt (512)"
+        assert len(models.started) == 3
+    
+    def test_request_delay_spaces_calls_without_blocking(self, monkeypatch):
+        """Concurrent calls start request_delay apart while other tasks keep running"""
+        models = FakeAsyncModels()
+        client = gemini_with_models(monkeypatch, models, request_delay=0.05)
+        
+        async def scenario():
+            ticks = 0
+            
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.005)
+            
+            await client.call_model("warm-up")  # The SDK's first call does one-off setup after the throttle
+            models.started.clear()
+            task = asyncio.create_task(ticker())
+            replies = await asyncio.gather(*[client.call_model(f"p{i}") for i in range(3)])
+            task.cancel()
+            return replies, ticks
+        
+        replies, ticks = asyncio.run(scenario())
+        
+        gaps = [b - a for a, b in zip(models.started, models.started[1:])]
+        assert replies == [f"reply to p{i} (4096)" for i in range(3)]
+        assert all(gap >= client.request_delay - SPACING_TOLERANCE for gap in gaps)
+        assert ticks >= 10
@@ -0,0 +1,132 @@
+"""
+Unit tests for the process-wide LLM limiter
+"""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from app.config import settings
+from app.utils.llm_client import Qwen3Client
+from app.utils.llm_limiter import LLMLimiter, ProviderLimiter
+from tests.helpers import stub_server
+
+
+async def _run_calls(limiter: ProviderLimiter, count: int, duration: float = 0.02):
+    """Start `count` concurrent calls; returns (peak in-flight, start times)"""
+    active = 0
+    peak = 0
+    starts = []
+    
+    async def call(i):
+        nonlocal active, peak
+        async with limiter.slot(f"prompt {i}"):
+            starts.append(time.monotonic())
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(duration)
+            active -= 1
+    
+    await asyncio.gather(*[call(i) for i in range(count)])
+    return peak, starts
+
+
+class TestProviderLimiter:
+    """In-flight cap, rate limits and queue-wait counters"""
+    
+    def test_in_flight_cap_queues_the_rest(self, monkeypatch):
+        """No more than max_in_flight calls run at once; waits are counted"""
+        monkeypatch.setattr(settings, "qwen3_max_in_flight", 3)
+        limiter = ProviderLimiter("qwen3")
+        
+        peak, starts = asyncio.run(_run_calls(limiter, 10))
+        
+        stats = limiter.stats()
+        assert peak == 3 and len(starts) == 10
+        assert stats["calls"] == 10 and stats["queued_calls"] == 7
+        assert stats["max_queue_wait_seconds"] >= 0.05
+        assert stats["in_flight"] == 0 and stats["waiting"] == 0
+    
+    def test_requests_per_second(self, monkeypatch):
+        """After a one-second burst, call starts are spaced 1/rate apart"""
+        monkeypatch.setattr(settings, "qwen3_max_in_flight", 0)
+        monkeypatch.setattr(settings, "qwen3_requests_per_second", 20.0)
+        limiter = ProviderLimiter("qwen3")
+        
+        _, starts = asyncio.run(_run_calls(limiter, 25, duration=0))
+        
+        assert starts[-1] - starts[0] >= 0.2
+    
+    def test_response_tokens_delay_the_next_call(self, monkeypatch):
+        """Tokens charged after a call count against the following one"""
+        monkeypatch.setattr(settings, "qwen3_max_in_flight", 0)
+        monkeypatch.setattr(settings, "qwen3_tokens_per_second", 1000.0)
+        limiter = ProviderLimiter("qwen3")
+        
+        async def scenario():
+            async with limiter.slot("x" * 400) as slot:
+                slot.record_response("y" * 4800)  # ~1200 tokens: 0.3s over the bucket
+            start = time.monotonic()
+            async with limiter.slot("next"):
+                return time.monotonic() - start
+        
+        assert asyncio.run(scenario()) >= 0.25
+        assert limiter.stats()["tokens"] >= 1300
+    
+    def test_cancelled_waiter_does_not_leak_a_slot(self, monkeypatch):
+        """A caller cancelled while queued leaves the cap intact"""
+        monkeypatch.setattr(settings, "qwen3_max_in_flight", 1)
+        limiter = ProviderLimiter("qwen3")
+        
+        async def scenario():
+            async def hold(duration):
+                async with limiter.slot():
+                    await asyncio.sleep(duration)
+            
+            first = asyncio.create_task(hold(0.05))
+            await asyncio.sleep(0)
+            queued = asyncio.create_task(hold(0))
+            await asyncio.sleep(0.01)
+            queued.cancel()
+            await first
+            with pytest.raises(asyncio.CancelledError):
+                await queued
+            return await _run_calls(limiter, 3, duration=0)
+        
+        peak, _ = asyncio.run(scenario())
+        
+        assert peak == 1
+        assert limiter.stats()["in_flight"] == 0
+
+
+class TestClientsUseLimiter:
+    """Every upstream call goes through the shared limiter"""
+    
+    def test_qwen3_calls_respect_max_in_flight(self, monkeypatch):
+        """Concurrent calls from separate clients share one cap"""
+        monkeypatch.setattr(settings, "qwen3_max_in_flight", 2)
+        limiter = LLMLimiter()
+        monkeypatch.setattr("app.utils.llm_client.llm_limiter", limiter)
+        active = 0
+        peak = 0
+        
+        async def slow(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return web.json_response({"choices": [{"message": {"content": "[]"}}]})
+        
+        async def scenario():
+            async with stub_server(slow) as (base_url, _):
+                clients = [Qwen3Client(base_url=base_url, model="test") for _ in range(3)]
+                replies = await asyncio.gather(*[clients[i % 3].call_model(f"p{i}") for i in range(8)])
+                for client in clients:
+                    await client.close()
+                return replies
+        
+        assert asyncio.run(scenario()) == ["[]"] * 8
+        assert peak == 2
+        assert limiter.stats()["qwen3"]["calls"] == 8
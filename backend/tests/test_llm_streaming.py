@@ -0,0 +1,164 @@
+"""
+Unit tests for streamed LLM responses and incremental JSON array parsing
+"""
+import asyncio
+import json
+import re
+
+import pytest
+
+from app.agents import full_ai_orchestrator as orchestrator_module
+from app.config import settings
+from app.utils.json_stream import IncrementalJSONArrayParser
+from tests.helpers import numbered_script
+
+
+def _chunks(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeStreamingLLM:
+    """Streams the numbered headings of each prompt back as a JSON array, a few characters at a time"""
+    
+    def __init__(self, events):
+        self.events = events
+    
+    async def call_model(self, prompt, temperature=0.7, max_tokens=4096):
+        assert "SCRIPT EXCERPT" not in prompt and "COMPLETE SCRIPT" not in prompt, "extraction should stream"
+        return "[]"
+    
+    async def call_model_stream(self, prompt, temperature=0.7, max_tokens=4096):
+        scenes = [
+            {"scene_number": number, "location": f"ROOFTOP {number}", "time_of_day": "NIGHT"}
+            for number in re.findall(r"^(\d+)\. EXT\.", prompt, re.MULTILINE)
+        ]
+        chunks = _chunks("```json\n" + json.dumps(scenes), 7)
+        for chunk in chunks[:-1]:
+            await asyncio.sleep(0)
+            yield chunk
+        self.events.append("extraction finished")
+        yield chunks[-1]
+
+
+class RecordingAgent:
+    """Stands in for the tier 2 agents and records when each batch arrives"""
+    
+    events = []
+    
+    def __init__(self, llm_client):
+        pass
+    
+    async def analyze_risks(self, scenes):
+        RecordingAgent.events.append(f"risks {len(scenes)}")
+        return {"risks": [{"scene_number": s["scene_number"], "total_risk_score": 50} for s in scenes], "ai_used": False}
+    
+    async def estimate_budget(self, scenes):
+        return {"budgets": [{"scene_number": s["scene_number"], "cost_likely": 100} for s in scenes], "ai_used": False}
+
+
+class TestIncrementalJSONArrayParser:
+    """Elements come out as soon as they close, whatever the chunking"""
+    
+    @pytest.mark.parametrize("size", [1, 3, 64])
+    def test_any_chunking_matches_json_loads(self, size):
+        """Preamble is skipped and nested values, escapes and scalars survive splitting"""
+        elements = [
+            {"scene_number": "4.1", "description": 'He says "wait]" \\ {then}', "tags": [1, [2, {}]]},
+            "plain, string",
+            -3.5e2,
+            None,
+            {"location": "CAFÉ"},
+        ]
+        text = "Here you go:\n```json\n" + json.dumps(elements, indent=2) + "\n```"
+        parser = IncrementalJSONArrayParser()
+        
+        parsed = [element for chunk in _chunks(text, size) for element in parser.feed(chunk)]
+        
+        assert parsed == elements
+        assert parser.done
+    
+    def test_objects_are_returned_as_they_close(self):
+        """An element is available before the rest of the array has arrived"""
+        parser = IncrementalJSONArrayParser()
+        
+        assert parser.feed('[{"scene_number": 1}, {"scene_') == [{"scene_number": 1}]
+        assert parser.feed('number": 2}') == [{"scene_number": 2}]
+        assert not parser.done
+        assert parser.feed("]") == []
+        assert parser.done
+    
+    def test_truncated_and_invalid_elements(self):
+        """Broken elements are skipped; an unfinished one is never returned"""
+        parser = IncrementalJSONArrayParser()
+        
+        parsed = parser.feed('[{"a": 1}, {"b": tru}, {"c": 3}, {"d": "cut off')
+        
+        assert parsed == [{"a": 1}, {"c": 3}]
+        assert parser.skipped == 1
+        assert not parser.done
+
+
+class TestQwen3Streaming:
+    """call_model_stream reads OpenAI-style SSE deltas"""
+    
+    def test_sse_deltas_are_yielded(self):
+        """Content deltas are yielded in order; role-only events and [DONE] are handled"""
+        from aiohttp import web
+        from app.utils.llm_client import Qwen3Client
+        
+        async def completions(request):
+            body = await request.json()
+            assert body["stream"] is True
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            events = [{"choices": [{"delta": {"role": "assistant"}}]}]
+            events += [{"choices": [{"delta": {"content": piece}}]} for piece in ['[{"scene_', 'number": 1}', "]"]]
+            for event in events:
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+            await response.write(b": keep-alive\n\ndata: [DONE]\n\n")
+            return response
+        
+        async def scenario():
+            app = web.Application()
+            app.router.add_post("/v1/chat/completions", completions)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                client = Qwen3Client(base_url=f"http://127.0.0.1:{port}/v1", model="test")
+                try:
+                    return [chunk async for chunk in client.call_model_stream("prompt")]
+                finally:
+                    await client.close()
+            finally:
+                await runner.cleanup()
+        
+        assert asyncio.run(scenario()) == ['[{"scene_', 'number": 1}', "]"]
+
+
+class TestStreamingPipeline:
+    """Risk and budget scoring overlap scene extraction"""
+    
+    def test_scoring_starts_before_extraction_finishes(self, monkeypatch):
+        """Full batches are scored while the stream is still running; results stay in script order"""
+        monkeypatch.setattr(settings, "llm_provider", "gemini")
+        monkeypatch.setattr(settings, "scene_extraction_mode", "llm")
+        monkeypatch.setattr(settings, "stream_tier2_batch_size", 4)
+        monkeypatch.setattr(orchestrator_module, "RiskScorerAgent", RecordingAgent)
+        monkeypatch.setattr(orchestrator_module, "BudgetEstimatorAgent", RecordingAgent)
+        RecordingAgent.events = []
+        orchestrator = orchestrator_module.FullAIEnhancedOrchestrator(FakeStreamingLLM(RecordingAgent.events))
+        
+        scenes, risks, budgets, extraction_result, risk_result, _ = asyncio.run(
+            orchestrator._run_streaming_tiers(numbered_script(10), None)
+        )
+        
+        assert extraction_result["ai_used"] is True
+        assert RecordingAgent.events.index("risks 4") < RecordingAgent.events.index("extraction finished")
+        assert sorted(RecordingAgent.events) == ["extraction finished", "risks 2", "risks 4", "risks 4"]
+        assert [s["scene_number"] for s in scenes] == [str(n) for n in range(1, 11)]
+        assert [r["scene_number"] for r in risks] == [str(n) for n in range(1, 11)]
+        assert [b["scene_number"] for b in budgets] == [str(n) for n in range(1, 11)]
+        assert risk_result["ai_used"] is False
@@ -0,0 +1,237 @@
+"""
+Unit tests for per-agent LLM call telemetry
+"""
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from app.utils import llm_telemetry
+from app.utils.deadline import Deadline, deadline_scope
+from app.utils.llm_client import Qwen3Client
+from app.utils.llm_telemetry import (
+    Histogram,
+    LLMCall,
+    LLMMetrics,
+    agent_scope,
+    mark_parse_failure,
+    run_telemetry,
+)
+from tests.helpers import stub_server
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """Fresh process-wide metrics for the test"""
+    fresh = LLMMetrics()
+    monkeypatch.setattr(llm_telemetry, "llm_metrics", fresh)
+    return fresh
+
+
+def _usage_handler(content="[]", prompt_tokens=42, completion_tokens=7, delay=0.0):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return web.json_response({
+            "choices": [{"message": {"content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+        })
+    return handler
+
+
+class TestCallRecords:
+    """Each call_model invocation is recorded for its agent and run"""
+    
+    def test_usage_latency_and_agent(self, metrics):
+        """Tokens come from the usage field; calls are attributed to the agent scope"""
+        async def scenario():
+            async with stub_server(_usage_handler()) as (base_url, _):
+                client = Qwen3Client(base_url=base_url, model="test")
+                with run_telemetry() as telemetry:
+                    with agent_scope("RiskScorer"):
+                        await client.call_model("score these scenes")
+                    await client.call_model("no agent")
+                await client.close()
+                return telemetry.summary()
+        
+        summary = asyncio.run(scenario())
+        risk = summary["agents"]["RiskScorer"]
+        
+        assert risk["outcomes"] == {"ok": 1}
+        assert (risk["prompt_tokens"], risk["completion_tokens"]) == (42, 7)
+        assert 0 < risk["avg_ttfb_seconds"] <= risk["avg_latency_seconds"]
+        assert summary["agents"][llm_telemetry.UNATTRIBUTED]["calls"] == 1
+        assert summary["total"]["prompt_tokens"] == 84
+        assert metrics.calls[("RiskScorer", "qwen3", "ok")] == 1
+        assert metrics.histograms["llm_prompt_tokens"][("RiskScorer", "qwen3")].sum == 42
+    
+    def test_http_errors_timeouts_and_parse_failures(self, metrics):
+        """Failed calls get their outcome; unparseable answers are moved to parse_fail"""
+        async def failing(request):
+            if "slow" in (await request.json())["messages"][-1]["content"]:
+                await asyncio.sleep(1)
+            return web.Response(status=500, text="model crashed")
+        
+        async def scenario():
+            with run_telemetry() as telemetry, agent_scope("BudgetEstimator"):
+                async with stub_server(failing) as (base_url, _):
+                    client = Qwen3Client(base_url=base_url, model="test")
+                    await client.call_model("fails")
+                    with deadline_scope(Deadline.after(0.2)):
+                        await client.call_model("slow")
+                    await client.close()
+                async with stub_server(_usage_handler(content="Sorry, no JSON today")) as (base_url, _):
+                    client = Qwen3Client(base_url=base_url, model="test")
+                    await client.call_model("answers in prose")
+                    mark_parse_failure()
+                    await client.close()
+            return telemetry.summary()
+        
+        summary = asyncio.run(scenario())
+        
+        assert summary["agents"]["BudgetEstimator"]["outcomes"] == {"http_error": 1, "timeout": 1, "parse_fail": 1}
+        assert metrics.calls[("BudgetEstimator", "qwen3", "ok")] == 0
+        assert metrics.calls[("BudgetEstimator", "qwen3", "parse_fail")] == 1
+    
+    def test_cache_hits_and_joined_calls_use_no_tokens(self, metrics, enabled_cache):
+        """Only the upstream call counts tokens and latency"""
+        async def scenario():
+            async with stub_server(_usage_handler(delay=0.05)) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                with run_telemetry() as telemetry, agent_scope("CrossSceneAuditor"):
+                    await asyncio.gather(client.call_model("same"), client.call_model("same"))
+                    await client.call_model("same")
+                await client.close()
+                return telemetry.summary()["total"], len(peers)
+        
+        total, requests = asyncio.run(scenario())
+        
+        assert requests == 1
+        assert (total["calls"], total["upstream_calls"], total["coalesced"], total["cache_hits"]) == (3, 1, 1, 1)
+        assert total["prompt_tokens"] == 42
+        assert total["outcomes"] == {"ok": 3}
+    
+    def test_joined_calls_keep_their_own_agent(self, metrics):
+        """A shared request is counted once, for the agent that started it"""
+        async def scenario():
+            async with stub_server(_usage_handler(delay=0.05)) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                with run_telemetry() as telemetry:
+                    async def ask(agent):
+                        with agent_scope(agent):
+                            return await client.call_model("same")
+                    
+                    await asyncio.gather(ask("WhatIfRisk"), ask("WhatIfBudget"))
+                await client.close()
+                return telemetry.summary()["agents"], len(peers)
+        
+        agents, requests = asyncio.run(scenario())
+        risk, budget = agents["WhatIfRisk"], agents["WhatIfBudget"]
+        
+        assert requests == 1 and llm_telemetry.UNATTRIBUTED not in agents
+        assert (risk["upstream_calls"], risk["prompt_tokens"], risk["outcomes"]) == (1, 42, {"ok": 1})
+        assert (budget["coalesced"], budget["prompt_tokens"], budget["outcomes"]) == (1, 0, {"ok": 1})
+        assert 0 < risk["avg_ttfb_seconds"] <= risk["avg_latency_seconds"]
+    
+    def test_stream_usage_and_first_token(self, metrics):
+        """Streams read usage from the final chunk and time the first token"""
+        async def streaming(request):
+            body = await request.json()
+            assert body["stream_options"] == {"include_usage": True}
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for event in (
+                {"choices": [{"delta": {"content": "["}}]},
+                {"choices": [{"delta": {"content": "]"}}]},
+                {"choices": [], "usage": {"prompt_tokens": 11, "completion_tokens": 2}},
+            ):
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+                await asyncio.sleep(0.02)
+            await response.write(b"data: [DONE]\n\n")
+            return response
+        
+        async def scenario():
+            async with stub_server(streaming) as (base_url, _):
+                client = Qwen3Client(base_url=base_url, model="test")
+                with run_telemetry() as telemetry, agent_scope("SceneExtractor"):
+                    chunks = [chunk async for chunk in client.call_model_stream("extract")]
+                await client.close()
+                return chunks, telemetry.summary()["agents"]["SceneExtractor"]
+        
+        chunks, extractor = asyncio.run(scenario())
+        
+        assert chunks == ["[", "]"]
+        assert extractor["outcomes"] == {"ok": 1}
+        assert (extractor["prompt_tokens"], extractor["completion_tokens"]) == (11, 2)
+        assert extractor["avg_ttfb_seconds"] < extractor["avg_latency_seconds"]
+    
+    def test_streamed_extraction_marks_parse_failures(self, metrics):
+        """A window whose stream is cut off or has a bad element counts as parse_fail"""
+        from app.agents.full_ai_orchestrator import SceneExtractorAgent
+        
+        replies = {
+            "complete": ['[{"scene_number": 1}', ', {"scene_number": 2}]'],
+            "truncated": ['[{"scene_number": 1}', ', {"scene_num'],
+            "rejected": ['[{"scene_number": 1}', ', {scene: 2}]'],
+        }
+        
+        async def streaming(request):
+            prompt = (await request.json())["messages"][-1]["content"]
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for piece in replies[prompt]:
+                event = {"choices": [{"delta": {"content": piece}}]}
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            return response
+        
+        async def scenario():
+            async with stub_server(streaming) as (base_url, _):
+                agent = SceneExtractorAgent(Qwen3Client(base_url=base_url, model="test"))
+                with run_telemetry() as telemetry:
+                    for prompt in replies:
+                        await agent._stream_window(prompt, 1, 1, asyncio.Semaphore(1), lambda scene: None)
+                await agent.llm_client.close()
+                return telemetry.summary()["agents"]["SceneExtractor"]
+        
+        extractor = asyncio.run(scenario())
+        
+        assert extractor["outcomes"] == {"ok": 1, "parse_fail": 2}
+        assert metrics.calls[("SceneExtractor", "qwen3", "parse_fail")] == 2
+
+
+class TestMetricsEndpoint:
+    """Histograms are exposed in the Prometheus text format"""
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Bucket counts include every smaller bucket; +Inf equals the count"""
+        histogram = Histogram((1, 5))
+        for value in (0.5, 3, 4, 9):
+            histogram.observe(value)
+        
+        assert histogram.cumulative() == [("1", 1), ("5", 3), ("+Inf", 4)]
+        assert histogram.sum == 16.5
+    
+    def test_metrics_endpoint_renders_calls(self):
+        """/metrics lists outcome counters and latency/token histograms per agent"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        
+        with agent_scope('Quote"Agent'):
+            call = LLMCall("qwen3", "x" * 400)
+        call.set_usage(100, 20)
+        call.first_byte()
+        call.done("[]")
+        call.finish()
+        
+        with TestClient(app) as client:
+            response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        labels = 'agent="Quote\\"Agent",provider="qwen3"'
+        assert f'llm_calls_total{{{labels},outcome="ok"}} 1' in response.text
+        assert f'llm_prompt_tokens_bucket{{{labels},le="128"}}' not in response.text
+        assert f'llm_prompt_tokens_bucket{{{labels},le="256"}} 1' in response.text
+        assert f"llm_completion_tokens_sum{{{labels}}} 20" in response.text
+        assert "# TYPE llm_request_duration_seconds histogram" in response.text
@@ -0,0 +1,30 @@
+"""
+Unit tests for the MCP tool registry
+"""
+import asyncio
+
+from app.utils import mcp_tools
+from app.utils.mcp_server import mcp_server
+from tests.helpers import FakeAsyncModels, gemini_with_models
+
+
+class TestMCPTools:
+    """Tools are called through mcp_server.call_tool"""
+    
+    def test_gemini_call_returns_the_reply(self, monkeypatch):
+        """The async Gemini tool is awaited, not handed back as a coroutine"""
+        models = FakeAsyncModels()
+        monkeypatch.setattr(mcp_tools, "gemini_client", gemini_with_models(monkeypatch, models))
+        
+        reply = asyncio.run(mcp_server.call_tool("gemini_call", prompt="prompt", temperature=0.1))
+        
+        assert reply == "reply to prompt (4096)"
+        assert mcp_server.call_history[-1]["status"] == "success"
+    
+    def test_sync_tools_still_return_values(self):
+        """Plain functions are returned as-is"""
+        result = asyncio.run(mcp_server.call_tool(
+            "validate_json_schema", data={"a": 1}, required_fields=["a", "b"]
+        ))
+        
+        assert result["missing_fields"] == ["b"]
@@ -0,0 +1,124 @@
+"""
+Unit tests for token-lean agent prompt serialization
+"""
+import asyncio
+import json
+
+from app.agents import full_ai_orchestrator as orchestrator_module
+from app.agents.full_ai_orchestrator import CrossSceneAuditorAgent, RiskScorerAgent
+from app.utils import prompt_format
+from app.utils.llm_limiter import estimate_tokens
+from app.utils.prompt_format import compact_features, compact_json, format_scene_table
+
+
+def _feature(value):
+    return {
+        "value": value,
+        "confidence": 0.9,
+        "evidence": "The boat explodes and RAVI dives into the river",
+        "reasoning": "explicit action in the scene body",
+    }
+
+
+def _scene(number, location="EXT. HARBOUR", time_of_day="NIGHT", heavy=True):
+    return {
+        "scene_number": number,
+        "location": location,
+        "time_of_day": time_of_day,
+        "description": "The boat explodes. RAVI dives into the river while the crowd watches from the pier.",
+        "confidence": 0.85,
+        "is_continuation": False,
+        "features": {
+            "stunt_level": _feature("heavy" if heavy else "none"),
+            "water_complexity": _feature("complex" if heavy else "none"),
+            "crowd_size": _feature("large" if heavy else "none"),
+            "vehicle_types": _feature(["boat"] if heavy else []),
+            "animals": _feature("none"),
+            "weather_dependent": _feature("no"),
+            "permit_tier": _feature(3 if heavy else 1),
+            "hazards": _feature(["fire", "explosion"] if heavy else []),
+            "talent_count": _feature(2),
+            "extras_count": _feature(40),
+        },
+    }
+
+
+class CapturingLLM:
+    """Records prompts and answers with an empty JSON array"""
+    
+    def __init__(self):
+        self.prompts = []
+    
+    async def call_model(self, prompt, temperature=0.7, max_tokens=4096):
+        self.prompts.append(prompt)
+        return "[]"
+
+
+class TestSceneTable:
+    """Scenes are projected onto the columns an agent asks for"""
+    
+    def test_rows_project_requested_columns(self):
+        """Legend, header and one row per scene; default features are left out"""
+        table = format_scene_table(
+            [_scene("12"), _scene("13", "INT. KITCHEN", "DAY", heavy=False)],
+            ("n", "loc", "tod", "feat"),
+        )
+        
+        assert table.splitlines() == [
+            "Columns: n=scene number, loc=location, tod=time of day, feat=production features",
+            "n|loc|tod|feat",
+            "12|EXT. HARBOUR|NIGHT|stunt=heavy water=complex crowd=large vehicles=boat permit=3 hazards=fire;explosion",
+            "13|INT. KITCHEN|DAY|",
+        ]
+    
+    def test_extra_columns_and_cell_cleanup(self):
+        """Extra per-scene values are looked up by scene number; cells stay one short line"""
+        scene = _scene(4, location="EXT. BRIDGE | RIVER\nBANK")
+        scene["description"] = "x" * 500
+        
+        table = format_scene_table([scene], ("n", "loc", "risk", "desc"), {"4": {"risk": 78}}, {"risk": "risk 0-100"})
+        legend, header, row = table.splitlines()
+        number, location, risk, description = row.split("|")
+        
+        assert legend.endswith("risk=risk 0-100, desc=description")
+        assert (number, location, risk) == ("4", "EXT. BRIDGE / RIVER BANK", "78")
+        assert len(description) == prompt_format.DESCRIPTION_MAX_CHARS
+        assert description.endswith("…")
+    
+    def test_scene_without_features(self):
+        """Tier 1 scenes (no features yet) get an empty feature cell"""
+        scene = _scene(1)
+        del scene["features"]
+        
+        assert compact_features(scene) == ""
+    
+    def test_table_is_much_smaller_than_indented_json(self):
+        """The projection sends well under half the tokens of json.dumps(indent=2)"""
+        scenes = [_scene(str(n)) for n in range(1, 6)]
+        
+        table_tokens = estimate_tokens(format_scene_table(scenes, RiskScorerAgent.PROMPT_COLUMNS))
+        json_tokens = estimate_tokens(json.dumps(scenes, indent=2))
+        
+        assert table_tokens * 4 < json_tokens
+        assert estimate_tokens(compact_json(scenes)) < json_tokens
+
+
+class TestAgentPrompts:
+    """Agents send tables instead of scene dicts"""
+    
+    def test_agents_send_scene_tables(self, monkeypatch):
+        """Risk scorer and cross-scene auditor prompts carry rows, not scene dicts"""
+        monkeypatch.setattr(orchestrator_module, "_deterministic_agents", (None, None))
+        llm = CapturingLLM()
+        scenes = [_scene("1"), _scene("2"), _scene("3", heavy=False)]
+        risks = [{"scene_number": "1", "total_risk_score": 85}, {"scene_number": "2", "total_risk_score": 72}]
+        
+        asyncio.run(RiskScorerAgent(llm).analyze_risks(scenes))
+        asyncio.run(CrossSceneAuditorAgent(llm).find_insights(scenes, risks))
+        risk_prompt, auditor_prompt = llm.prompts
+        
+        assert "n|loc|tod|feat|desc" in risk_prompt
+        assert "n|loc|tod|risk|feat" in auditor_prompt
+        assert "2|EXT. HARBOUR|NIGHT|72|stunt=heavy" in auditor_prompt
+        for prompt in llm.prompts:
+            assert '"evidence"' not in prompt and "is_continuation" not in prompt
@@ -0,0 +1,123 @@
+"""
+Unit tests for retention compaction and delete cascades
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models.database import Document, Report, Run, RunStatus, Scene, SceneRisk
+from app.services.retention import load_run_archive, run_compaction
+
+
+SAMPLE_DOCX = Path(__file__).parent.parent / "storage" / "uploads" / "056f66b2-99c1-4a69-a6db-e4a5aa1eb3b3.docx"
+
+
+def _add_run(session, document_id: str, started_at: datetime, pdf_path: str = None) -> Run:
+    run = Run(document_id=document_id, status=RunStatus.COMPLETED, started_at=started_at,
+              completed_at=started_at, enhanced_result_json={"scenes_analysis": {"total_scenes": 1}})
+    session.add(run)
+    session.flush()
+    scene = Scene(run_id=run.id, scene_number=1, raw_text="INT. BANK - NIGHT")
+    session.add(scene)
+    session.flush()
+    session.add(SceneRisk(scene_id=scene.id, total_risk_score=70))
+    if pdf_path:
+        session.add(Report(project_id=run.id, run_id=run.id, pdf_path=pdf_path))
+    return run
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        yield session
+    engine.dispose()
+
+
+class TestCompaction:
+    """Tests for the scheduled retention pass"""
+    
+    def test_expires_old_runs_but_keeps_newest(self, db_session, monkeypatch):
+        """Old runs beyond the per-document keep count are archived and deleted"""
+        monkeypatch.setattr(settings, "retention_run_days", 30)
+        monkeypatch.setattr(settings, "retention_keep_runs_per_document", 2)
+        now = datetime(2026, 6, 1)
+        db_session.add(Document(id="doc", filename="s.pdf", file_path="/nonexistent/s.pdf", format="pdf"))
+        runs = [_add_run(db_session, "doc", now - timedelta(days=100 + i)) for i in range(4)]
+        db_session.commit()
+        
+        stats = run_compaction(db_session, now=now, archive=True)
+        
+        remaining = set(db_session.execute(select(Run.id)).scalars())
+        assert remaining == {runs[0].id, runs[1].id}
+        assert stats.runs_archived == 2
+        assert db_session.execute(select(func.count(Scene.id))).scalar() == 2
+        assert db_session.execute(select(func.count(SceneRisk.id))).scalar() == 2
+        
+        archive = Path(settings.storage_path) / "archive" / "runs"
+        archived = load_run_archive(next(archive.rglob(f"{runs[3].id}*")))
+        assert archived["enhanced_result_json"]["scenes_analysis"]["total_scenes"] == 1
+    
+    def test_archives_runs_of_expired_documents(self, db_session, monkeypatch):
+        """Runs deleted along with an expired document are archived first"""
+        monkeypatch.setattr(settings, "retention_document_days", 90)
+        now = datetime(2026, 6, 1)
+        db_session.add(Document(id="old-doc", filename="o.pdf", file_path="/nonexistent/o.pdf",
+                                format="pdf", uploaded_at=now - timedelta(days=200)))
+        run = _add_run(db_session, "old-doc", now - timedelta(days=150))
+        db_session.commit()
+        
+        stats = run_compaction(db_session, now=now, archive=True)
+        
+        assert db_session.execute(select(func.count(Document.id))).scalar() == 0
+        assert db_session.execute(select(func.count(Run.id))).scalar() == 0
+        assert stats.runs_archived == 1
+        archive = Path(settings.storage_path) / "archive" / "runs"
+        assert load_run_archive(next(archive.rglob(f"{run.id}*")))["document_id"] == "old-doc"
+    
+    def test_sweeps_orphaned_runs_and_reports(self, db_session, tmp_path):
+        """Runs of deleted documents go, along with their report PDFs"""
+        pdf = tmp_path / "report.pdf"
+        pdf.write_bytes(b"%PDF")
+        _add_run(db_session, "deleted-doc", datetime.utcnow(), pdf_path=str(pdf))
+        db_session.commit()
+        
+        stats = run_compaction(db_session, archive=False)
+        
+        assert db_session.execute(select(func.count(Run.id))).scalar() == 0
+        assert db_session.execute(select(func.count(Report.id))).scalar() == 0
+        assert stats.rows_deleted["scene_risks"] == 1
+        assert not pdf.exists()
+
+
+class TestDeleteCascade:
+    """Tests for deleting a script together with its runs"""
+    
+    def test_delete_script_removes_runs_and_reports(self, tmp_path):
+        """DELETE /scripts/{id} leaves no run rows or report PDFs behind"""
+        from app.main import app
+        from app.database import sync_engine
+        
+        with TestClient(app) as client:
+            data = SAMPLE_DOCX.read_bytes() + b"\5"
+            document_id = client.post("/api/v1/scripts/upload", files={"file": ("c.docx", data)}).json()["document_id"]
+            
+            pdf = tmp_path / "report.pdf"
+            pdf.write_bytes(b"%PDF")
+            with sessionmaker(bind=sync_engine)() as session:
+                _add_run(session, document_id, datetime.utcnow(), pdf_path=str(pdf))
+                session.commit()
+            
+            assert client.delete(f"/api/v1/scripts/{document_id}").status_code == 204
+        
+        with sessionmaker(bind=sync_engine)() as session:
+            assert session.execute(select(Run).where(Run.document_id == document_id)).first() is None
+            assert session.execute(select(func.count(SceneRisk.id))).scalar() == 0
+        assert not pdf.exists()
@@ -0,0 +1,197 @@
+"""
+Unit tests for incremental re-analysis of revised drafts
+"""
+import asyncio
+import io
+
+import pytest
+
+from app.agents import full_ai_orchestrator as orchestrator_module
+from app.config import settings
+from app.services.revisions import baseline_from_result, fingerprint_scenes, plan_revision
+from app.services.scene_index import scan_scene_headings
+
+
+def _draft(scenes) -> str:
+    return "\n".join(f"{number}. {heading}\n{body}" for number, heading, body in scenes)
+
+
+PARENT = [
+    (1, "INT. KITCHEN - DAY", "MAYA pours coffee.\nShe reads the letter twice."),
+    (2, "EXT. ROOFTOP - NIGHT", "RAVI leaps the gap between buildings."),
+    (3, "INT. GARAGE - NIGHT", "The car will not start."),
+]
+
+
+def _parent_result(script_text):
+    headings = scan_scene_headings(script_text)
+    numbers = [heading.scene_number for heading in headings]
+    result = {
+        "scenes_analysis": {"scenes": [{"scene_number": n, "location": f"PARENT {n}"} for n in numbers]},
+        "risk_intelligence": {"risks": [{"scene_number": n, "total_risk_score": 10 * int(n)} for n in numbers]},
+        "budget_intelligence": {"budgets": [{"scene_number": n, "cost_likely": 1000 * int(n)} for n in numbers]},
+    }
+    return baseline_from_result("parent-doc", "parent-run", script_text, headings, result)
+
+
+class RecordingAgent:
+    """Stands in for the tier 2 agents and records the scenes it was given"""
+    
+    calls = []
+    
+    def __init__(self, llm_client):
+        pass
+    
+    async def analyze_risks(self, scenes):
+        RecordingAgent.calls.append(("risks", [scene["scene_number"] for scene in scenes]))
+        return {"risks": [{"scene_number": s["scene_number"], "total_risk_score": 99} for s in scenes], "ai_used": False}
+    
+    async def estimate_budget(self, scenes):
+        RecordingAgent.calls.append(("budgets", [scene["scene_number"] for scene in scenes]))
+        return {"budgets": [{"scene_number": s["scene_number"], "cost_likely": 99} for s in scenes], "ai_used": False}
+
+
+class TestFingerprints:
+    """Scene fingerprints ignore renumbering, page numbers and wrapping"""
+    
+    def test_cosmetic_changes_keep_fingerprints(self):
+        """Renumbered, re-wrapped and page-numbered drafts fingerprint the same"""
+        original = _draft(PARENT)
+        cosmetic = (
+            "7. INT. KITCHEN – DAY 12\nMAYA pours coffee. She reads\nthe letter twice.\n  13.\n"
+            "8. EXT. ROOFTOP - NIGHT\nRAVI leaps the gap between buildings.\n"
+            "9. INT. GARAGE - NIGHT\nThe car will not start."
+        )
+        
+        assert fingerprint_scenes(cosmetic, scan_scene_headings(cosmetic)) == \
+            fingerprint_scenes(original, scan_scene_headings(original))
+    
+    def test_edited_body_changes_fingerprint(self):
+        """Changing a scene's action gives it a new fingerprint"""
+        original = _draft(PARENT)
+        edited = original.replace("The car will not start.", "The car explodes.")
+        
+        before = fingerprint_scenes(original, scan_scene_headings(original))
+        after = fingerprint_scenes(edited, scan_scene_headings(edited))
+        
+        assert before[:2] == after[:2]
+        assert before[2] != after[2]
+
+
+class TestRevisionPlan:
+    """Only added/changed scenes go back through tiers 1-2"""
+    
+    def test_plan_carries_unchanged_scenes(self):
+        """Inserted and edited scenes are re-analyzed, the rest renumbered and reused"""
+        baseline = _parent_result(_draft(PARENT))
+        revised = _draft([
+            (1, *PARENT[0][1:]),
+            (2, "EXT. STREET - DAY", "A new scene."),
+            (3, *PARENT[1][1:]),
+            (4, "INT. GARAGE - NIGHT", "The car explodes."),
+        ])
+        
+        plan = plan_revision(revised, scan_scene_headings(revised), baseline)
+        
+        assert plan.changed == [1, 3]
+        assert sorted(plan.carried) == [0, 2]
+        assert plan.removed == 1
+        scene, risk, budget = plan.carried[2]
+        assert (scene["scene_number"], scene["location"]) == ("3", "PARENT 2")
+        assert (risk["total_risk_score"], budget["cost_likely"]) == (20, 2000)
+        assert baseline.scenes["2"]["scene_number"] == "2"
+    
+    def test_revision_tiers_only_analyze_changed_scenes(self, monkeypatch):
+        """Merged tier 1-2 output is in script order with carried results intact"""
+        monkeypatch.setattr(settings, "llm_provider", "gemini")
+        monkeypatch.setattr(settings, "scene_extraction_mode", "regex")
+        monkeypatch.setattr(orchestrator_module, "RiskScorerAgent", RecordingAgent)
+        monkeypatch.setattr(orchestrator_module, "BudgetEstimatorAgent", RecordingAgent)
+        RecordingAgent.calls = []
+        
+        baseline = _parent_result(_draft(PARENT))
+        revised = _draft([
+            (1, *PARENT[0][1:]),
+            (2, "EXT. STREET - DAY", "A new scene."),
+            (3, *PARENT[1][1:]),
+            (4, "INT. GARAGE - NIGHT", "The car explodes."),
+        ])
+        orchestrator = orchestrator_module.FullAIEnhancedOrchestrator(gemini_client=None)
+        
+        scenes, risks, budgets, _, _, _, summary = asyncio.run(
+            orchestrator._run_revision_tiers(revised, scan_scene_headings(revised), baseline)
+        )
+        
+        assert RecordingAgent.calls == [("risks", ["2", "4"]), ("budgets", ["2", "4"])]
+        assert [scene["scene_number"] for scene in scenes] == ["1", "2", "3", "4"]
+        assert [risk["total_risk_score"] for risk in risks] == [10, 99, 20, 99]
+        assert [budget["cost_likely"] for budget in budgets] == [1000, 99, 2000, 99]
+        assert summary == {
+            "parent_document_id": "parent-doc",
+            "parent_run_id": "parent-run",
+            "scenes_reused": 2,
+            "scenes_reanalyzed": 2,
+            "scenes_removed": 1,
+        }
+    
+    def test_nothing_reusable_runs_full_pipeline(self, monkeypatch):
+        """A rewrite with no unchanged scenes falls back to the full pipeline"""
+        monkeypatch.setattr(settings, "llm_provider", "gemini")
+        baseline = _parent_result(_draft(PARENT))
+        rewrite = _draft([(1, "EXT. DESERT - DAY", "Sand everywhere.")])
+        orchestrator = orchestrator_module.FullAIEnhancedOrchestrator(gemini_client=None)
+        
+        assert asyncio.run(
+            orchestrator._run_revision_tiers(rewrite, scan_scene_headings(rewrite), baseline)
+        ) is None
+
+
+def _docx(script_text: str) -> bytes:
+    from docx import Document as DocxDocument
+    doc = DocxDocument()
+    for line in script_text.split("\n"):
+        doc.add_paragraph(line)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+class TestRevisionUpload:
+    """Uploading a draft as a revision of another"""
+    
+    def test_revision_links_to_parent(self, client):
+        """The revision's script record points at its parent draft"""
+        parent = client.post(
+            "/api/v1/scripts/upload", files={"file": ("draft1.docx", _docx(_draft(PARENT)))}
+        ).json()
+        revised = _draft(PARENT + [(4, "EXT. PIER - DAWN", "Gulls.")])
+        
+        response = client.post(
+            "/api/v1/scripts/upload",
+            files={"file": ("draft2.docx", _docx(revised))},
+            data={"parent_document_id": parent["document_id"]},
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["parent_document_id"] == parent["document_id"]
+        script = client.get(f"/api/v1/scripts/{response.json()['document_id']}").json()
+        assert script["parent_document_id"] == parent["document_id"]
+    
+    def test_unknown_parent_rejected(self, client):
+        """A parent_document_id that does not exist is a 400"""
+        response = client.post(
+            "/api/v1/scripts/upload",
+            files={"file": ("draft2.docx", _docx(_draft(PARENT)))},
+            data={"parent_document_id": "no-such-document"},
+        )
+        
+        assert response.status_code == 400
+        assert "no-such-document" in response.json()["detail"]
@@ -0,0 +1,205 @@
+"""
+Unit tests for windowed LLM scene extraction
+"""
+import asyncio
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from app.agents.full_ai_orchestrator import SceneExtractorAgent
+from app.config import settings
+from app.services.scene_index import (
+    HEADING_PATTERN,
+    SUSPECT_HEADING_PATTERN,
+    plan_windows,
+    scan_scene_headings,
+)
+from tests.helpers import numbered_script
+
+
+class FakeAsyncLLM:
+    """Answers with the numbered headings found in each prompt"""
+    
+    def __init__(self, fail_parts=()):
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_parts = set(fail_parts)
+    
+    async def call_model(self, prompt, temperature=0.7, max_tokens=4096):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        
+        part = re.search(r"SCRIPT EXCERPT (\d+)/", prompt)
+        if part and int(part.group(1)) in self.fail_parts:
+            return ""
+        scenes = [
+            {"scene_number": number, "location": f"ROOFTOP {number}", "time_of_day": "NIGHT", "description": "Chase"}
+            for number in re.findall(r"^(\d+)\. EXT\.", prompt, re.MULTILINE)
+        ]
+        return json.dumps(scenes)
+
+
+class TestSceneScanner:
+    """Single-pass heading scan keeps the per-line regex semantics"""
+    
+    def test_heading_forms_and_priorities(self):
+        """Numbered, standard and minimal headings with offsets and lines"""
+        text = "4.1 INT. HALL – NIGHT\r\nAction.\n  ext. market - dusk  \n\tINT/EXT. CAR\n"
+        
+        headings = scan_scene_headings(text)
+        
+        assert [h.to_row() for h in headings] == [
+            [0, 0, "4.1", "INT", "HALL", "NIGHT", 1],
+            [31, 2, 1, "EXT", "market", "dusk", 2],
+            [54, 3, 2, "INT/EXT", "CAR", "DAY", 3],
+        ]
+    
+    def test_non_headings_are_skipped(self):
+        """Duplicates, long minimal lines and near-misses do not match"""
+        text = "\n".join([
+            "1. INT. HALL - DAY",
+            "1. EXT. YARD - DAY",        # Duplicate scene number
+            "INT. " + "A" * 100,          # Minimal form only on short lines
+            "2. INT. HALL -",            # Numbered, dash without a time
+            "EXT. A",                    # Location needs two characters
+            "INTERIOR HALL - DAY",
+        ])
+        
+        assert [h.scene_number for h in scan_scene_headings(text)] == ["1"]
+    
+    def test_patterns_compile_on_python_3_10(self):
+        """No possessive quantifiers or atomic groups (Python 3.11+ only)"""
+        for pattern in (HEADING_PATTERN.pattern, SUSPECT_HEADING_PATTERN.pattern):
+            assert not re.search(r"(?<!\\)[*+?}]\+|\(\?>", pattern)
+        
+        python310 = shutil.which("python3.10")
+        if python310 is None or subprocess.run([python310, "-c", "pass"], capture_output=True).returncode:
+            pytest.skip("python3.10 not installed")
+        for pattern in (HEADING_PATTERN, SUSPECT_HEADING_PATTERN):
+            subprocess.run(
+                [python310, "-c", f"import re; re.compile({pattern.pattern!r}, {int(pattern.flags)})"],
+                check=True,
+            )
+
+
+class TestSceneWindows:
+    """Token-bounded windows on scene-heading boundaries"""
+    
+    def test_windows_cover_script_on_heading_boundaries(self):
+        """Windows tile the script, start at headings and stay within budget"""
+        text = numbered_script(120)
+        headings = scan_scene_headings(text)
+        windows = plan_windows(text, headings, max_tokens=1000, overlap_lines=2)
+        
+        assert len(windows) > 1
+        assert "".join(text[w.start:w.end] for w in windows) == text
+        assert sum(len(w.headings) for w in windows) == len(headings)
+        offsets = {h.char_offset for h in headings}
+        assert all(w.start in offsets for w in windows)
+        assert all(w.end - w.start <= 4000 for w in windows)
+        # Overlap: each later window repeats the tail of the previous one
+        assert all(len(w.text) > w.end - w.start for w in windows[1:])
+    
+    def test_oversized_scene_is_split_on_lines(self):
+        """A scene longer than the budget is cut on line breaks"""
+        text = "1. INT. HALL - DAY\n" + "A very long action line.\n" * 400
+        windows = plan_windows(text, scan_scene_headings(text), max_tokens=500)
+        
+        assert len(windows) > 1
+        assert "".join(text[w.start:w.end] for w in windows) == text
+        assert all(text[w.start - 1] == "\n" for w in windows[1:])
+
+
+class TestWindowedExtraction:
+    """SceneExtractorAgent sends windows concurrently and merges them"""
+    
+    @pytest.fixture(autouse=True)
+    def llm_mode(self, monkeypatch):
+        monkeypatch.setattr(settings, "scene_extraction_mode", "llm")
+    
+    def test_windows_are_merged_in_script_order(self, monkeypatch):
+        """Per-window results are deduped by scene_number and keep script order"""
+        monkeypatch.setattr(settings, "scene_window_tokens", 1000)
+        monkeypatch.setattr(settings, "scene_window_overlap_lines", 30)
+        monkeypatch.setattr(settings, "scene_extraction_max_concurrent", 2)
+        llm = FakeAsyncLLM()
+        
+        result = asyncio.run(SceneExtractorAgent(llm).extract_scenes(numbered_script(120)))
+        
+        assert result["ai_used"] is True
+        assert [s["scene_number"] for s in result["scenes"]] == [str(n) for n in range(1, 121)]
+        assert len(llm.prompts) > 1
+        assert llm.max_in_flight == 2
+    
+    def test_failed_window_falls_back_to_index(self, monkeypatch):
+        """A window the LLM fails on is filled from the scene index"""
+        monkeypatch.setattr(settings, "scene_window_tokens", 1000)
+        llm = FakeAsyncLLM(fail_parts={2})
+        
+        result = asyncio.run(SceneExtractorAgent(llm).extract_scenes(numbered_script(120)))
+        
+        assert result["ai_used"] is True
+        assert len(result["scenes"]) == 120
+        assert any(s["confidence"] == 0.98 for s in result["scenes"])
+    
+    def test_short_script_uses_single_prompt(self):
+        """Scripts within the budget keep the single full-script prompt"""
+        llm = FakeAsyncLLM()
+        
+        result = asyncio.run(SceneExtractorAgent(llm).extract_scenes(numbered_script(3)))
+        
+        assert len(llm.prompts) == 1
+        assert "COMPLETE SCRIPT:" in llm.prompts[0]
+        assert result["count"] == 3
+
+
+class FakeSegmentLLM:
+    """Answers hybrid prompts with the 'SCENE <n> — <place>' lines it is shown"""
+    
+    def __init__(self):
+        self.prompts = []
+    
+    async def call_model(self, prompt, temperature=0.7, max_tokens=4096):
+        self.prompts.append(prompt)
+        scenes = []
+        for excerpt, text in re.findall(r"EXCERPT (\d+):\n(.*?)(?=\n\nEXCERPT \d+:|\n\nReturn ONLY)", prompt, re.S):
+            for heading, number, place in re.findall(r"^(SCENE (\w+) — (\w+) \(NIGHT\))$", text, re.M):
+                scenes.append({"excerpt": int(excerpt), "heading": heading, "scene_number": number,
+                               "location": place, "time_of_day": "NIGHT", "description": "Beach"})
+        return json.dumps(scenes)
+
+
+class TestHybridExtraction:
+    """Regex-first extraction that only sends ambiguous segments to the LLM"""
+    
+    def test_well_formed_script_needs_no_llm(self):
+        """Every heading parses, so no prompt is sent"""
+        llm = FakeSegmentLLM()
+        
+        result = asyncio.run(SceneExtractorAgent(llm).extract_scenes(numbered_script(120)))
+        
+        assert llm.prompts == []
+        assert result["mode"] == "hybrid"
+        assert result["count"] == 120
+    
+    def test_malformed_heading_is_sent_alone(self):
+        """A malformed slug line is resolved by a small prompt and kept in order"""
+        scenes = numbered_script(120).split("\n51. EXT.")
+        text = scenes[0] + "\nSCENE 50A — BEACH (NIGHT)\nWaves crash.\n\n51. EXT." + scenes[1]
+        llm = FakeSegmentLLM()
+        
+        result = asyncio.run(SceneExtractorAgent(llm).extract_scenes(text))
+        
+        numbers = [s["scene_number"] for s in result["scenes"]]
+        assert numbers[49:52] == ["50", "50A", "51"]
+        assert len(numbers) == 121
+        assert result["ai_used"] is True
+        assert len(llm.prompts) == 1
+        assert len(llm.prompts[0]) * 10 < len(text)
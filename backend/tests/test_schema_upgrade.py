@@ -0,0 +1,76 @@
+"""
+Unit tests for upgrading databases created before columns were added
+"""
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import ADDED_COLUMNS, upgrade_schema
+from app.models.database import Document, DocumentStatus, Run
+
+
+@pytest.fixture
+def engine(baseline_database):
+    engine = create_engine(f"sqlite:///{baseline_database}")
+    yield engine
+    engine.dispose()
+
+
+class TestUpgradeSchema:
+    """Missing columns and indexes are added to existing tables"""
+    
+    def test_adds_missing_columns(self, engine):
+        """Every registered column is added once; a second upgrade is a no-op"""
+        with engine.begin() as conn:
+            added = upgrade_schema(conn)
+        
+        assert added == [f"{table}.{name}" for table, names in ADDED_COLUMNS.items() for name in names]
+        assert "runs.llm_telemetry_json" in added
+        for table, names in ADDED_COLUMNS.items():
+            columns = {column["name"] for column in inspect(engine).get_columns(table)}
+            assert set(names) <= columns
+        assert "document_pages" in inspect(engine).get_table_names()
+        with engine.begin() as conn:
+            assert upgrade_schema(conn) == []
+    
+    def test_legacy_documents_load_through_the_orm(self, engine):
+        """Old rows read back with NULL new columns (treated as ready)"""
+        with engine.begin() as conn:
+            upgrade_schema(conn)
+        
+        with Session(engine) as session:
+            document = session.execute(select(Document)).scalar_one()
+        
+        assert document.id == "doc-1"
+        assert document.char_count is None
+        assert document.status in (None, DocumentStatus.READY)
+    
+    def test_legacy_runs_load_through_the_orm(self, engine):
+        """Runs created before telemetry was stored read back without it"""
+        with engine.begin() as conn:
+            upgrade_schema(conn)
+        
+        with Session(engine) as session:
+            run = session.execute(select(Run)).scalar_one()
+            run.llm_telemetry_json = {"total": {"calls": 1}}
+            session.commit()
+            session.expire_all()
+            stored = session.get(Run, "run-1").llm_telemetry_json
+        
+        assert stored == {"total": {"calls": 1}}
+    
+    def test_content_hash_index_is_unique(self, engine):
+        """idx_document_content_hash is created on the upgraded table"""
+        with engine.begin() as conn:
+            upgrade_schema(conn)
+        
+        indexes = {index["name"]: index for index in inspect(engine).get_indexes("documents")}
+        assert indexes["idx_document_content_hash"]["unique"]
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE documents SET content_hash = 'abc'"))
+        with pytest.raises(IntegrityError), engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO documents (id, filename, file_path, format, content_hash) "
+                "VALUES ('doc-2', 'dup.pdf', '/tmp/dup.pdf', 'pdf', 'abc')"
+            ))
@@ -0,0 +1,230 @@
+"""
+Unit tests for single-flight coalescing of identical LLM calls
+"""
+import asyncio
+import contextvars
+
+import pytest
+from aiohttp import web
+
+from app.utils.deadline import Deadline, DeadlineExceeded, deadline_scope
+from app.utils.llm_client import Qwen3Client
+from app.utils.single_flight import SingleFlight
+from tests.helpers import stub_server
+
+
+class CountingCall:
+    """Slow upstream call that counts how often it actually runs"""
+    
+    def __init__(self, result="reply", error=None, latency=0.02):
+        self.result = result
+        self.error = error
+        self.latency = latency
+        self.calls = 0
+        self.cancelled = False
+    
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestSingleFlight:
+    """Concurrent callers with the same key share one call"""
+    
+    def test_identical_keys_share_one_call(self):
+        """Same key runs once; a different key runs separately"""
+        flight = SingleFlight()
+        shared, other = CountingCall("shared"), CountingCall("other")
+        
+        async def scenario():
+            return await asyncio.gather(
+                *[flight.run("key", shared) for _ in range(5)],
+                flight.run("other-key", other),
+            )
+        
+        results = asyncio.run(scenario())
+        
+        assert results == ["shared"] * 5 + ["other"]
+        assert shared.calls == 1 and other.calls == 1
+        assert flight.stats() == {"leaders": 2, "coalesced": 4, "in_flight": 0}
+    
+    def test_finished_calls_are_not_reused(self):
+        """A key is released as soon as its call completes"""
+        flight = SingleFlight()
+        call = CountingCall()
+        
+        async def scenario():
+            await flight.run("key", call)
+            await flight.run("key", call)
+        
+        asyncio.run(scenario())
+        
+        assert call.calls == 2
+    
+    def test_errors_reach_every_caller(self):
+        """The shared call's exception is raised to all waiters"""
+        flight = SingleFlight()
+        call = CountingCall(error=RuntimeError("upstream down"))
+        
+        async def scenario():
+            return await asyncio.gather(*[flight.run("key", call) for _ in range(3)], return_exceptions=True)
+        
+        results = asyncio.run(scenario())
+        
+        assert call.calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+    
+    def test_cancelled_caller_does_not_cancel_the_call(self):
+        """Other waiters still get the result when the first caller goes away"""
+        flight = SingleFlight()
+        call = CountingCall("still here")
+        
+        async def scenario():
+            first = asyncio.create_task(flight.run("key", call))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(flight.run("key", call))
+            await asyncio.sleep(0)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+        
+        assert asyncio.run(scenario()) == "still here"
+        assert call.calls == 1
+    
+    def test_each_caller_waits_only_until_its_own_deadline(self):
+        """A short-deadline joiner gives up on time; the longer caller still gets the result"""
+        flight = SingleFlight()
+        call = CountingCall("slow answer", latency=0.5)
+        
+        async def caller(seconds):
+            with deadline_scope(Deadline.after(seconds)):
+                start = asyncio.get_running_loop().time()
+                try:
+                    return await flight.run("key", call)
+                except DeadlineExceeded:
+                    return asyncio.get_running_loop().time() - start
+        
+        async def scenario():
+            leader = asyncio.create_task(caller(2.0))
+            await asyncio.sleep(0)
+            return await asyncio.gather(leader, caller(0.1))
+        
+        result, waited = asyncio.run(scenario())
+        
+        assert result == "slow answer" and call.calls == 1
+        assert waited < 0.3
+    
+    def test_shared_call_runs_in_a_neutral_context(self):
+        """The first caller's context variables (deadline, agent, ...) do not reach the call"""
+        flight = SingleFlight()
+        marker = contextvars.ContextVar("marker", default="unset")
+        seen = []
+        
+        async def call():
+            seen.append(marker.get())
+            return "reply"
+        
+        async def scenario():
+            marker.set("leader")
+            with deadline_scope(Deadline.after(5)):
+                return await flight.run("key", call)
+        
+        assert asyncio.run(scenario()) == "reply"
+        assert seen == ["unset"]
+    
+    def test_call_is_cancelled_when_nobody_waits(self):
+        """Once every caller has given up, the shared call stops too"""
+        flight = SingleFlight()
+        call = CountingCall(latency=5)
+        
+        async def scenario():
+            with deadline_scope(Deadline.after(0.05)), pytest.raises(DeadlineExceeded):
+                await flight.run("key", call)
+            await asyncio.sleep(0.01)
+            return flight.stats()
+        
+        assert asyncio.run(scenario())["in_flight"] == 0
+        assert call.cancelled
+
+
+class TestClientCoalescing:
+    """Qwen3Client.call_model coalesces identical prompts"""
+    
+    def test_concurrent_identical_prompts_hit_server_once(self):
+        """Identical concurrent prompts share a request; use_cache=False opts out"""
+        async def slow(request):
+            await asyncio.sleep(0.05)
+            return web.json_response({"choices": [{"message": {"content": "summary"}}]})
+        
+        async def scenario():
+            async with stub_server(slow) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                shared = await asyncio.gather(*[client.call_model("what-if summary") for _ in range(6)])
+                shared_requests = len(peers)
+                fresh = await asyncio.gather(
+                    *[client.call_model("what-if summary", use_cache=False) for _ in range(2)]
+                )
+                await client.close()
+                return shared, shared_requests, fresh, len(peers) - shared_requests
+        
+        shared, shared_requests, fresh, fresh_requests = asyncio.run(scenario())
+        
+        assert shared == ["summary"] * 6 and shared_requests == 1
+        assert fresh == ["summary"] * 2 and fresh_requests == 2
+    
+    def test_mixed_deadline_join(self):
+        """A joiner with a short deadline returns "" on time; unbounded callers never join deadlined calls"""
+        async def slow(request):
+            await asyncio.sleep(0.6)
+            return web.json_response({"choices": [{"message": {"content": "summary"}}]})
+        
+        async def timed_call(client, seconds):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            with deadline_scope(Deadline.after(seconds) if seconds else None):
+                reply = await client.call_model("what-if summary")
+            return reply, loop.time() - start
+        
+        async def scenario():
+            async with stub_server(slow) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                leader = asyncio.create_task(timed_call(client, 3.0))
+                await asyncio.sleep(0.01)
+                results = await asyncio.gather(leader, timed_call(client, 0.1), timed_call(client, None))
+                await client.close()
+                return results, len(peers)
+        
+        (leader, short, unbounded), requests = asyncio.run(scenario())
+        
+        assert leader[0] == "summary" and unbounded[0] == "summary"
+        assert short[0] == "" and short[1] < 0.4
+        assert requests == 2
+    
+    def test_short_deadline_leader_does_not_cut_short_a_joiner(self):
+        """The shared request is not bound by the first caller's deadline"""
+        async def slow(request):
+            await asyncio.sleep(0.3)
+            return web.json_response({"choices": [{"message": {"content": "summary"}}]})
+        
+        async def call(client, seconds):
+            with deadline_scope(Deadline.after(seconds)):
+                return await client.call_model("what-if summary")
+        
+        async def scenario():
+            async with stub_server(slow) as (base_url, peers):
+                client = Qwen3Client(base_url=base_url, model="test")
+                leader = asyncio.create_task(call(client, 0.1))
+                await asyncio.sleep(0.01)
+                replies = await asyncio.gather(leader, call(client, 3.0))
+                await client.close()
+                return replies, len(peers), client.breaker.consecutive_failures
+        
+        assert asyncio.run(scenario()) == (["", "summary"], 1, 0)
@@ -0,0 +1,267 @@
+"""
+Unit tests for script upload storage and text extraction
+"""
+import asyncio
+import hashlib
+import io
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from app.services.storage import stream_upload_to_disk, UploadTooLargeError
+from app.services.extraction import extract_docx_pages, paginate_text, plan_page_ranges
+
+
+SAMPLE_DOCX = Path(__file__).parent.parent / "storage" / "uploads" / "056f66b2-99c1-4a69-a6db-e4a5aa1eb3b3.docx"
+
+
+@pytest.fixture(scope="module")
+def client():
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _wait_ready(client, document_id: str, timeout: float = 60.0) -> dict:
+    """Poll the script endpoint until background extraction finishes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f"/api/v1/scripts/{document_id}").json()
+        if body["status"] != "extracting":
+            return body
+        time.sleep(0.1)
+    raise AssertionError(f"extraction of {document_id} did not finish")
+
+
+def _upload(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="script.pdf")
+
+
+class TestStreamingUpload:
+    """Tests for chunked upload storage"""
+    
+    def test_stream_writes_file_and_digest(self, tmp_path):
+        """Chunks land in the final file with a matching SHA-256"""
+        data = b"INT. HOUSE - DAY\n" * 5000
+        
+        stored = asyncio.run(stream_upload_to_disk(
+            _upload(data), tmp_path, "doc.pdf", max_bytes=len(data), chunk_size=4096
+        ))
+        
+        assert stored.path == tmp_path / "doc.pdf"
+        assert stored.path.read_bytes() == data
+        assert stored.size_bytes == len(data)
+        assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    
+    def test_stream_aborts_over_limit(self, tmp_path):
+        """Oversized uploads abort and leave no files behind"""
+        data = b"x" * 10_000
+        
+        with pytest.raises(UploadTooLargeError):
+            asyncio.run(stream_upload_to_disk(
+                _upload(data), tmp_path, "doc.pdf", max_bytes=4096, chunk_size=1024
+            ))
+        
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestPageSharding:
+    """Tests for page-range planning used by the extraction pool"""
+    
+    def test_ranges_cover_all_pages_in_order(self):
+        """Ranges are contiguous, ordered and near-equal"""
+        ranges = plan_page_ranges(129, 4)
+        
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == 129
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        sizes = [end - start for start, end in ranges]
+        assert max(sizes) - min(sizes) <= 1
+    
+    def test_more_shards_than_pages(self):
+        """Never plans empty shards"""
+        assert plan_page_ranges(2, 8) == [(0, 1), (1, 2)]
+
+    
+    def test_docx_tables_and_page_breaks(self, tmp_path):
+        """Streaming DOCX extraction keeps table dialogue and splits on page breaks"""
+        from docx import Document as DocxDocument
+        from docx.enum.text import WD_BREAK
+        doc = DocxDocument()
+        doc.add_paragraph("1. INT. BANK - NIGHT")
+        table = doc.add_table(rows=1, cols=2)
+        table.rows[0].cells[0].text = "RAVI"
+        table.rows[0].cells[1].text = "Open the vault."
+        doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+        doc.add_paragraph("2. EXT. STREET - DAY")
+        doc.save(tmp_path / "script.docx")
+        
+        pages = extract_docx_pages(str(tmp_path / "script.docx"))
+        
+        assert len(pages) == 2
+        assert pages[0].split("\n")[:3] == ["1. INT. BANK - NIGHT", "RAVI", "Open the vault."]
+        assert pages[1] == "2. EXT. STREET - DAY"
+
+
+class TestUploadDeduplication:
+    """Tests for content-addressed upload dedup"""
+    
+    def test_reupload_is_aliased(self, client):
+        """A second upload of the same bytes reuses the stored file and text"""
+        from app.api.v1.uploads import UPLOAD_DIR
+        data = SAMPLE_DOCX.read_bytes()
+        
+        first = client.post("/api/v1/scripts/upload", files={"file": ("draft.docx", data)})
+        files_before = set(UPLOAD_DIR.iterdir())
+        second = client.post("/api/v1/scripts/upload", files={"file": ("draft-copy.docx", data)})
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json()["duplicate_of"] == first.json()["document_id"]
+        assert set(UPLOAD_DIR.iterdir()) == files_before
+        
+        alias = _wait_ready(client, second.json()["document_id"])
+        assert alias["text_length"] > 0
+    
+    def test_deleting_canonical_promotes_alias(self, client):
+        """Aliases keep the shared file when the original upload is deleted"""
+        data = SAMPLE_DOCX.read_bytes() + b"\0"  # distinct content from other tests
+        
+        first = client.post("/api/v1/scripts/upload", files={"file": ("a.docx", data)}).json()
+        second = client.post("/api/v1/scripts/upload", files={"file": ("b.docx", data)}).json()
+        
+        _wait_ready(client, first["document_id"])
+        assert client.delete(f"/api/v1/scripts/{first['document_id']}").status_code == 204
+        
+        promoted = client.get(f"/api/v1/scripts/{second['document_id']}").json()
+        assert promoted["duplicate_of"] is None
+        assert promoted["text_length"] > 0
+
+
+class TestBackgroundExtraction:
+    """Tests for asynchronous ingestion jobs"""
+    
+    def test_upload_returns_before_extraction(self, client):
+        """Upload acknowledges with `extracting`, then progress reaches ready"""
+        data = SAMPLE_DOCX.read_bytes() + b"\1"
+        
+        response = client.post("/api/v1/scripts/upload", files={"file": ("new.docx", data)})
+        
+        assert response.status_code == 200
+        assert response.json()["status"] in ("extracting", "ready")
+        
+        ready = _wait_ready(client, response.json()["document_id"])
+        assert ready["status"] == "ready"
+        assert ready["pages_done"] == ready["page_count"]
+        assert ready["progress_percent"] == 100
+
+
+class TestPageStorage:
+    """Tests for per-page text storage and range reads"""
+    
+    def test_line_and_page_ranges_match_full_text(self):
+        """Range reads agree with slicing the joined text"""
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from app.database import Base
+        from app.models.database import Document
+        from app.services.document_text import read_full_text, read_lines, read_pages, store_pages
+        
+        text = "\n".join(f"INT. ROOM {i} - DAY" for i in range(500))
+        pages = paginate_text(text, target_chars=700)
+        
+        async def scenario():
+            engine = create_async_engine("sqlite+aiosqlite://")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                document = Document(id="doc-1", filename="s.pdf", file_path="s.pdf", format="pdf")
+                session.add(document)
+                document.char_count, document.line_count = await store_pages(session, document.id, pages)
+                await session.commit()
+                
+                results = (
+                    document.char_count,
+                    document.line_count,
+                    await read_full_text(session, document),
+                    await read_lines(session, document, 123, 301),
+                    await read_pages(session, document, 2, 3),
+                )
+            await engine.dispose()
+            return results
+        
+        char_count, line_count, full_text, lines, middle = asyncio.run(scenario())
+        
+        assert len(pages) > 3
+        assert full_text == text
+        assert (char_count, line_count) == (len(text), 500)
+        assert lines == text.split("\n")[123:301]
+        assert middle == pages[1:3]
+
+
+
+class TestBatchUpload:
+    """Tests for the multi-file upload endpoint"""
+    
+    def test_batch_upload_streams_per_file_results(self, client):
+        """Batch uploads return one NDJSON line per file, rejects included"""
+        import json
+        data = SAMPLE_DOCX.read_bytes() + b"\3"
+        files = [
+            ("files", ("one.docx", data)),
+            ("files", ("one-again.docx", data)),
+            ("files", ("two.docx", SAMPLE_DOCX.read_bytes() + b"\4")),
+            ("files", ("notes.txt", b"not a script")),
+        ]
+        
+        response = client.post("/api/v1/scripts/upload/batch", files=files)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        by_index = {line["index"]: line for line in lines}
+        assert sorted(by_index) == [0, 1, 2, 3]
+        assert by_index[3]["status"] == "rejected"
+        assert all(by_index[i]["status"] == "ready" for i in (0, 1, 2))
+        assert by_index[1]["duplicate_of"] == by_index[0]["document_id"]
+
+
+class TestSceneIndex:
+    """Tests for the scene-heading index built at ingestion"""
+    
+    SCRIPT = "\n".join([
+        "1. INT. WAREHOUSE - NIGHT",
+        "Ravi waits.",
+        "1. INT. WAREHOUSE - NIGHT",          # duplicate number, skipped
+        "EXT. ROOFTOP - DAY",
+        "Wind howls.",
+        "4.1 EXT. HIGHWAY",
+        "INT. KITCHEN",
+    ])
+    
+    def test_scan_preserves_regex_rules(self):
+        """Numbered, standard and minimal headings keep their numbering and priority"""
+        from app.services.scene_index import iter_scene_bodies, scan_scene_headings, scenes_from_index
+        
+        headings = scan_scene_headings(self.SCRIPT)
+        scenes = scenes_from_index(self.SCRIPT, headings)
+        
+        assert [s["scene_number"] for s in scenes] == ["1", 1, "4.1", 2]
+        assert [h.line for h in headings] == [0, 3, 5, 6]
+        assert scenes[1]["location"] == "ROOFTOP" and scenes[1]["time_of_day"] == "DAY"
+        assert scenes[2]["is_continuation"] is True
+        assert [s["confidence"] for s in scenes] == [0.98, 0.90, 0.98, 0.70]
+        
+        bodies = [body for _, body in iter_scene_bodies(self.SCRIPT, headings)]
+        assert bodies[1] == "EXT. ROOFTOP - DAY\nWind howls."
+    
+    def test_index_stored_at_ingestion(self, client):
+        """Uploads report the number of indexed scenes once extraction finishes"""
+        data = SAMPLE_DOCX.read_bytes() + b"\2"
+        
+        response = client.post("/api/v1/scripts/upload", files={"file": ("indexed.docx", data)})
+        ready = _wait_ready(client, response.json()["document_id"])
+        
+        assert ready["scene_count"] is not None
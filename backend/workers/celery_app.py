@@ -2,6 +2,7 @@
 Celery application and configuration
 """
 from celery import Celery
+from celery.schedules import crontab
 from app.config import settings
 
 # Create Celery app
@@ -25,6 +26,14 @@ celery_app.conf.update(
     worker_max_tasks_per_child=1000,
 )
 
+# Periodic tasks (run with `celery -A workers.celery_app beat`)
+celery_app.conf.beat_schedule = {
+    "cleanup-old-uploads": {
+        "task": "cleanup_old_uploads",
+        "schedule": crontab(hour=settings.retention_schedule_hour, minute=0),
+    },
+}
+
 
 # Import tasks to register them
 from workers import tasks
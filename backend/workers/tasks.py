@@ -210,17 +210,27 @@ def generate_pdf_report_async(run_id: str):
 
 
 @shared_task(name="cleanup_old_uploads")
-def cleanup_old_uploads():
+def cleanup_old_uploads(archive: bool = None):
     """
-    Cleanup old upload files (runs daily)
+    Retention compaction (runs daily via Celery beat)
+    
+    Expires old runs/uploads per the RETENTION_* settings (archiving run JSON
+    first), removes rows and files orphaned by earlier deletes, and VACUUMs
+    SQLite once enough space is free. See app.services.retention.
     """
     try:
         logger.info("🧹 Cleaning up old uploads...")
         
-        # Would implement cleanup logic here
+        from sqlalchemy.orm import sessionmaker
+        from app.database import sync_engine
+        from app.services.retention import run_compaction
+        
+        SessionLocal = sessionmaker(bind=sync_engine, expire_on_commit=False)
+        with SessionLocal() as db_session:
+            stats = run_compaction(db_session, archive=archive)
         
         logger.info("✅ Cleanup completed")
-        return {"status": "completed"}
+        return {"status": "completed", **stats.to_dict()}
         
     except Exception as e:
         logger.error(f"❌ Cleanup failed: {e}")